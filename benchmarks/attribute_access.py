@@ -0,0 +1,71 @@
+"""Micro-benchmarks for the TerraformObject attribute protocol, on a
+resource class declared in python and on a resource parsed from text.
+
+python benchmarks/attribute_access.py [--number 200000]
+"""
+
+import argparse
+import timeit
+
+from pyterraformer.core.resources import ResourceObject
+from pyterraformer.serializer.human_resources.engine import parse_text
+
+
+class GoogleStorageBucket(ResourceObject):
+    _type = "google_storage_bucket"
+
+
+def build_bucket() -> GoogleStorageBucket:
+    return GoogleStorageBucket(
+        tf_id="bucket",
+        name="my-bucket",
+        location="US-EAST1",
+        project="my-project",
+        force_destroy=True,
+        labels={"team": "analytics"},
+    )
+
+
+PARSED = """resource "aws_s3_bucket" "bucket" {
+  bucket        = "my-bucket"
+  location      = "US-EAST1"
+  force_destroy = true
+  tags = {
+    team = "analytics"
+  }
+}
+"""
+
+
+def parse_bucket() -> ResourceObject:
+    return parse_text(PARSED)[0]
+
+
+CASES = {
+    "read attribute": "bucket.location",
+    "write attribute": "bucket.location = 'US-WEST1'",
+    "write new attribute": "bucket.storage_class = 'STANDARD'",
+    "read internal attribute": "bucket._changed",
+    "read tf_id": "bucket.tf_id",
+    "read _lookup suffix": "bucket.self_link_lookup",
+    "missing attribute": "getattr(bucket, 'not_an_attribute', None)",
+}
+
+
+def run(number: int):
+    for label, bucket in (("declared", build_bucket()), ("parsed", parse_bucket())):
+        print(f"{label} {type(bucket).__name__}")
+        for name, statement in CASES.items():
+            seconds = min(
+                timeit.repeat(
+                    statement, globals={"bucket": bucket}, number=number, repeat=5
+                )
+            )
+            print(f"  {name:<26}{seconds / number * 1e9:8.1f} ns")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=200000)
+    args = parser.parse_args()
+    run(args.number)
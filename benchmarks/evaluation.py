@@ -0,0 +1,76 @@
+"""Evaluate the attributes of a small workspace repeatedly, once per
+variable set, with the compiled evaluator, as one matrix across all
+variable sets, and with the tree walking resolve of each node.
+
+python benchmarks/evaluation.py [--sets 2000]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from pyterraformer import HumanSerializer
+from pyterraformer.core import TerraformWorkspace
+from pyterraformer.core.evaluation import EvaluationContext
+
+CONFIG = """variable "prefix" {
+  default = "acme"
+}
+
+variable "enabled" {
+  default = true
+}
+
+resource "aws_s3_bucket" "b" {
+  bucket = "${var.prefix}-bucket"
+  acl    = "private"
+}
+
+resource "aws_s3_bucket_policy" "p" {
+  bucket  = aws_s3_bucket.b.bucket
+  project = var.prefix
+  count   = "${var.enabled ? 1 : 0}"
+  env     = "${terraform.workspace}-${var.prefix}"
+}
+"""
+
+
+def run(sets: int):
+    with tempfile.TemporaryDirectory() as directory:
+        (Path(directory) / "main.tf").write_text(CONFIG)
+        workspace = TerraformWorkspace(path=directory, serializer=HumanSerializer())
+        file = workspace.get_file_safe("main.tf")
+        objects = [obj for obj in file.objects if obj._type != "variable"]
+
+        start = time.perf_counter()
+        for idx in range(sets):
+            context = EvaluationContext(workspace, variables={"prefix": f"p{idx}"})
+            for obj in objects:
+                obj.resolve_attributes(context)
+        compiled = time.perf_counter() - start
+
+        start = time.perf_counter()
+        var_sets = [{"prefix": f"p{idx}"} for idx in range(sets)]
+        for obj in objects:
+            obj.resolve_matrix(var_sets=var_sets)
+        matrix = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(sets):
+            for obj in objects:
+                for value in obj.render_variables.values():
+                    if hasattr(value, "resolve"):
+                        value.resolve(workspace, file, None, None)
+        walked = time.perf_counter() - start
+
+    print(f"compiled evaluation   {compiled / sets * 1e6:8.1f} us per variable set")
+    print(f"matrix evaluation     {matrix / sets * 1e6:8.1f} us per variable set")
+    print(f"tree walking resolve  {walked / sets * 1e6:8.1f} us per variable set")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sets", type=int, default=2000)
+    args = parser.parse_args()
+    run(args.sets)
@@ -0,0 +1,75 @@
+"""Build the reference graph of a large generated workspace and time the
+queries on it.
+
+Each resource refers to a shared variable, a local and the resource before
+it, so impact and ordering queries have to walk long chains.
+
+python benchmarks/graph.py [--objects 20000]
+"""
+
+import argparse
+import time
+
+from pyterraformer import HumanSerializer
+from pyterraformer.core import TerraformWorkspace
+from pyterraformer.core.generics import Local, Variable
+from pyterraformer.core.generics.interpolation import Concat, PropertyLookup, String
+from pyterraformer.core.namespace import TerraformFile
+from pyterraformer.core.resources import ResourceObject
+
+
+def reference(*names: str) -> PropertyLookup:
+    """The node parsing a dotted reference such as aws_s3_bucket.b1.id gives"""
+    node = String(names[-1])
+    for name in reversed(names[:-1]):
+        node = PropertyLookup(String(name), [node])
+    return node
+
+
+def build_workspace(objects: int, per_file: int = 1000) -> TerraformWorkspace:
+    workspace = TerraformWorkspace(path=".", serializer=HumanSerializer())
+    for start in range(0, objects, per_file):
+        items = []
+        if start == 0:
+            items = [
+                Variable("region", default="us"),
+                Local(prefix=Concat([reference("var", "region"), String("-app")])),
+            ]
+        for idx in range(start, min(start + per_file, objects)):
+            attributes = {
+                "name": Concat([reference("local", "prefix"), String(f"-{idx}")])
+            }
+            if idx:
+                attributes["after"] = reference("aws_s3_bucket", f"b{idx - 1}", "id")
+            items.append(
+                ResourceObject(tf_id=f"b{idx}", _type="aws_s3_bucket", **attributes)
+            )
+        workspace.add_file(TerraformFile(workspace, None, f"{start}.tf", items))
+    return workspace
+
+
+def timed(label: str, function):
+    start = time.perf_counter()
+    result = function()
+    print(f"{label:<24}{(time.perf_counter() - start) * 1e3:10.1f} ms")
+    return result
+
+
+def run(objects: int):
+    workspace = timed("generate", lambda: build_workspace(objects))
+    graph = workspace.graph
+    timed("build", graph.refresh)
+    timed("refresh, no changes", graph.refresh)
+    workspace.get_object(tf_id="b10").name = reference("var", "region")
+    timed("refresh, one change", graph.refresh)
+    impact = timed("impact of var.region", lambda: graph.impact(["var.region"]))
+    print(f"{'':<24}{len(impact):10d} dependents")
+    timed("topological order", graph.topological_order)
+    timed("cycles", graph.cycles)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--objects", type=int, default=20000)
+    args = parser.parse_args()
+    run(args.objects)
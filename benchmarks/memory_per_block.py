@@ -0,0 +1,65 @@
+"""Measure the memory held by the parsed object model.
+
+Parses a synthetic file of resource blocks and reports the deep size of the
+parsed result per block. Objects shared between blocks (interned identifiers,
+for example) are only counted once.
+
+    python benchmarks/memory_per_block.py [--blocks 10]
+"""
+
+import argparse
+import sys
+from gc import get_referents
+from types import FunctionType, ModuleType
+
+from pyterraformer.serializer.human_resources.engine import parse_text
+
+BLOCK = """resource "google_storage_bucket" "bucket_{idx}" {{
+  name          = "bucket-{idx}"
+  location      = "US-EAST1"
+  project       = var.project
+  force_destroy = true
+  labels = {{
+    team        = "analytics"
+    environment = "${{terraform.workspace}}"
+  }}
+  website {{
+    not_found_page = "404.html"
+  }}
+  storage_class = var.storage_classes["${{terraform.workspace}}"]
+}}
+"""
+
+# shared, process wide objects that do not belong to any parsed block
+SKIP_TYPES = (type, ModuleType, FunctionType)
+
+
+def build_text(blocks: int) -> str:
+    return "\n".join(BLOCK.format(idx=idx) for idx in range(blocks))
+
+
+def deep_size(root) -> int:
+    seen = set()
+    size = 0
+    pending = [root]
+    while pending:
+        obj = pending.pop()
+        if isinstance(obj, SKIP_TYPES) or id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        pending.extend(get_referents(obj))
+    return size
+
+
+def measure(blocks: int) -> float:
+    parsed = parse_text(build_text(blocks))
+    assert len(parsed) == blocks
+    return deep_size(parsed) / blocks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--blocks", type=int, default=10)
+    args = parser.parse_args()
+    print(f"{measure(args.blocks):,.0f} bytes per parsed block")
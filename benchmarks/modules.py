@@ -0,0 +1,81 @@
+"""Resolve the outputs of a local module called many times with only a few
+distinct sets of inputs, and count how often the module is evaluated.
+
+python benchmarks/modules.py [--calls 300] [--distinct 3]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from pyterraformer import HumanSerializer
+from pyterraformer.core import TerraformWorkspace
+
+MODULE = """variable "env" {}
+
+variable "region" {
+  default = "us-east-1"
+}
+
+locals {
+  prefix = "${var.env}-${var.region}"
+}
+
+output "bucket" {
+  value = "${local.prefix}-bucket"
+}
+
+output "tags" {
+  value = {
+    env    = var.env
+    region = var.region
+  }
+}
+"""
+
+CALL = """module "m{idx}" {{
+  source = "./modules/app"
+  env    = "env{env}"
+}}
+
+resource "aws_s3_bucket" "b{idx}" {{
+  bucket = module.m{idx}.bucket
+  tags   = module.m{idx}.tags
+}}
+"""
+
+
+def run(calls: int, distinct: int):
+    with tempfile.TemporaryDirectory() as directory:
+        root = Path(directory)
+        (root / "modules" / "app").mkdir(parents=True)
+        (root / "modules" / "app" / "main.tf").write_text(MODULE)
+        (root / "main.tf").write_text(
+            "\n".join(CALL.format(idx=idx, env=idx % distinct) for idx in range(calls))
+        )
+        workspace = TerraformWorkspace(path=root, serializer=HumanSerializer())
+        file = workspace.get_file_safe("main.tf")
+        buckets = [obj for obj in file.objects if obj._type == "aws_s3_bucket"]
+
+        start = time.perf_counter()
+        for bucket in buckets:
+            bucket.resolved_attributes
+        first = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for bucket in buckets:
+            bucket.resolved_attributes
+        cached = time.perf_counter() - start
+
+    evaluated = len(workspace.module_loader._outputs)
+    print(f"first resolve   {first * 1e3:8.1f} ms, module evaluated {evaluated} times")
+    print(f"cached resolve  {cached * 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--distinct", type=int, default=3)
+    args = parser.parse_args()
+    run(args.calls, args.distinct)
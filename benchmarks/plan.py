@@ -0,0 +1,76 @@
+"""Index a large plan JSON document in chunks, and compare time and peak
+memory with json.loads on the whole text.
+
+python benchmarks/plan.py [--resources 50000] [--chunk 65536]
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+
+from pyterraformer.terraform.plan import PlanIndex
+
+
+def build_plan(resources: int) -> str:
+    values = {"tags": {f"tag{i}": "x" * 40 for i in range(10)}, "count": 3}
+    changes = [
+        {
+            "address": f"aws_instance.i{idx}",
+            "mode": "managed",
+            "type": "aws_instance",
+            "name": f"i{idx}",
+            "change": {
+                "actions": ["update"] if idx % 50 == 0 else ["no-op"],
+                "before": values,
+                "after": values,
+            },
+        }
+        for idx in range(resources)
+    ]
+    state = [{"address": change["address"], "values": values} for change in changes]
+    return json.dumps(
+        {
+            "format_version": "1.1",
+            "planned_values": {"root_module": {"resources": state}},
+            "resource_changes": changes,
+            "prior_state": {"values": {"root_module": {"resources": state}}},
+        }
+    )
+
+
+def measure(label: str, function):
+    # time without tracing, which slows allocation down a lot
+    start = time.perf_counter()
+    function()
+    duration = time.perf_counter() - start
+    tracemalloc.start()
+    result = function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:26} {duration * 1e3:8.1f} ms, peak {peak / 2 ** 20:8.1f} MiB")
+    return result
+
+
+def run(resources: int, chunk: int):
+    text = build_plan(resources)
+    print(f"plan JSON {len(text) / 2 ** 20:.1f} MiB, {resources} resources")
+
+    def chunks():
+        return (text[i : i + chunk] for i in range(0, len(text), chunk))
+
+    measure("json.loads", lambda: json.loads(text))
+    measure("PlanIndex.parse", lambda: PlanIndex.parse(chunks()))
+    plan = measure(
+        "PlanIndex.parse, filtered",
+        lambda: PlanIndex.parse(chunks(), actions="update", values=False),
+    )
+    print(f"{len(plan)} changes to apply")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--resources", type=int, default=50000)
+    parser.add_argument("--chunk", type=int, default=1 << 16)
+    args = parser.parse_args()
+    run(args.resources, args.chunk)
@@ -0,0 +1,835 @@
+"""Compiled evaluation of parsed expressions.
+
+Each expression node compiles, once, into a plain python function of an
+EvaluationContext. References are compiled into direct symbol table
+lookups, so evaluating the same expression again - for another terraform
+workspace or another set of variable values - only needs a new context,
+not another walk over the tree.
+
+    context = EvaluationContext(workspace, variables={"env": "prod"})
+    evaluate(bucket.render_variables["name"], context)
+
+Values that can't be determined from configuration alone, such as
+attributes only known after apply, evaluate to UnresolvedLookup.
+
+Work that doesn't depend on the context is only done once. Sub-expressions
+made up of literals are folded while compiling, and contexts created
+together by evaluation_matrix share every memoized value - locals,
+variable defaults, attributes of other objects - that was computed without
+reading a variable, terraform.workspace, count or each.
+"""
+
+import math
+import operator
+from copy import deepcopy
+from functools import lru_cache
+from itertools import product
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    TYPE_CHECKING,
+)
+
+from lark import Tree
+
+from pyterraformer.core.functions import (
+    CONTEXT_FUNCTIONS,
+    FUNCTIONS,
+    normalize_number,
+    to_bool,
+    to_number,
+    to_string,
+)
+from pyterraformer.core.generics.interpolation import (
+    ArrayLookup,
+    BinaryOp,
+    BinaryOperator,
+    BinaryTerm,
+    Composite,
+    DictLookup,
+    Expression,
+    Node,
+    PropertyLookup,
+    String,
+    UnknownValue,
+    UnresolvedLookup,
+)
+from pyterraformer.core.generics.variables import Variable
+
+if TYPE_CHECKING:
+    from pyterraformer.core.namespace import TerraformFile
+    from pyterraformer.core.objects import TerraformObject
+    from pyterraformer.core.workspace import TerraformWorkspace
+
+Evaluator = Callable[["EvaluationContext"], Any]
+
+_MISSING = object()
+_set = object.__setattr__
+
+
+class EvaluationContext(object):
+    """Everything an expression needs from outside of itself.
+
+    A context memoizes the variables, locals and object attributes it
+    evaluates, so it should be discarded once the configuration changes."""
+
+    __slots__ = (
+        "workspace",
+        "file",
+        "variables",
+        "terraform_workspace",
+        "count_index",
+        "each",
+        "_values",
+        "_active",
+        "_dependent",
+        "_reads",
+        "_shared",
+        "_lookups",
+        "cacheable",
+    )
+
+    def __init__(
+        self,
+        workspace: Optional["TerraformWorkspace"] = None,
+        file: Optional["TerraformFile"] = None,
+        variables: Optional[Dict[str, Any]] = None,
+        terraform_workspace: Optional[str] = None,
+        count_index: Optional[int] = None,
+        each: Optional[Tuple[Any, Any]] = None,
+        shared: Optional[Dict[Any, Any]] = None,
+    ):
+        """
+        Args:
+            workspace: the workspace references are looked up in
+            file: the file being evaluated, for expressions that still
+                resolve through the tree walk
+            variables: input variable values, overriding the workspace's
+                variable_values and declared defaults
+            terraform_workspace: value of terraform.workspace; defaults to
+                the workspace of the terraform wrapper, or "default"
+            count_index: value of count.index
+            each: (key, value) of each.key and each.value
+            shared: memoized values that don't depend on the context,
+                shared between contexts over the same configuration
+        """
+        self.workspace = workspace
+        self.file = file
+        self.variables = variables or {}
+        self.terraform_workspace = terraform_workspace
+        self.count_index = count_index
+        self.each = each
+        self._values: Dict[Any, Any] = {}
+        self._active: set = set()
+        # memoized values that read from the context, directly or not
+        self._dependent: set = set()
+        # counts reads of context inputs, to tell which values depend on them
+        self._reads = 0
+        self._shared = shared
+        # every symbol looked up, see Dependencies
+        self._lookups: Dict[Tuple, Any] = {}
+        # cleared when a value was evaluated in a way that can't be tracked
+        self.cacheable = True
+
+    def _memoized(self, key, compute: Callable, *args) -> Any:
+        value = self._values.get(key, _MISSING)
+        if value is not _MISSING:
+            if key in self._dependent:
+                self._reads += 1
+            return value
+        if self._shared is not None:
+            value = self._shared.get(key, _MISSING)
+            if value is not _MISSING:
+                self._values[key] = value
+                return value
+        if key in self._active:
+            # a reference cycle; terraform would reject the configuration
+            return UnresolvedLookup(key[0], key[-1])
+        self._active.add(key)
+        reads = self._reads
+        try:
+            value = compute(*args)
+        finally:
+            self._active.discard(key)
+        self._values[key] = value
+        if self._reads != reads:
+            self._dependent.add(key)
+        elif self._shared is not None:
+            self._shared[key] = value
+        return value
+
+    def _symbol(self, key: Tuple) -> Any:
+        """Look up a symbol, recording it as a dependency"""
+        target = lookup_symbol(self.workspace, key)
+        self._lookups[key] = target
+        return target
+
+    def variable(self, name: str) -> Any:
+        self._reads += 1
+        try:
+            return self.variables[name]
+        except KeyError:
+            pass
+        return self._memoized(("var", name), self._variable_default, name)
+
+    def _variable_default(self, name: str) -> Any:
+        if self.workspace is not None:
+            values = self._symbol(("tfvars",))
+            if values is not None and name in values:
+                return values[name]
+        variable = self._symbol(("var", name))
+        if variable is None:
+            return UnresolvedLookup("var", name)
+        default = variable.render_variables.get("default", _MISSING)
+        if default is _MISSING:
+            return UnresolvedLookup("var", name)
+        return evaluate(default, self)
+
+    def local(self, name: str) -> Any:
+        return self._memoized(("local", name), self._local, name)
+
+    def _local(self, name: str) -> Any:
+        owner = self._symbol(("local", name))
+        if owner is None:
+            return UnresolvedLookup("local", name)
+        return evaluate(owner.render_variables[name], self)
+
+    def terraform(self, name: str) -> Any:
+        if name != "workspace":
+            return UnresolvedLookup("terraform", name)
+        self._reads += 1
+        if self.terraform_workspace is not None:
+            return self.terraform_workspace
+        if self.workspace is None:
+            return "default"
+        return self._symbol(("terraform", "workspace"))
+
+    def count(self, name: str) -> Any:
+        self._reads += 1
+        if name == "index" and self.count_index is not None:
+            return self.count_index
+        return UnresolvedLookup("count", name)
+
+    def each_value(self, name: str) -> Any:
+        self._reads += 1
+        if self.each is not None:
+            if name == "key":
+                return self.each[0]
+            elif name == "value":
+                return self.each[1]
+        return UnresolvedLookup("each", name)
+
+    def path(self, name: str) -> Any:
+        if name in ("module", "root"):
+            return "."
+        elif name == "cwd" and self.workspace is not None:
+            return self.workspace.path
+        return UnresolvedLookup("path", name)
+
+    def module(self, name: str, output: str) -> Any:
+        outputs = self._memoized(("module", name), self._module_outputs, name)
+        if outputs is None or output not in outputs:
+            return UnresolvedLookup(f"module.{name}", output)
+        return outputs[output]
+
+    def _module_outputs(self, name: str) -> Optional[Dict[str, Any]]:
+        call = self._symbol(("module", name))
+        if call is None:
+            return None
+        arguments = call.render_variables
+        if "count" in arguments or "for_each" in arguments:
+            # outputs of each instance would need module.name[key].output
+            return None
+        return self.workspace.module_loader.outputs(call, self)
+
+    def data(self, data_type: str, name: str) -> Any:
+        data = self._symbol(("data", data_type, name))
+        if data is None:
+            return UnresolvedLookup(f"data.{data_type}", name)
+        return data
+
+    def resource(self, resource_type: str, name: str) -> Any:
+        resource = self._symbol(("resource", resource_type, name))
+        if resource is None:
+            return UnresolvedLookup(resource_type, name)
+        return resource
+
+    def attribute(self, object: "TerraformObject", name: str) -> Any:
+        """A configured attribute of another object; anything else is only
+        known after apply."""
+        return self._memoized(
+            ("attribute", id(object), name), self._attribute, object, name
+        )
+
+    def _attribute(self, object: "TerraformObject", name: str) -> Any:
+        value = object.render_variables.get(name, _MISSING)
+        if value is _MISSING:
+            return UnresolvedLookup(object, name)
+        return evaluate(value, self)
+
+
+def lookup_symbol(workspace: Optional["TerraformWorkspace"], key: Tuple) -> Any:
+    """The object a reference such as ("resource", type, name) currently
+    points to, or None. ("tfvars",) is the workspace's table of assigned
+    variable values, ("outputs",) the names of its outputs and
+    ("module_outputs", key) memoized module outputs that are still current."""
+    if workspace is None:
+        raise ValueError("References can only be evaluated within a workspace")
+    kind = key[0]
+    symbols = workspace.symbols
+    try:
+        if kind == "var":
+            return symbols.variable(key[1])
+        elif kind == "local":
+            return symbols.local_object(key[1])
+        elif kind == "resource":
+            return symbols.resources_of_type(key[1])[key[2]]
+        elif kind == "data":
+            return symbols.data_of_type(key[1])[key[2]]
+        elif kind == "module":
+            return symbols.module(key[1])
+        elif kind == "output":
+            return symbols.output(key[1])
+    except KeyError:
+        return None
+    if kind == "terraform":
+        return workspace.terraform.workspace if workspace.terraform else "default"
+    elif kind == "tfvars":
+        return workspace.variable_values
+    elif kind == "outputs":
+        return symbols.output_names()
+    elif kind == "module_outputs":
+        return workspace.module_loader.cached(key[1])
+    raise ValueError(f"Unknown symbol {key}")
+
+
+class Dependencies(object):
+    """The symbols values were evaluated from, and the versions of the
+    objects they pointed to at the time.
+
+    Lookups are repeated to check for changes, so an object being added,
+    deleted or renamed is noticed as well as an object being modified."""
+
+    __slots__ = ("workspace", "symbols")
+
+    def __init__(self, context: EvaluationContext):
+        self.workspace = context.workspace
+        self.symbols = [
+            (key, target, _version(target)) for key, target in context._lookups.items()
+        ]
+
+    def changed(self) -> bool:
+        for key, target, version in self.symbols:
+            current = lookup_symbol(self.workspace, key)
+            if current is not target and current != target:
+                return True
+            if _version(current) != version:
+                return True
+        return False
+
+
+def _version(target: Any) -> Optional[int]:
+    from pyterraformer.core.objects import TerraformObject
+
+    if isinstance(target, TerraformObject):
+        return target._version
+    return None
+
+
+def evaluation_matrix(
+    workspace: Optional["TerraformWorkspace"] = None,
+    file: Optional["TerraformFile"] = None,
+    workspaces: Optional[Iterable[Optional[str]]] = None,
+    var_sets: Optional[Iterable[Dict[str, Any]]] = None,
+) -> Dict[Tuple[str, int], EvaluationContext]:
+    """A context for every combination of terraform workspace and variable
+    set, keyed by (workspace, index of the variable set). The contexts share
+    every value that doesn't depend on either."""
+    shared: Dict[Any, Any] = {}
+    contexts = {}
+    for terraform_workspace, (index, variables) in product(
+        workspaces or [None], enumerate(var_sets or [{}])
+    ):
+        context = EvaluationContext(
+            workspace,
+            file,
+            variables=variables,
+            terraform_workspace=terraform_workspace,
+            shared=shared,
+        )
+        contexts[(context.terraform("workspace"), index)] = context
+    return contexts
+
+
+def evaluate(value: Any, context: EvaluationContext) -> Any:
+    """Evaluate a parsed attribute value, including nested containers"""
+    if isinstance(value, Composite):
+        try:
+            compiled = value._compiled
+        except AttributeError:
+            compiled = compile_node(value)
+        return compiled(context)
+    elif isinstance(value, Node):
+        return compile_node(value)(context)
+    elif isinstance(value, dict):
+        return {
+            evaluate(key, context): evaluate(item, context)
+            for key, item in value.items()
+        }
+    elif isinstance(value, (list, tuple)):
+        return [evaluate(item, context) for item in value]
+    elif isinstance(value, Variable):
+        return context.variable(value.name)
+    return value
+
+
+def compile_node(node: Node) -> Evaluator:
+    """The compiled form of a node, compiled on first use"""
+    if isinstance(node, Composite):
+        try:
+            return node._compiled
+        except AttributeError:
+            compiled = node.compile()
+            _set(node, "_compiled", compiled)
+            return compiled
+    return _compile_leaf(type(node), node)
+
+
+@lru_cache(maxsize=1 << 12)
+def _compile_leaf(_node_type: type, node: Node) -> Evaluator:
+    return node.compile()
+
+
+def compile_value(value: Any) -> Evaluator:
+    """Compile any value that can appear inside an expression"""
+    if isinstance(value, Node):
+        return compile_node(value)
+    elif isinstance(value, Tree):
+        # syntax the parser doesn't build nodes for yet, such as for expressions
+        return constant(UnknownValue(value.data, "unsupported expression"))
+    elif isinstance(value, (list, tuple)):
+        items = [compile_value(item) for item in value]
+        if _constants(items):
+            return constant([item(None) for item in items])
+        return lambda context: [item(context) for item in items]
+    elif isinstance(value, dict):
+        pairs = [(compile_value(k), compile_value(v)) for k, v in value.items()]
+        if _constants(evaluator for pair in pairs for evaluator in pair):
+            return constant({key(None): item(None) for key, item in pairs})
+        return lambda context: {key(context): item(context) for key, item in pairs}
+    return constant(value)
+
+
+class _Constant(object):
+    """A compiled value that doesn't depend on the context"""
+
+    __slots__ = ("value", "mutable")
+
+    def __init__(self, value: Any):
+        self.value = value
+        self.mutable = isinstance(value, (list, dict))
+
+    def __call__(self, context: Optional[EvaluationContext]) -> Any:
+        # callers get their own copy of lists and maps
+        return deepcopy(self.value) if self.mutable else self.value
+
+
+def constant(value: Any) -> Evaluator:
+    return _Constant(value)
+
+
+def _constants(evaluators: Iterable[Evaluator]) -> bool:
+    return all(isinstance(evaluator, _Constant) for evaluator in evaluators)
+
+
+def tree_walk(node: Node) -> Evaluator:
+    """Fallback for nodes without a compiled form"""
+
+    def evaluate_node(context: EvaluationContext):
+        # the tree walk reads the workspace without recording what it used
+        context.cacheable = False
+        return evaluate(
+            node.resolve(context.workspace, context.file, None, None), context
+        )
+
+    return evaluate_node
+
+
+def compile_sequence(items: Tuple) -> Evaluator:
+    """Expression parts, possibly joined by operators"""
+    if len(items) == 1:
+        return compile_value(items[0])
+    tokens = _operation_tokens(items)
+    try:
+        compiled, position = _compile_operation(tokens, 0, 0)
+    except (IndexError, ValueError):
+        compiled, position = None, -1
+    if position != len(tokens):
+        # not an operation the parser fully understood; fall back to the tree
+        return tree_walk(Expression(items))
+    return compiled
+
+
+class _Operator(str):
+    """An operator in a flattened operation"""
+
+
+def _operation_tokens(items) -> List:
+    """Flatten nested parts of an operation into operands and operators.
+
+    The parser doesn't apply precedence, so a * b + c may arrive as a * (b + c)
+    split across BinaryOp, BinaryTerm and Expression nodes."""
+    tokens: List = []
+    for item in items:
+        if isinstance(item, (BinaryOp, BinaryTerm)):
+            tokens.extend(_operation_tokens(item.args))
+        elif isinstance(item, Expression):
+            tokens.extend(_operation_tokens(item.args))
+        elif isinstance(item, BinaryOperator):
+            tokens.append(_Operator(repr(item)))
+        elif (
+            type(item) is int
+            and item < 0
+            and tokens
+            and not isinstance(tokens[-1], _Operator)
+        ):
+            # a - 1 can lex as the operand a followed by the literal -1
+            tokens.extend((_Operator("-"), -item))
+        else:
+            tokens.append(item)
+    return tokens
+
+
+_PRECEDENCE = {
+    "||": 1,
+    "&&": 2,
+    "==": 3,
+    "!=": 3,
+    "<": 4,
+    ">": 4,
+    "<=": 4,
+    ">=": 4,
+    "+": 5,
+    "-": 5,
+    "*": 6,
+    "/": 6,
+    "%": 6,
+}
+
+
+def _compile_operation(tokens: List, position: int, minimum: int):
+    left, position = _compile_operand(tokens, position)
+    while position < len(tokens):
+        token = tokens[position]
+        if not isinstance(token, _Operator):
+            raise ValueError(f"Expected an operator, found {token!r}")
+        precedence = _PRECEDENCE[token]
+        if precedence < minimum:
+            break
+        # operators are left associative
+        right, position = _compile_operation(tokens, position + 1, precedence + 1)
+        left = _compile_binary(token, left, right)
+    return left, position
+
+
+def _compile_operand(tokens: List, position: int):
+    token = tokens[position]
+    if isinstance(token, _Operator):
+        if token not in ("-", "!"):
+            raise ValueError(f"Unexpected operator {token}")
+        operand, position = _compile_operand(tokens, position + 1)
+        return _unary(token, operand), position
+    return compile_value(token), position + 1
+
+
+def _equal(left, right) -> bool:
+    # unlike python, terraform never considers a bool equal to a number
+    if isinstance(left, bool) != isinstance(right, bool):
+        return False
+    return left == right
+
+
+def _arithmetic(function: Callable) -> Callable:
+    return lambda left, right: normalize_number(
+        function(to_number(left), to_number(right))
+    )
+
+
+def _comparison(function: Callable) -> Callable:
+    return lambda left, right: function(to_number(left), to_number(right))
+
+
+_BINARY: Dict[str, Callable] = {
+    "+": _arithmetic(operator.add),
+    "-": _arithmetic(operator.sub),
+    "*": _arithmetic(operator.mul),
+    "/": _arithmetic(operator.truediv),
+    # the remainder takes the sign of the dividend, as in terraform
+    "%": _arithmetic(math.fmod),
+    "<": _comparison(operator.lt),
+    ">": _comparison(operator.gt),
+    "<=": _comparison(operator.le),
+    ">=": _comparison(operator.ge),
+    "==": _equal,
+    "!=": lambda left, right: not _equal(left, right),
+    "&&": lambda left, right: to_bool(left) and to_bool(right),
+    "||": lambda left, right: to_bool(left) or to_bool(right),
+}
+
+_ERRORS = (ValueError, TypeError, KeyError, IndexError, ZeroDivisionError, OSError)
+
+
+def _compile_binary(symbol: str, left: Evaluator, right: Evaluator) -> Evaluator:
+    function = _BINARY[symbol]
+    # a known left hand side can decide a logical operation on its own
+    decisive = {"&&": False, "||": True}.get(symbol)
+
+    def binary(context: EvaluationContext):
+        first = left(context)
+        if isinstance(first, UnresolvedLookup):
+            return first
+        if decisive is not None and first is decisive:
+            return decisive
+        second = right(context)
+        if isinstance(second, UnresolvedLookup):
+            return second
+        try:
+            return function(first, second)
+        except _ERRORS as error:
+            return UnknownValue(symbol, str(error), error=True)
+
+    if _constants((left, right)):
+        return constant(binary(None))
+    return binary
+
+
+def _unary(symbol: str, operand: Evaluator) -> Evaluator:
+    if symbol == "!":
+
+        def function(value):
+            return not to_bool(value)
+
+    else:
+
+        def function(value):
+            return normalize_number(-to_number(value))
+
+    def unary(context: EvaluationContext):
+        value = operand(context)
+        if isinstance(value, UnresolvedLookup):
+            return value
+        try:
+            return function(value)
+        except _ERRORS as error:
+            return UnknownValue(symbol, str(error), error=True)
+
+    if isinstance(operand, _Constant):
+        return constant(unary(None))
+    return unary
+
+
+def compile_unary(symbol: str, operand: Any) -> Evaluator:
+    return _unary(symbol, compile_value(operand))
+
+
+def compile_call(name: str, args) -> Evaluator:
+    """A call to a terraform function, see pyterraformer.core.functions"""
+    compiled = [compile_value(arg) for arg in args]
+    if name in ("try", "can"):
+        return _compile_try(name, compiled)
+    function = FUNCTIONS.get(name)
+    if function is None:
+        return constant(UnknownValue(name, "unsupported function"))
+    with_context = name in CONTEXT_FUNCTIONS
+
+    def call(context: EvaluationContext):
+        values = [arg(context) for arg in compiled]
+        for value in values:
+            if isinstance(value, UnresolvedLookup):
+                return value
+        try:
+            if with_context:
+                # reads files, which aren't tracked
+                context.cacheable = False
+                return function(context, *values)
+            return function(*values)
+        except _ERRORS as error:
+            return UnknownValue(name, str(error), error=True)
+
+    if not with_context and _constants(compiled):
+        return constant(call(None))
+    return call
+
+
+def _compile_try(name: str, compiled: List[Evaluator]) -> Evaluator:
+    def attempt(context: EvaluationContext):
+        failure = UnknownValue(name, "no argument could be evaluated", error=True)
+        for arg in compiled:
+            value = arg(context)
+            if isinstance(value, UnknownValue) and value.error:
+                failure = value
+                continue
+            if name == "can" and not isinstance(value, UnresolvedLookup):
+                return True
+            # values only known after apply keep the result unknown
+            return value
+        return False if name == "can" else failure
+
+    return attempt
+
+
+def compile_template(parts: Tuple) -> Evaluator:
+    """A quoted string, possibly with interpolations"""
+    from pyterraformer.core.generics.interpolation import Interpolation
+
+    if len(parts) == 1 and isinstance(parts[0], Interpolation):
+        # "${...}" on its own keeps the type of the value
+        return compile_node(parts[0])
+    if all(isinstance(part, String) for part in parts):
+        return constant("".join(part.item for part in parts))
+    compiled = [
+        constant(part.item) if isinstance(part, String) else compile_value(part)
+        for part in parts
+    ]
+
+    def render(context: EvaluationContext):
+        values = [part(context) for part in compiled]
+        for value in values:
+            if isinstance(value, UnresolvedLookup):
+                return value
+        return "".join(to_string(value) for value in values)
+
+    if _constants(compiled):
+        return constant(render(None))
+    return render
+
+
+def compile_conditional(condition, true, false) -> Evaluator:
+    condition = compile_value(condition)
+    true = compile_value(true)
+    false = compile_value(false)
+    if isinstance(condition, _Constant):
+        test = condition(None)
+        if not isinstance(test, UnresolvedLookup):
+            return true if test else false
+
+    def conditional(context: EvaluationContext):
+        test = condition(context)
+        if isinstance(test, UnresolvedLookup):
+            return test
+        return true(context) if test else false(context)
+
+    return conditional
+
+
+# reference roots and the number of names each consumes after the root
+_ROOTS: Dict[str, Tuple[int, Callable]] = {
+    "var": (1, EvaluationContext.variable),
+    "local": (1, EvaluationContext.local),
+    "locals": (1, EvaluationContext.local),
+    "terraform": (1, EvaluationContext.terraform),
+    "count": (1, EvaluationContext.count),
+    "each": (1, EvaluationContext.each_value),
+    "path": (1, EvaluationContext.path),
+    "module": (2, EvaluationContext.module),
+    "data": (2, EvaluationContext.data),
+}
+
+
+def _reference_steps(node: PropertyLookup) -> Optional[List[Tuple[str, Any]]]:
+    """Flatten a.b["c"].d into [("attr", "b"), ("index", <c>), ("attr", "d")]"""
+    steps: List[Tuple[str, Any]] = []
+    current: Any = node
+    while isinstance(current, PropertyLookup):
+        if len(current.contents) != 1:
+            return None
+        current = current.property
+        if isinstance(current, PropertyLookup):
+            steps.append(("attr", str(current.base)))
+        elif isinstance(current, (DictLookup, ArrayLookup)):
+            if len(current.contents) != 1 or not isinstance(current.base, String):
+                return None
+            steps.append(("attr", current.base.item))
+            steps.append(("index", compile_value(current.lookup)))
+            return steps
+        elif isinstance(current, String):
+            steps.append(("attr", current.item))
+            return steps
+        else:
+            return None
+    return steps
+
+
+def compile_reference(node: PropertyLookup) -> Evaluator:
+    if not isinstance(node.base, String):
+        return tree_walk(node)
+    steps = _reference_steps(node)
+    if steps is None:
+        return tree_walk(node)
+    root = node.base.item
+    arity, lookup = _ROOTS.get(root, (1, None))
+    names = [value for kind, value in steps[:arity] if kind == "attr"]
+    if len(names) != arity:
+        return tree_walk(node)
+    rest = steps[arity:]
+    if lookup is None:
+        # anything else is a resource type
+        resource_type = root
+
+        def head(context: EvaluationContext):
+            return context.resource(resource_type, *names)
+
+    else:
+
+        def head(context: EvaluationContext):
+            return lookup(context, *names)
+
+    if not rest:
+        return head
+
+    def reference(context: EvaluationContext):
+        value = head(context)
+        for kind, step in rest:
+            if isinstance(value, UnresolvedLookup):
+                return value
+            if kind == "attr":
+                value = _attribute(value, step, context)
+            else:
+                value = _index(value, step(context))
+        return value
+
+    return reference
+
+
+def _attribute(value: Any, name: str, context: EvaluationContext) -> Any:
+    from pyterraformer.core.objects import TerraformObject
+
+    if isinstance(value, TerraformObject):
+        return context.attribute(value, name)
+    elif isinstance(value, dict):
+        try:
+            return value[name]
+        except KeyError:
+            return UnknownValue(name, "no such attribute", error=True)
+    return UnresolvedLookup(value, name)
+
+
+def _index(value: Any, key: Any) -> Any:
+    if isinstance(key, UnresolvedLookup):
+        return key
+    try:
+        return value[key]
+    except (KeyError, IndexError, TypeError):
+        return UnknownValue(key, "invalid index", error=True)
+
+
+def compile_index(node) -> Evaluator:
+    """A standalone x[key], outside of a reference"""
+    base = compile_value(node.base)
+    key = compile_value(node.lookup)
+    return lambda context: _index(base(context), key(context))
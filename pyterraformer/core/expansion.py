@@ -0,0 +1,222 @@
+"""Expansion of count and for_each into resource instances.
+
+Terraform creates one instance of a resource, data source or module for
+each element of its count or for_each argument. Both are evaluated here
+against variables and locals, without running a plan, giving the
+instances terraform would create and each instance's attributes.
+
+    for address, instance in workspace.instances().items():
+        print(address, instance.attributes, instance.unknown)
+
+Attributes only known after apply evaluate to UnresolvedLookup, and are
+listed by ResourceInstance.unknown. When count or for_each itself can't
+be determined, the object expands into a single placeholder instance
+addressed as type.name[*].
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple, TYPE_CHECKING
+
+from pyterraformer.core.evaluation import EvaluationContext, evaluate
+from pyterraformer.core.generics.interpolation import UnresolvedLookup
+
+if TYPE_CHECKING:
+    from pyterraformer.core.objects import TerraformObject
+    from pyterraformer.core.workspace import TerraformWorkspace
+
+# arguments that configure how terraform handles an object, not the object
+_META_ARGUMENTS = frozenset(
+    (
+        "count",
+        "for_each",
+        "depends_on",
+        "lifecycle",
+        "provider",
+        "providers",
+        "provisioner",
+        "connection",
+    )
+)
+
+
+@dataclass
+class ResourceInstance:
+    """One instance of an expanded object.
+
+    key is the count index or for_each key, None for objects using
+    neither, and an UnresolvedLookup when the instances can't be
+    determined until apply."""
+
+    address: str
+    object: "TerraformObject"
+    key: Any = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def known(self) -> bool:
+        """Whether this is a concrete instance rather than a placeholder"""
+        return not isinstance(self.key, UnresolvedLookup)
+
+    @property
+    def unknown(self) -> List[str]:
+        """Paths of the attributes only known after apply, such as
+        tags.owner or ingress[0].cidr_blocks"""
+        return [path for path, _ in _unknown_values(self.attributes, "")]
+
+
+def object_address(object: "TerraformObject") -> Optional[str]:
+    """The address of an object that can be expanded, or None"""
+    from pyterraformer.core.generics import Data
+    from pyterraformer.core.modules import ModuleObject
+    from pyterraformer.core.resources import ResourceObject
+    from pyterraformer.core.symbols import _label
+
+    if isinstance(object, Data):
+        return f"data.{_label(object.type)}.{_label(object.name)}"
+    elif isinstance(object, ModuleObject):
+        return f"module.{_label(object.tf_id)}"
+    elif isinstance(object, ResourceObject):
+        return f"{_label(object._type)}.{_label(object.tf_id)}"
+    return None
+
+
+def expand(
+    object: "TerraformObject",
+    variables: Optional[Dict[str, Any]] = None,
+    terraform_workspace: Optional[str] = None,
+    shared: Optional[Dict[Any, Any]] = None,
+) -> List[ResourceInstance]:
+    """The instances of a resource, data source or module.
+
+    Args:
+        object: the object to expand
+        variables: input variable values, overriding declared defaults
+        terraform_workspace: value of terraform.workspace
+        shared: memoized values to share with other expansions over the
+            same configuration and variables, see EvaluationContext
+    """
+    address = object_address(object)
+    if address is None:
+        raise ValueError(f"{object} can't be expanded into instances")
+    shared = {} if shared is None else shared
+
+    def context(**kwargs) -> EvaluationContext:
+        return EvaluationContext(
+            object._workspace,
+            object._file,
+            variables=variables,
+            terraform_workspace=terraform_workspace,
+            shared=shared,
+            **kwargs,
+        )
+
+    arguments = object.render_variables
+    if "count" in arguments and "for_each" in arguments:
+        raise ValueError(f"{address} sets both count and for_each")
+    if "count" in arguments:
+        keys = _count_keys(address, evaluate(arguments["count"], context()))
+    elif "for_each" in arguments:
+        keys = _for_each_keys(address, evaluate(arguments["for_each"], context()))
+    else:
+        return [ResourceInstance(address, object, None, _attributes(object, context()))]
+    if isinstance(keys, UnresolvedLookup):
+        return [
+            ResourceInstance(
+                f"{address}[*]", object, keys, _attributes(object, context())
+            )
+        ]
+    instances = []
+    for key, each in keys:
+        if each is None:
+            instance_context = context(count_index=key)
+            suffix = f"[{key}]"
+        else:
+            instance_context = context(each=each)
+            suffix = '["{}"]'.format(key.replace("\\", "\\\\").replace('"', '\\"'))
+        instances.append(
+            ResourceInstance(
+                address + suffix, object, key, _attributes(object, instance_context)
+            )
+        )
+    return instances
+
+
+def expand_workspace(
+    workspace: "TerraformWorkspace",
+    variables: Optional[Dict[str, Any]] = None,
+    terraform_workspace: Optional[str] = None,
+) -> Dict[str, ResourceInstance]:
+    """Every instance of every resource, data source and module in a
+    workspace, keyed by address"""
+    shared: Dict[Any, Any] = {}
+    instances: Dict[str, ResourceInstance] = {}
+    for _, file in workspace.files.items():
+        for object in file.objects:
+            if object_address(object) is None:
+                continue
+            for instance in expand(object, variables, terraform_workspace, shared):
+                instances[instance.address] = instance
+    return instances
+
+
+def _attributes(
+    object: "TerraformObject", context: EvaluationContext
+) -> Dict[str, Any]:
+    return {
+        str(key): evaluate(item, context)
+        for key, item in object.render_variables.items()
+        if key not in _META_ARGUMENTS
+    }
+
+
+def _count_keys(address: str, count: Any):
+    if isinstance(count, UnresolvedLookup):
+        return count
+    if isinstance(count, str):
+        try:
+            count = float(count)
+        except ValueError:
+            pass
+    if (
+        isinstance(count, bool)
+        or not isinstance(count, (int, float))
+        or count != int(count)
+        or count < 0
+    ):
+        raise ValueError(f"count of {address} must be a whole number, not {count!r}")
+    return [(index, None) for index in range(int(count))]
+
+
+def _for_each_keys(address: str, value: Any):
+    if isinstance(value, UnresolvedLookup):
+        return value
+    if isinstance(value, dict):
+        items: Iterable[Tuple[Any, Any]] = value.items()
+    elif isinstance(value, (list, tuple, set)):
+        # sets evaluate to lists; each.key and each.value are both the element
+        items = [(element, element) for element in value]
+    else:
+        raise ValueError(
+            f"for_each of {address} must be a map or set of strings, not {value!r}"
+        )
+    keys = {}
+    for key, item in items:
+        if isinstance(key, UnresolvedLookup):
+            return key
+        if not isinstance(key, str):
+            raise ValueError(
+                f"for_each of {address} has a key that isn't a string: {key!r}"
+            )
+        keys[key] = (key, item)
+    return [(key, keys[key]) for key in sorted(keys)]
+
+
+def _unknown_values(value: Any, path: str) -> Iterable[Tuple[str, Any]]:
+    if isinstance(value, UnresolvedLookup):
+        yield path, value
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            yield from _unknown_values(item, f"{path}.{key}" if path else str(key))
+    elif isinstance(value, (list, tuple)):
+        for index, item in enumerate(value):
+            yield from _unknown_values(item, f"{path}[{index}]")
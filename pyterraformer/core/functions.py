@@ -0,0 +1,762 @@
+"""Native implementations of the Terraform function library.
+
+Calls in parsed expressions are evaluated here rather than by shelling out
+to `terraform console`. Functions take and return plain python values:
+strings, numbers, bools, None for null, lists, and dicts for maps and
+objects. Sets are represented as lists without duplicates, sorted when
+their elements are strings, matching the order terraform iterates them in.
+
+Functions raise ValueError, TypeError, KeyError or IndexError for invalid
+arguments; the evaluator turns these into UnknownValue markers. Functions
+that aren't implemented here, or that aren't deterministic such as
+timestamp() or uuid(), evaluate to an UnknownValue as well.
+
+    >>> FUNCTIONS["join"]("-", ["a", "b"])
+    'a-b'
+"""
+
+import base64
+import csv
+import hashlib
+import ipaddress
+import json
+import math
+import os
+import re
+from io import StringIO
+from itertools import product
+from typing import Any, Callable, Dict, List, Optional, Set, TYPE_CHECKING
+from urllib.parse import quote_plus
+
+if TYPE_CHECKING:
+    from pyterraformer.core.evaluation import EvaluationContext
+
+FUNCTIONS: Dict[str, Callable] = {}
+# functions that take the EvaluationContext as their first argument
+CONTEXT_FUNCTIONS: Set[str] = set()
+
+
+def function(name: Optional[str] = None, context: bool = False):
+    """Register a terraform function, by default under its python name"""
+
+    def register(implementation: Callable) -> Callable:
+        registered = name or implementation.__name__.rstrip("_")
+        FUNCTIONS[registered] = implementation
+        if context:
+            CONTEXT_FUNCTIONS.add(registered)
+        return implementation
+
+    return register
+
+
+# type conversion
+
+
+def to_string(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    elif value is None:
+        return ""
+    elif isinstance(value, float):
+        return str(normalize_number(value))
+    return str(value)
+
+
+def to_number(value: Any):
+    if isinstance(value, bool):
+        raise TypeError("a bool is not a number")
+    elif isinstance(value, (int, float)):
+        return value
+    elif isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            return normalize_number(float(value))
+    raise TypeError(f"{value!r} is not a number")
+
+
+def normalize_number(value):
+    """Terraform numbers have no separate integer type, so 4 / 2 is 2"""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def to_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    elif value == "true":
+        return True
+    elif value == "false":
+        return False
+    raise TypeError(f"{value!r} is not a bool")
+
+
+def _list(value: Any) -> List:
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    raise TypeError(f"{value!r} is not a list")
+
+
+def _map(value: Any) -> Dict:
+    if isinstance(value, dict):
+        return value
+    raise TypeError(f"{value!r} is not a map")
+
+
+def _integer(value: Any) -> int:
+    number = to_number(value)
+    if isinstance(number, float):
+        raise ValueError(f"{value!r} is not a whole number")
+    return number
+
+
+def _distinct(values) -> List:
+    distinct: List = []
+    for value in values:
+        if value not in distinct:
+            distinct.append(value)
+    return distinct
+
+
+def _set(values) -> List:
+    values = _distinct(values)
+    if all(isinstance(value, str) for value in values):
+        values.sort()
+    return values
+
+
+@function()
+def tostring(value):
+    if value is None:
+        return None
+    if isinstance(value, (list, dict)):
+        raise TypeError("collections can't be converted to a string")
+    return to_string(value)
+
+
+@function()
+def tonumber(value):
+    return None if value is None else to_number(value)
+
+
+@function()
+def tobool(value):
+    return None if value is None else to_bool(value)
+
+
+@function()
+def tolist(value):
+    return None if value is None else _list(value)
+
+
+@function()
+def toset(value):
+    return None if value is None else _set(_list(value))
+
+
+@function()
+def tomap(value):
+    return None if value is None else dict(_map(value))
+
+
+# numbers
+
+
+@function("abs")
+def abs_(number):
+    return abs(to_number(number))
+
+
+@function()
+def ceil(number):
+    return math.ceil(to_number(number))
+
+
+@function()
+def floor(number):
+    return math.floor(to_number(number))
+
+
+@function()
+def log(number, base):
+    return normalize_number(math.log(to_number(number), to_number(base)))
+
+
+@function("max")
+def max_(*numbers):
+    return max(to_number(number) for number in numbers)
+
+
+@function("min")
+def min_(*numbers):
+    return min(to_number(number) for number in numbers)
+
+
+@function("pow")
+def pow_(number, power):
+    return normalize_number(math.pow(to_number(number), to_number(power)))
+
+
+@function()
+def signum(number):
+    number = to_number(number)
+    return (number > 0) - (number < 0)
+
+
+@function()
+def parseint(number, base):
+    return int(number, _integer(base))
+
+
+# strings
+
+
+@function()
+def chomp(string):
+    return re.sub(r"(\r\n|\n|\r)+$", "", string)
+
+
+@function()
+def endswith(string, suffix):
+    return string.endswith(suffix)
+
+
+@function()
+def startswith(string, prefix):
+    return string.startswith(prefix)
+
+
+@function()
+def strcontains(string, substring):
+    return substring in string
+
+
+_FORMAT_VERB = re.compile(
+    r"%(?:(%)|([-+# 0]*)(?:\[(\d+)\])?(\d+)?(?:\.(\d+))?([a-zA-Z]))"
+)
+
+
+def _format_value(value, flags: str, width: str, precision: str, verb: str) -> str:
+    if verb == "v":
+        if "#" in flags or isinstance(value, (list, dict)):
+            text = jsonencode(value)
+        else:
+            text = to_string(value) if value is not None else "null"
+    elif verb == "s":
+        if isinstance(value, (list, dict)):
+            raise TypeError("%s can only format primitive values")
+        text = to_string(value)
+    elif verb == "q":
+        text = json.dumps(tostring(value))
+    elif verb == "t":
+        text = to_string(to_bool(value))
+    elif verb in "dboxXeEfgG":
+        number = to_number(value)
+        if verb in "dboxX":
+            number = _integer(number)
+        spec = "<" if "-" in flags else ""
+        spec += "+" if "+" in flags else " " if " " in flags else ""
+        spec += "#" if "#" in flags and verb in "boxX" else ""
+        spec += "0" if "0" in flags and "-" not in flags else ""
+        spec += width or ""
+        spec += f".{precision}" if precision and verb in "eEfgG" else ""
+        return format(number, spec + verb)
+    else:
+        raise ValueError(f"unsupported format verb %{verb}")
+    if precision:
+        text = text[: int(precision)]
+    if width:
+        text = text.ljust(int(width)) if "-" in flags else text.rjust(int(width))
+    return text
+
+
+@function("format")
+def format_(spec, *args):
+    position = 0
+
+    def replace(match):
+        nonlocal position
+        if match.group(1):
+            return "%"
+        flags, index, width, precision, verb = match.groups()[1:]
+        if index:
+            position = int(index) - 1
+        if position >= len(args):
+            raise ValueError("not enough arguments for the format string")
+        value = args[position]
+        position += 1
+        return _format_value(value, flags, width, precision, verb)
+
+    return _FORMAT_VERB.sub(replace, spec)
+
+
+@function()
+def formatlist(spec, *args):
+    lengths = {len(arg) for arg in args if isinstance(arg, list)}
+    if len(lengths) > 1:
+        raise ValueError("all list arguments must have the same length")
+    if not lengths:
+        return [format_(spec, *args)]
+    return [
+        format_(spec, *(arg[i] if isinstance(arg, list) else arg for arg in args))
+        for i in range(lengths.pop())
+    ]
+
+
+@function()
+def indent(spaces, string):
+    return string.replace("\n", "\n" + " " * _integer(spaces))
+
+
+@function()
+def join(separator, *lists):
+    return separator.join(to_string(item) for items in lists for item in _list(items))
+
+
+@function()
+def lower(string):
+    return string.lower()
+
+
+@function()
+def upper(string):
+    return string.upper()
+
+
+@function()
+def title(string):
+    return re.sub(r"(?<![^\W_])[^\W\d_]", lambda match: match.group().upper(), string)
+
+
+def _match_result(match):
+    if match.re.groupindex:
+        return match.groupdict()
+    elif match.re.groups:
+        return list(match.groups())
+    return match.group()
+
+
+@function()
+def regex(pattern, string):
+    match = re.search(pattern, string)
+    if match is None:
+        raise ValueError("pattern did not match")
+    return _match_result(match)
+
+
+@function()
+def regexall(pattern, string):
+    return [_match_result(match) for match in re.finditer(pattern, string)]
+
+
+@function()
+def replace(string, substring, replacement):
+    if len(substring) > 1 and substring.startswith("/") and substring.endswith("/"):
+        # terraform regex replacements refer to groups as $1 or ${name}
+        replacement = re.sub(r"\$\{(\w+)\}|\$(\d+)", r"\\g<\1\2>", replacement)
+        return re.sub(substring[1:-1], replacement, string)
+    return string.replace(substring, replacement)
+
+
+@function()
+def split(separator, string):
+    return string.split(separator)
+
+
+@function()
+def strrev(string):
+    return string[::-1]
+
+
+@function()
+def substr(string, offset, length):
+    offset, length = _integer(offset), _integer(length)
+    if offset < 0:
+        offset += len(string)
+    if length < 0:
+        return string[offset:]
+    return string[offset : offset + length]
+
+
+@function()
+def trim(string, characters):
+    return string.strip(characters)
+
+
+@function()
+def trimprefix(string, prefix):
+    return string[len(prefix) :] if prefix and string.startswith(prefix) else string
+
+
+@function()
+def trimsuffix(string, suffix):
+    return string[: -len(suffix)] if suffix and string.endswith(suffix) else string
+
+
+@function()
+def trimspace(string):
+    return string.strip()
+
+
+# collections
+
+
+@function()
+def alltrue(values):
+    return all(to_bool(value) for value in _list(values))
+
+
+@function()
+def anytrue(values):
+    return any(to_bool(value) for value in _list(values))
+
+
+@function()
+def chunklist(values, size):
+    values, size = _list(values), _integer(size)
+    if size == 0:
+        return [values]
+    return [values[i : i + size] for i in range(0, len(values), size)]
+
+
+@function()
+def coalesce(*values):
+    for value in values:
+        if value is not None and value != "":
+            return value
+    raise ValueError("no non-null, non-empty arguments")
+
+
+@function()
+def coalescelist(*lists):
+    for values in lists:
+        if _list(values):
+            return values
+    raise ValueError("no non-empty lists")
+
+
+@function()
+def compact(values):
+    return [value for value in _list(values) if value is not None and value != ""]
+
+
+@function()
+def concat(*lists):
+    return [item for items in lists for item in _list(items)]
+
+
+@function()
+def contains(values, value):
+    return value in _list(values)
+
+
+@function()
+def distinct(values):
+    return _distinct(_list(values))
+
+
+@function()
+def element(values, index):
+    values = _list(values)
+    if not values:
+        raise IndexError("cannot use element function with an empty list")
+    index = _integer(index)
+    if index < 0:
+        raise IndexError("cannot use element function with a negative index")
+    return values[index % len(values)]
+
+
+@function()
+def flatten(values):
+    flat = []
+    for value in _list(values):
+        if isinstance(value, (list, tuple)):
+            flat.extend(flatten(value))
+        else:
+            flat.append(value)
+    return flat
+
+
+@function()
+def index(values, value):
+    return _list(values).index(value)
+
+
+@function()
+def keys(mapping):
+    return sorted(_map(mapping))
+
+
+@function()
+def values(mapping):
+    mapping = _map(mapping)
+    return [mapping[key] for key in sorted(mapping)]
+
+
+@function()
+def length(value):
+    if isinstance(value, (str, list, tuple, dict)):
+        return len(value)
+    raise TypeError(f"{value!r} has no length")
+
+
+@function()
+def lookup(mapping, key, *default):
+    mapping = _map(mapping)
+    if key in mapping:
+        return mapping[key]
+    elif default:
+        return default[0]
+    raise KeyError(key)
+
+
+@function()
+def matchkeys(values, keys, searchset):
+    values, keys, searchset = _list(values), _list(keys), _list(searchset)
+    if len(values) != len(keys):
+        raise ValueError("values and keys must have the same length")
+    return [value for value, key in zip(values, keys) if key in searchset]
+
+
+@function()
+def merge(*mappings):
+    merged: Dict = {}
+    for mapping in mappings:
+        if mapping is not None:
+            merged.update(_map(mapping))
+    return merged
+
+
+@function()
+def one(values):
+    values = _list(values)
+    if len(values) > 1:
+        raise ValueError("must be a list with no more than one element")
+    return values[0] if values else None
+
+
+@function("range")
+def range_(*args):
+    args = [to_number(arg) for arg in args]
+    if len(args) == 1:
+        start, stop, step = 0, args[0], 1
+    elif len(args) == 2:
+        start, stop, step = args[0], args[1], 1 if args[1] >= args[0] else -1
+    elif len(args) == 3:
+        start, stop, step = args
+    else:
+        raise TypeError("range takes between one and three arguments")
+    if step == 0:
+        raise ValueError("step must not be zero")
+    result = []
+    value = start
+    while (value < stop) if step > 0 else (value > stop):
+        result.append(normalize_number(value))
+        value += step
+    return result
+
+
+@function()
+def reverse(values):
+    return _list(values)[::-1]
+
+
+@function()
+def setintersection(first, *others):
+    return _set(item for item in _list(first) if all(item in _list(o) for o in others))
+
+
+@function()
+def setproduct(*sets):
+    return [list(items) for items in product(*(_list(values) for values in sets))]
+
+
+@function()
+def setsubtract(first, second):
+    second = _list(second)
+    return _set(item for item in _list(first) if item not in second)
+
+
+@function()
+def setunion(*sets):
+    return _set(item for values in sets for item in _list(values))
+
+
+@function("slice")
+def slice_(values, start, end):
+    return _list(values)[_integer(start) : _integer(end)]
+
+
+@function("sort")
+def sort_(values):
+    return sorted(to_string(value) for value in _list(values))
+
+
+@function("sum")
+def sum_(values):
+    values = _list(values)
+    if not values:
+        raise ValueError("cannot sum an empty list")
+    return normalize_number(sum(to_number(value) for value in values))
+
+
+@function()
+def transpose(mapping):
+    transposed: Dict[str, List] = {}
+    for key in sorted(_map(mapping)):
+        for value in _list(mapping[key]):
+            transposed.setdefault(value, []).append(key)
+    return transposed
+
+
+@function()
+def zipmap(keys, values):
+    keys, values = _list(keys), _list(values)
+    if len(keys) != len(values):
+        raise ValueError("keys and values must have the same length")
+    return dict(zip(keys, values))
+
+
+# encoding
+
+
+@function()
+def base64encode(string):
+    return base64.b64encode(string.encode()).decode()
+
+
+@function()
+def base64decode(string):
+    return base64.b64decode(string).decode()
+
+
+@function()
+def jsonencode(value):
+    return json.dumps(value, separators=(",", ":"), sort_keys=True)
+
+
+@function()
+def jsondecode(string):
+    return json.loads(string)
+
+
+@function()
+def csvdecode(string):
+    return list(csv.DictReader(StringIO(string)))
+
+
+@function()
+def urlencode(string):
+    return quote_plus(string)
+
+
+# hashing
+
+
+def _digest(name: str):
+    def hexdigest(string):
+        return hashlib.new(name, string.encode()).hexdigest()
+
+    def base64digest(string):
+        return base64.b64encode(hashlib.new(name, string.encode()).digest()).decode()
+
+    function(name)(hexdigest)
+    if name in ("sha256", "sha512"):
+        function(f"base64{name}")(base64digest)
+
+
+for _algorithm in ("md5", "sha1", "sha256", "sha512"):
+    _digest(_algorithm)
+
+
+# networking
+
+
+def _network(prefix):
+    return ipaddress.ip_network(prefix, strict=False)
+
+
+@function()
+def cidrhost(prefix, hostnum):
+    network = _network(prefix)
+    hostnum = _integer(hostnum)
+    if hostnum >= network.num_addresses or -hostnum > network.num_addresses:
+        raise ValueError(f"prefix {prefix} has no host number {hostnum}")
+    return str(network[hostnum])
+
+
+@function()
+def cidrnetmask(prefix):
+    network = _network(prefix)
+    if network.version != 4:
+        raise ValueError("only IPv4 prefixes have a netmask")
+    return str(network.netmask)
+
+
+@function()
+def cidrsubnet(prefix, newbits, netnum):
+    network = _network(prefix)
+    new_prefix = network.prefixlen + _integer(newbits)
+    netnum = _integer(netnum)
+    if new_prefix > network.max_prefixlen or netnum >= 2 ** _integer(newbits):
+        raise ValueError(f"prefix {prefix} has no subnet {netnum}")
+    size = 2 ** (network.max_prefixlen - new_prefix)
+    address = network.network_address + netnum * size
+    return str(ipaddress.ip_network(f"{address}/{new_prefix}"))
+
+
+@function()
+def cidrsubnets(prefix, *newbits):
+    network = _network(prefix)
+    address_type = type(network.network_address)
+    address = int(network.network_address)
+    subnets = []
+    for bits in newbits:
+        new_prefix = network.prefixlen + _integer(bits)
+        size = 2 ** (network.max_prefixlen - new_prefix)
+        # each subnet starts on the next boundary of its own size
+        address = -(-address // size) * size
+        subnet = ipaddress.ip_network(f"{address_type(address)}/{new_prefix}")
+        if not subnet.subnet_of(network):
+            raise ValueError(f"not enough remaining address space in {prefix}")
+        subnets.append(str(subnet))
+        address += size
+    return subnets
+
+
+# filesystem
+
+
+@function()
+def basename(path):
+    return os.path.basename(path)
+
+
+@function()
+def dirname(path):
+    return os.path.dirname(path)
+
+
+def _path(context: "EvaluationContext", path: str) -> str:
+    # relative paths are relative to the root module, like terraform's cwd
+    if context.workspace is not None and not os.path.isabs(path):
+        return os.path.join(context.workspace.path, path)
+    return path
+
+
+@function(context=True)
+def file(context, path):
+    with open(_path(context, path)) as handle:
+        return handle.read()
+
+
+@function(context=True)
+def fileexists(context, path):
+    return os.path.isfile(_path(context, path))
+
+
+@function(context=True)
+def filebase64(context, path):
+    with open(_path(context, path), "rb") as handle:
+        return base64.b64encode(handle.read()).decode()
@@ -24,6 +24,7 @@ from .interpolation import (
     Symlink,
     LegacySplat,
     ToSet,
+    UnaryOp,
 )
 from .literal import Literal
 from .local import Local
@@ -73,4 +74,5 @@ __all__ = [
     "Symlink",
     "LegacySplat",
     "ToSet",
+    "UnaryOp",
 ]
@@ -1,13 +1,21 @@
-from pyterraformer.core.objects import TerraformObject
+from typing import Optional
+
+from pyterraformer.core.objects import TerraformObject, ObjectMetadata
 
 
 class Data(TerraformObject):
     _type = "data"
 
-    def __init__(self, name, type, text, attributes):
-        self.name = str(name).replace('"', "")
-        self.type = str(type).replace('"', "")
-        TerraformObject.__init__(self, self._type, text, attributes)
+    def __init__(
+        self, tf_id, data_type, _metadata: Optional[ObjectMetadata] = None, **kwargs
+    ):
+        # label arguments are named so they can't collide with data source
+        # attributes such as name or type
+        self.name = str(tf_id).replace('"', "")
+        self.type = str(data_type).replace('"', "")
+        TerraformObject.__init__(
+            self, self._type, self.name, _metadata=_metadata, **kwargs
+        )
 
     def __repr__(self):
         return (
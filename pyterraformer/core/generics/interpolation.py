@@ -18,12 +18,13 @@ StringLit
             PropertyLookup -> Resolve Left to Right
 """
 
-from copy import deepcopy
 from dataclasses import dataclass
-from typing import Any, Optional, List, TYPE_CHECKING
+from typing import Any, Callable, Dict, Optional, List, TYPE_CHECKING
 
 if TYPE_CHECKING:
+    from pyterraformer.core.evaluation import EvaluationContext
     from pyterraformer.core.namespace import TerraformFile
+    from pyterraformer.core.symbols import SymbolTable
     from pyterraformer.core.workspace import TerraformWorkspace
 
 
@@ -33,11 +34,114 @@ class UnresolvedLookup:
     property: Any
 
 
+@dataclass
+class UnknownValue(UnresolvedLookup):
+    """A value that can't be evaluated natively, such as the result of a
+    function that isn't supported. base names the function or operator and
+    property describes why. error is set when evaluation failed on invalid
+    arguments, which try() and can() recover from."""
+
+    error: bool = False
+
+
 class Resolvable:
+    __slots__ = ()
+
     def resolve(self, workspace, file, parent, parent_instance):
         return self
 
 
+_set = object.__setattr__
+
+
+class Node(Resolvable):
+    """Base class of parsed expression nodes.
+
+    Nodes are immutable once constructed, so resolving never needs to copy
+    them and they are safe to share between objects and files."""
+
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} nodes are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} nodes are immutable")
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __getstate__(self):
+        # cached values are rebuilt on demand rather than stored
+        return {
+            name: getattr(self, name)
+            for name in _node_slots(type(self))
+            if hasattr(self, name)
+        }
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            _set(self, name, value)
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return repr(self) == repr(other)
+
+    def __hash__(self):
+        # strings cache their own hash, so this is only computed once
+        return hash(repr(self))
+
+    def compile(self) -> Callable[["EvaluationContext"], Any]:
+        """Compile to a function of an EvaluationContext, see
+        pyterraformer.core.evaluation. Nodes without a compiled form
+        fall back to resolving through the tree."""
+        from pyterraformer.core.evaluation import tree_walk
+
+        return tree_walk(self)
+
+
+class Composite(Node):
+    """A node built from other nodes. Its canonical string, used for
+    rendering, equality and hashing, is computed once and cached, as
+    is its compiled form."""
+
+    __slots__ = ("_repr", "_compiled")
+
+    def _render(self) -> str:
+        raise NotImplementedError
+
+    def __repr__(self):
+        try:
+            return self._repr
+        except AttributeError:
+            pass
+        rendered = self._render()
+        _set(self, "_repr", rendered)
+        return rendered
+
+
+_NODE_SLOT_CACHE: Dict[type, tuple] = {}
+
+
+def _node_slots(cls: type) -> tuple:
+    try:
+        return _NODE_SLOT_CACHE[cls]
+    except KeyError:
+        pass
+    slots = tuple(
+        name
+        for klass in reversed(cls.__mro__)
+        for name in getattr(klass, "__slots__", ())
+        if not name.startswith("_")
+    )
+    _NODE_SLOT_CACHE[cls] = slots
+    return slots
+
+
 def _resolver_function(arg, workspace, file, parent, parent_instance):
     if isinstance(arg, Resolvable):
         resolved = arg.resolve(workspace, file, parent, parent_instance)
@@ -50,6 +154,13 @@ def _resolver_function(arg, workspace, file, parent, parent_instance):
         return arg
 
 
+def _evaluate(node, workspace, file):
+    """Resolve a node through native evaluation"""
+    from pyterraformer.core.evaluation import EvaluationContext, evaluate
+
+    return evaluate(node, EvaluationContext(workspace, file))
+
+
 def variable_helper(arg, workspace, file, parent, parent_instance):
     from pyterraformer.core.generics.variables import Variable
 
@@ -58,93 +169,118 @@ def variable_helper(arg, workspace, file, parent, parent_instance):
     return arg
 
 
-class FileLookupInstantiator(Resolvable):
-    def __init__(self, workspace: "TerraformWorkspace"):
-        for key, file in workspace.files.items():
-            for object in file.objects:
-                if hasattr(object, "tf_id"):
-                    setattr(self, object.tf_id, object)
-                if hasattr(object, "_name"):
-                    setattr(self, object._name, object)
+class _SymbolLookup(Resolvable):
+    """Base for the reference prefixes resolved through a workspace symbol table"""
 
+    __slots__ = ("symbols",)
 
-class FileObjectLookupInstantiator(Resolvable):
-    def __init__(self, workspace: "TerraformWorkspace"):
-        # TODO: 2022-06-05 figure out how to do this bette
-        from pyterraformer.core.namespace import LazyFile
-
-        self.workspace = workspace
-        objects = []
-        for key, file in self.workspace.files.items():
-            if isinstance(file, LazyFile):
-                file = file.resolve()
-                workspace.files[key] = file
-
-            for object in file.objects:
-                objects.append(object)
-        self.objects = objects
+    def __init__(self, symbols: "SymbolTable"):
+        self.symbols = symbols
+
+    def _lookup(self, item):
+        raise NotImplementedError
 
     def __getattr__(self, item):
-        return FileObjectSubClassLookupInstantiator(
-            [
-                obj
-                for obj in self.objects
-                if hasattr(obj, "_type") and obj._type == str(item)
-            ]
-        )
+        if item.startswith("__") or item == "symbols":
+            raise AttributeError(item)
+        try:
+            return self._lookup(item)
+        except KeyError:
+            raise AttributeError(item)
+
+
+class FileLookupInstantiator(_SymbolLookup):
+    """module.<name>"""
+
+    __slots__ = ()
+
+    def _lookup(self, item):
+        return self.symbols.module(item)
+
+
+class FileObjectLookupInstantiator(_SymbolLookup):
+    """<resource type>.<name>"""
+
+    __slots__ = ()
+
+    def __getattr__(self, item):
+        if item.startswith("__") or item == "symbols":
+            raise AttributeError(item)
+        return self.symbols.anchor(str(item))
 
 
 class FileObjectSubClassLookupInstantiator(Resolvable):
-    def __init__(self, obj_list):
-        self.obj_list = obj_list
+    __slots__ = ("objects",)
+
+    def __init__(self, objects: Dict[str, Any]):
+        self.objects = objects
 
     def __getattr__(self, item):
+        if item.startswith("__") or item == "objects":
+            raise AttributeError(item)
         try:
-            return [obj for obj in self.obj_list if obj.tf_id == item][0]
-        except IndexError:
+            return self.objects[item]
+        except KeyError:
             return f"<could not compute {item} from file lookup>"
 
 
-class DataLookupInstantiator(Resolvable):
-    def __init__(self, workspace: "TerraformWorkspace"):
-        self.workspace = workspace
+class DataLookupInstantiator(_SymbolLookup):
+    """data.<type>.<name>"""
 
-    def __getattr__(self, item):
-        return DataSubClassLookupInstantiator(
-            [
-                obj
-                for obj in self.workspace.data
-                if hasattr(obj, "type") and obj.type == str(item)
-            ]
-        )
+    __slots__ = ()
+
+    def _lookup(self, item):
+        return DataSubClassLookupInstantiator(self.symbols.data_of_type(str(item)))
 
 
 class DataSubClassLookupInstantiator(Resolvable):
-    def __init__(self, obj_list):
-        self.obj_list = obj_list
+    __slots__ = ("objects",)
+
+    def __init__(self, objects: Dict[str, Any]):
+        self.objects = objects
 
     def __getattr__(self, item):
-        return [obj for obj in self.obj_list if obj.name == item][0]
+        if item.startswith("__") or item == "objects":
+            raise AttributeError(item)
+        try:
+            return self.objects[item]
+        except KeyError:
+            raise AttributeError(item)
 
 
-class VariableLookupInstantiator(Resolvable):
-    def __init__(self, workspace: "TerraformWorkspace"):
-        for key, value in workspace.variables.items():
-            setattr(self, key, value)
+class VariableLookupInstantiator(_SymbolLookup):
+    """var.<name>"""
+
+    __slots__ = ()
+
+    def _lookup(self, item):
+        # assigned values take precedence over the declared default
+        values = self.symbols.workspace.variable_values
+        if values is not None and item in values:
+            return values[item]
+        return self.symbols.variable(item)
 
 
 class TerraformLookupInstantiator(Resolvable):
+    __slots__ = ("_workspace",)
+
     def __init__(self, workspace: "TerraformWorkspace"):
-        if workspace.terraform:
-            self.workspace = workspace.terraform.workspace
-        else:
-            self.workspace = "undefined"
+        self._workspace = workspace
 
+    @property
+    def workspace(self):
+        if self._workspace.terraform:
+            return self._workspace.terraform.workspace
+        return "undefined"
+
+
+class LocalLookupInstantiator(_SymbolLookup):
+    """local.<name>"""
 
-class LocalLookupInstantiator(Resolvable):
-    def __init__(self, file: "TerraformFile"):
-        for key, value in file.locals.items():
-            setattr(self, key, value)
+    __slots__ = ()
+
+    def _lookup(self, item):
+        return self.symbols.local(item)
 
 
 class CountLookupInstantiator(Resolvable):
@@ -156,21 +292,26 @@ class CountLookupInstantiator(Resolvable):
         return 1
 
 
-class Interpolation(Resolvable):
+class Interpolation(Composite):
+    __slots__ = ("contents",)
+
     def __init__(self, contents):
-        self.contents = contents
+        _set(self, "contents", tuple(contents))
 
-    def __repr__(self):
+    def _render(self):
         return "${{{}}}".format("".join([f"{val.__repr__()}" for val in self.contents]))
 
+    def compile(self):
+        from pyterraformer.core.evaluation import compile_sequence
+
+        return compile_sequence(self.contents)
+
     def resolve(self, workspace, file, parent=None, parent_instance=None):
         parent = None
         # an interpolation always resets parent_instances
         parent_instance = self
-        resolve = deepcopy(self.contents)
         resolved = []
-        while resolve:
-            next = resolve.pop(0)
+        for next in self.contents:
             parent = _resolver_function(next, workspace, file, parent, parent_instance)
             resolved.append(parent)
             parent_instance = next
@@ -179,61 +320,80 @@ class Interpolation(Resolvable):
         return parent
 
 
-class DictLookup(Resolvable):
+class DictLookup(Composite):
+    __slots__ = ("base", "contents", "lookup")
+
     def __init__(self, base, lookup):
-        self.base = base
+        _set(self, "base", base)
         # TODO don't return a list here
-        self.contents = lookup
+        _set(self, "contents", tuple(lookup))
         # the lookup will be a nested list
-        self.lookup = lookup[0]
+        _set(self, "lookup", lookup[0])
 
-    def __repr__(self):
+    def _render(self):
         return f"{self.base.__repr__()}[{self.lookup.__repr__()}]"
 
+    def compile(self):
+        from pyterraformer.core.evaluation import compile_index
+
+        return compile_index(self)
+
     def resolve(self, workspace, file, parent=None, parent_instance=None):
         """ex: bigquery_processing_project["${terraform.workspace}"]
         to resolve a dict lookup
         we will resolve the lookup, then
         """
         parent = parent or self.base
-        lookup = deepcopy(self.lookup)
-        lookup = lookup.resolve(workspace, file, None, self)
+        lookup = self.lookup.resolve(workspace, file, None, self)
         results = parent[lookup]
         return _resolver_function(results, workspace, file, None, self)
 
 
-class ArrayLookup(Resolvable):
+class ArrayLookup(Composite):
+    __slots__ = ("base", "contents", "lookup")
+
     def __init__(self, base, lookup):
-        self.base = base
+        _set(self, "base", base)
         # TODO don't return a list here
-        self.contents = lookup
+        _set(self, "contents", tuple(lookup))
         # the lookup will be a nested list
-        self.lookup = lookup[0]
+        _set(self, "lookup", lookup[0])
 
-    def __repr__(self):
+    def _render(self):
         return f"{self.base.__repr__()}[{self.lookup.__repr__()}]"
 
+    def compile(self):
+        from pyterraformer.core.evaluation import compile_index
+
+        return compile_index(self)
+
     def resolve(self, workspace, file, parent=None, parent_instance=None):
         """ex: bigquery_processing_project["${terraform.workspace}"]
         to resolve a dict lookup
         we will resolve the lookup, then
         """
         parent = parent or self.base
-        lookup = deepcopy(self.lookup)
-        lookup = int(lookup.resolve(workspace, file, None, self))
+        lookup = int(self.lookup.resolve(workspace, file, None, self))
         results = parent[lookup]
         return _resolver_function(results, workspace, file, None, self)
 
 
-class PropertyLookup(Resolvable):
+class PropertyLookup(Composite):
+    __slots__ = ("base", "contents", "property")
+
     def __init__(self, base, attributes: List):
-        self.base = base
-        self.contents = attributes
-        self.property = attributes[0]
+        _set(self, "base", base)
+        _set(self, "contents", tuple(attributes))
+        _set(self, "property", attributes[0])
 
-    def __repr__(self):
+    def _render(self):
         return "{}.{}".format(self.base.__repr__(), self.property.__repr__())
 
+    def compile(self):
+        from pyterraformer.core.evaluation import compile_reference
+
+        return compile_reference(self)
+
     def resolve(
         self,
         workspace: "TerraformWorkspace",
@@ -242,21 +402,15 @@ class PropertyLookup(Resolvable):
         parent_instance: Optional[Resolvable] = None,
     ):
 
+        if self.base == "module" and not parent:
+            # module outputs need the module loaded and its inputs bound
+            return _evaluate(self, workspace, file)
         anchor = parent or self.base
-        if self.base == "module":
-            anchor = FileLookupInstantiator(workspace)
-        elif self.base == "var":
-            anchor = VariableLookupInstantiator(workspace)
-        elif self.base == "terraform":
-            anchor = TerraformLookupInstantiator(workspace)
-        elif self.base == "data":
-            anchor = DataLookupInstantiator(workspace)
-        elif self.base == "locals":
-            anchor = LocalLookupInstantiator(file)
-        elif self.base == "count":
+        if self.base == "count":
             anchor = CountLookupInstantiator()
-        elif not parent:
-            anchor = getattr(FileObjectLookupInstantiator(workspace), str(self.base))
+        elif self.base in _SYMBOL_PREFIXES or not parent:
+            # named references are resolved through the cached symbol table
+            anchor = workspace.symbols.anchor(str(self.base))
         # the lookup could be another property or a dictionary
         # in either case, pull out the base value and look that up immediately
         # then pass forward
@@ -273,9 +427,14 @@ class PropertyLookup(Resolvable):
                 return UnresolvedLookup(anchor, self.property)
 
 
-class StringLit(Resolvable):
+_SYMBOL_PREFIXES = frozenset(("module", "var", "terraform", "data", "local", "locals"))
+
+
+class StringLit(Composite):
+    __slots__ = ("contents", "_unquoted")
+
     def __init__(self, contents: List):
-        self.contents = contents
+        _set(self, "contents", tuple(contents))
 
     @property
     def string(self) -> str:
@@ -285,17 +444,36 @@ class StringLit(Resolvable):
         return self.string.__add__(v)
 
     def __hash__(self):
-        return hash(str(self))
+        return hash(repr(self))
 
     def split(self, splitter: str = " "):
         return str(self.contents).split(splitter)
 
+    @property
+    def unquoted(self) -> str:
+        try:
+            return self._unquoted
+        except AttributeError:
+            pass
+        unquoted = repr(self).replace('"', "")
+        _set(self, "_unquoted", unquoted)
+        return unquoted
+
     def __eq__(self, other):
-        return str(self).replace('"', "") == str(other) or str(self) == str(other)
+        if isinstance(other, StringLit):
+            other = repr(other)
+        else:
+            other = str(other)
+        return self.unquoted == other or repr(self) == other
 
-    def __repr__(self):
+    def _render(self):
         return '"{}"'.format("".join([val.__repr__() for val in self.contents]))
 
+    def compile(self):
+        from pyterraformer.core.evaluation import compile_template
+
+        return compile_template(self.contents)
+
     def resolve(self, workspace, file, parent=None, parent_instance=None):
         return "".join(
             [
@@ -313,19 +491,29 @@ class StringLit(Resolvable):
         )
 
 
-class String(Resolvable):
+class String(Node):
+    __slots__ = ("item",)
+
     def __init__(self, item):
-        self.item = item
+        _set(self, "item", item)
 
     def __eq__(self, other):
-        return str(self) == str(other)
+        if isinstance(other, String):
+            return self.item == other.item
+        return self.item == str(other)
 
     def __hash__(self):
-        return hash(str(self))
+        return hash(self.item)
 
     def __repr__(self):
         return self.item
 
+    def compile(self):
+        from pyterraformer.core.evaluation import constant
+
+        # a bare identifier; null is the only one that is a value
+        return constant(None if self.item == "null" else self.item)
+
     def resolve(self, workspace, file, parent=None, parent_instance=None):
         if isinstance(parent_instance, PropertyLookup):
             resolved = PropertyLookup(self.item).resolve(
@@ -335,151 +523,138 @@ class String(Resolvable):
         return self.item
 
 
-class File(Resolvable):
+class File(Composite):
+    __slots__ = ("item",)
+
     def __init__(self, item):
-        self.item = item[0] if isinstance(item, list) else item
+        _set(self, "item", item[0] if isinstance(item, list) else item)
 
-    def __repr__(self):
+    def _render(self):
         return "file({})".format(self.item.__repr__())
 
+    def compile(self):
+        from pyterraformer.core.evaluation import compile_call
+
+        return compile_call("file", [self.item])
+
     def resolve(self, workspace, file, parent=None, parent_instance=None):
-        if isinstance(parent_instance, PropertyLookup):
-            resolved = PropertyLookup(self.item).resolve(
-                workspace, file, parent, parent_instance
-            )
-            out = resolved
-        else:
-            out = self.item
-        return f"file({out})"
+        return _evaluate(self, workspace, file)
+
 
+class Concat(Composite):
+    __slots__ = ("items",)
 
-class Concat(Resolvable):
     def __init__(self, items):
-        self.items = items
+        _set(self, "items", tuple(items))
 
-    def __repr__(self):
+    def _render(self):
         return "concat({})".format(",".join([item.__repr__() for item in self.items]))
 
+    def compile(self):
+        from pyterraformer.core.evaluation import compile_call
+
+        return compile_call("concat", self.items)
+
     def resolve(self, workspace, file, parent=None, parent_instance=None):
-        final = []
-        for item in self.items:
-            if isinstance(parent_instance, PropertyLookup):
-                resolved = PropertyLookup(item).resolve(
-                    workspace, file, parent, parent_instance
-                )
-                out = resolved
-            elif isinstance(item, Resolvable):
-                out = item.resolve(workspace, file, None, None)
-            else:
-                out = item
-            final.append(out)
-        if all([isinstance(item, str) for item in final]):
-            concat = "".join(final)
-        else:
-            concat = []
-            for item in final:
-                concat += item
-        return f"concat({concat})"
+        return _evaluate(self, workspace, file)
 
 
-class Types(Resolvable):
+class Types(Composite):
+    """A type constraint, rendered as written: a primitive type, or a type
+    constructor around another type."""
+
+    __slots__ = ("items",)
+
     def __init__(self, items):
-        self.items = items
+        _set(self, "items", tuple(items))
 
-    def __repr__(self):
-        return "types({})".format(",".join([item.__repr__() for item in self.items]))
+    def _render(self):
+        if len(self.items) == 1:
+            return str(self.items[0])
+        constructor, inner = self.items
+        return f"{constructor}({inner!r})"
 
     def resolve(self, workspace, file, parent=None, parent_instance=None):
-        # final = []
-        # for item in self.items:
-        #     if isinstance(parent_instance, PropertyLookup):
-        #         resolved = PropertyLookup(item).resolve(workspace, file, parent, parent_instance)
-        #         out = resolved
-        #     else:
-        #         out = item
-        #     final.append(out)
-        # concat = ",".join(final)
-        return "types({})".format(",".join([item.__repr__() for item in self.items]))
-
-
-class Replace(Resolvable):
+        return self._render()
+
+
+class Replace(Composite):
+    __slots__ = ("items",)
+
     def __init__(self, items):
-        self.items = items
+        _set(self, "items", tuple(items))
 
-    def __repr__(self):
+    def _render(self):
         return "replace({})".format(",".join([item.__repr__() for item in self.items]))
 
+    def compile(self):
+        from pyterraformer.core.evaluation import compile_call
+
+        # the first argument may be several expression parts
+        string = self.items[:-2]
+        if len(string) > 1:
+            string = (Expression(string),)
+        return compile_call("replace", (*string, *self.items[-2:]))
+
     def resolve(self, workspace, file, parent=None, parent_instance=None):
-        final = []
-        for item in self.items:
-            if isinstance(parent_instance, PropertyLookup):
-                resolved = PropertyLookup(item).resolve(
-                    workspace, file, parent, parent_instance
-                )
-                out = resolved
-            else:
-                out = item
-            final.append(out)
-        concat = ",".join(final)
-        return f"replace({concat})"
+        return _evaluate(self, workspace, file)
+
 
+class GenericFunction(Composite):
+    __slots__ = ("name", "items")
 
-class GenericFunction(Resolvable):
     def __init__(self, items):
-        self.name = str(items[0])
-        self.items = items[1:]
+        _set(self, "name", str(items[0]))
+        _set(self, "items", tuple(items[1:]))
 
-    def __repr__(self):
+    def _render(self):
         return "{}({})".format(
             self.name, ",".join([item.__repr__() for item in self.items])
         )
 
+    def compile(self):
+        from pyterraformer.core.evaluation import compile_call
+
+        return compile_call(self.name, self.items)
+
     def resolve(self, workspace, file, parent=None, parent_instance=None):
-        final = []
-        for item in self.items:
-            if isinstance(parent_instance, PropertyLookup):
-                resolved = PropertyLookup(item).resolve(
-                    workspace, file, parent, parent_instance
-                )
-                out = resolved
-            else:
-                out = item
-            final.append(out)
-        concat = ",".join([item.__repr__() for item in final])
-        return f"{self.name}({concat})"
+        return _evaluate(self, workspace, file)
+
 
+class Merge(Composite):
+    __slots__ = ("items",)
 
-class Merge(Resolvable):
     def __init__(self, items):
-        self.items = items
+        _set(self, "items", tuple(items))
 
-    def __repr__(self):
+    def _render(self):
         return "merge({})".format(",".join([item.__repr__() for item in self.items]))
 
+    def compile(self):
+        from pyterraformer.core.evaluation import compile_call
+
+        return compile_call("merge", self.items)
+
     def resolve(self, workspace, file, parent=None, parent_instance=None):
-        final = []
-        for item in self.items:
-            if isinstance(parent_instance, PropertyLookup):
-                resolved = PropertyLookup(item).resolve(
-                    workspace, file, parent, parent_instance
-                )
-                out = resolved
-            else:
-                out = item
-            final.append(out)
-        concat = ",".join(final)
-        return f"merge({concat})"
+        return _evaluate(self, workspace, file)
+
 
+class Conditional(Composite):
+    __slots__ = ("bool", "true", "false")
 
-class Conditional(Resolvable):
     def __init__(self, args):
-        self.bool = args[0]
-        self.true = args[1]
-        self.false = args[2]
+        _set(self, "bool", args[0])
+        _set(self, "true", args[1])
+        _set(self, "false", args[2])
 
-    def __repr__(self):
+    def _render(self):
         return f"{self.bool} ? {self.true} : {self.false}"
 
+    def compile(self):
+        from pyterraformer.core.evaluation import compile_conditional
+
+        return compile_conditional(self.bool, self.true, self.false)
+
     def resolve(self, workspace, file, parent=None, parent_instance=None):
         boolean_eval = self.bool.resolve(workspace, file, parent, parent_instance)
         if boolean_eval:
@@ -488,19 +663,24 @@ class Conditional(Resolvable):
             return self.false.resolve(workspace, file, parent, parent_instance)
 
 
-class Parenthetical(Resolvable):
+class Parenthetical(Composite):
+    __slots__ = ("contents",)
+
     def __init__(self, args):
-        self.contents = args
+        _set(self, "contents", tuple(args))
 
-    def __repr__(self):
+    def _render(self):
         return "({})".format("".join([val.__repr__() for val in self.contents]))
 
+    def compile(self):
+        from pyterraformer.core.evaluation import compile_sequence
+
+        return compile_sequence(self.contents)
+
     def resolve(self, workspace, file, parent=None, parent_instance=None):
         # parent = None
         parent_instance = self
-        resolve = deepcopy(self.contents)
-        while resolve:
-            next = resolve.pop(0)
+        for next in self.contents:
             parent = _resolver_function(next, workspace, file, parent, parent_instance)
             parent_instance = next
         if parent is None:
@@ -508,13 +688,20 @@ class Parenthetical(Resolvable):
         return parent
 
 
-class Expression(Resolvable):
+class Expression(Composite):
+    __slots__ = ("args",)
+
     def __init__(self, args):
-        self.args = args
+        _set(self, "args", tuple(args))
 
-    def __repr__(self):
+    def _render(self):
         return "".join([val.__repr__() for val in self.args])
 
+    def compile(self):
+        from pyterraformer.core.evaluation import compile_sequence
+
+        return compile_sequence(self.args)
+
     def resolve(self, workspace, file, parent=None, parent_instance=None):
         output = self.args[0]
         if hasattr(output, "resolve"):
@@ -523,38 +710,29 @@ class Expression(Resolvable):
             return output
 
 
-class BinaryOp(Resolvable):
+class BinaryOp(Composite):
+    __slots__ = ("args",)
+
     def __init__(self, args):
-        self.args = args
+        _set(self, "args", tuple(args))
 
-    def __repr__(self):
+    def _render(self):
         return "".join([val.__repr__() for val in self.args])
 
+    def compile(self):
+        from pyterraformer.core.evaluation import compile_sequence
+
+        return compile_sequence(self.args)
+
     def resolve(self, workspace, file, parent=None, parent_instance=None):
-        all = [item.resolve(workspace, file, parent) for item in self.args]
-        left = all[0]
-        operator, right = all[1]
-        if isinstance(parent_instance, PropertyLookup):
-            left = PropertyLookup(left).resolve(
-                workspace, file, parent, parent_instance
-            )
-        if operator == "==":
-            return left == right
-        elif operator == ">=":
-            return left >= right
-        elif operator == "<=":
-            return left <= right
-        elif operator == "!=":
-            return left != right
-        elif operator == "%":
-            return True
-        else:
-            raise ValueError(f"Unable to do comparison {left}, {operator}, {right}")
+        return _evaluate(self, workspace, file)
+
 
+class BinaryOperator(Node):
+    __slots__ = ("args",)
 
-class BinaryOperator(Resolvable):
     def __init__(self, args):
-        self.args = args
+        _set(self, "args", tuple(args))
 
     def __repr__(self):
         return str(self.args[0].value)
@@ -563,11 +741,13 @@ class BinaryOperator(Resolvable):
         return str(self.args[0].value)
 
 
-class BinaryTerm(Resolvable):
+class BinaryTerm(Composite):
+    __slots__ = ("args",)
+
     def __init__(self, args):
-        self.args = args
+        _set(self, "args", tuple(args))
 
-    def __repr__(self):
+    def _render(self):
         return "".join([val.__repr__() for val in self.args])
 
     def resolve(self, workspace, file, parent=None, parent_instance=None):
@@ -576,13 +756,23 @@ class BinaryTerm(Resolvable):
         ]
 
 
-class Boolean(Resolvable):
+class Boolean(Node):
+    __slots__ = ("value",)
+
     def __init__(self, value):
-        self.value = value
+        _set(self, "value", value)
 
     def __eq__(self, other):
         return self.value.__eq__(other)
 
+    def __hash__(self):
+        return hash(self.value)
+
+    def compile(self):
+        from pyterraformer.core.evaluation import constant
+
+        return constant(self.value)
+
     def __repr__(self):
         if self.value:
             return "true"
@@ -636,30 +826,36 @@ class Block(Resolvable):
         }}"""
 
 
-class Symlink(Resolvable):
+class Symlink(Composite):
+    __slots__ = ("value",)
+
     def __init__(self, value):
-        self.value = value
+        _set(self, "value", tuple(value))
 
     def __eq__(self, other):
-        return self.value.__eq__(other)
+        if isinstance(other, Symlink):
+            return self.value == other.value
+        return list(self.value) == other
 
-    def __repr__(self):
+    __hash__ = Composite.__hash__
+
+    def _render(self):
         return "".join([val.__repr__() for val in self.value])
 
 
-class LegacySplat(Resolvable):
+class LegacySplat(Composite):
+    __slots__ = ("contents",)
+
     def __init__(self, args):
-        self.contents = args
+        _set(self, "contents", tuple(args))
 
-    def __repr__(self):
+    def _render(self):
         return "{}".format(*[val.__repr__() for val in self.contents[:1]])
 
     def resolve(self, workspace, file, parent=None, parent_instance=None):
         # parent = None
         parent_instance = self
-        resolve = deepcopy(self.contents)
-        while resolve:
-            next = resolve.pop(0)
+        for next in self.contents:
             parent = _resolver_function(next, workspace, file, parent, parent_instance)
             parent_instance = next
         if parent is None:
@@ -667,23 +863,38 @@ class LegacySplat(Resolvable):
         return parent
 
 
-class ToSet(Resolvable):
+class ToSet(Composite):
+    __slots__ = ("items",)
+
     def __init__(self, items):
-        self.items = items
+        _set(self, "items", tuple(items))
 
-    def __repr__(self):
+    def _render(self):
         return "toset({})".format(",".join([item.__repr__() for item in self.items]))
 
+    def compile(self):
+        from pyterraformer.core.evaluation import compile_call
+
+        return compile_call("toset", self.items)
+
     def resolve(self, workspace, file, parent=None, parent_instance=None):
-        final = []
-        for item in self.items:
-            if isinstance(parent_instance, PropertyLookup):
-                resolved = PropertyLookup(parent_instance, item).resolve(
-                    workspace, file, parent, parent_instance
-                )
-                out = resolved
-            else:
-                out = item
-            final.append(out)
-        concat = ",".join(final)
-        return f"toset({concat})"
+        return _evaluate(self, workspace, file)
+
+
+class UnaryOp(Composite):
+    __slots__ = ("operator", "operand")
+
+    def __init__(self, args):
+        _set(self, "operator", str(args[0]))
+        _set(self, "operand", args[1])
+
+    def _render(self):
+        return f"{self.operator}{self.operand.__repr__()}"
+
+    def compile(self):
+        from pyterraformer.core.evaluation import compile_unary
+
+        return compile_unary(self.operator, self.operand)
+
+    def resolve(self, workspace, file, parent=None, parent_instance=None):
+        return _evaluate(self, workspace, file)
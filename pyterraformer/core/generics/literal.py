@@ -1,4 +1,6 @@
 class Literal(object):
+    __slots__ = ("value",)
+
     def __init__(self, str):
         self.value = str
 
@@ -1,15 +1,11 @@
-from pyterraformer.core.objects import TerraformObject  # , process_attribute
+from typing import Optional
 
+from pyterraformer.core.objects import TerraformObject, ObjectMetadata
 
-class Local(TerraformObject):
-    def __init__(self, text, attributes: dict):
-        pass_on = []
-        for key, value in attributes.items():
-            pass_on.append([key, value])
 
-        TerraformObject.__init__(
-            self, _type="local", original_text=text, attributes=pass_on
-        )
+class Local(TerraformObject):
+    def __init__(self, _metadata: Optional[ObjectMetadata] = None, **kwargs):
+        TerraformObject.__init__(self, _type="local", _metadata=_metadata, **kwargs)
 
     # def render(self, variables=None):
     #     from analytics_terraformer_core.utility import clean_render_dictionary
@@ -1,6 +1,8 @@
-from pyterraformer.core.objects import TerraformObject
+from typing import Optional
+
+from pyterraformer.core.objects import TerraformObject, ObjectMetadata
 
 
 class Output(TerraformObject):
-    def __init__(self, name, attributes):
-        TerraformObject.__init__(self, "output", name, attributes)
+    def __init__(self, name, _metadata: Optional[ObjectMetadata] = None, **kwargs):
+        TerraformObject.__init__(self, "output", name, _metadata=_metadata, **kwargs)
@@ -1,14 +1,19 @@
-from pyterraformer.core.objects import TerraformObject
-from typing import TYPE_CHECKING
+from pyterraformer.core.objects import TerraformObject, ObjectMetadata
+from typing import Any, Dict, Optional, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from pyterraformer.core.generics import Literal
 
 
 class Variable(TerraformObject):
-    def __init__(self, text, name, attributes):
+    # (mapping indexed, object version, index), see _indexed
+    __slots__ = ("_index",)
+
+    def __init__(self, name, _metadata: Optional[ObjectMetadata] = None, **kwargs):
         self.name = str(name).replace('"', "")
-        TerraformObject.__init__(self, "variable", text, attributes)
+        TerraformObject.__init__(
+            self, "variable", self.name, _metadata=_metadata, **kwargs
+        )
 
     def __repr__(self):
         return (
@@ -19,12 +24,40 @@ class Variable(TerraformObject):
             + ")"
         )
 
+    @property
+    def value(self) -> Any:
+        """The value assigned to the variable in its workspace, falling back
+        to the declared default"""
+        workspace = self._workspace
+        values = workspace.variable_values if workspace is not None else None
+        if values is not None and self.name in values:
+            return values[self.name]
+        return self.default
+
+    def _indexed(self) -> Dict[str, Any]:
+        from pyterraformer.core.symbols import _label
+
+        value = self.value
+        try:
+            mapping, version, index = self._index
+        except AttributeError:
+            pass
+        else:
+            if mapping is value and version == self._version:
+                return index
+        index = {}
+        for key, item in value.items():
+            index.setdefault(_label(key), item)
+        self._index = (value, self._version, index)
+        return index
+
     def __getitem__(self, val):
-        for key, item in self.default.items():
+        from pyterraformer.core.symbols import _label
 
-            if val == key:
-                return item
-        raise KeyError(val)
+        try:
+            return self._indexed()[_label(val)]
+        except KeyError:
+            raise KeyError(val)
 
     def render_lookup(self, item) -> "Literal":
         from pyterraformer.core.generics import Literal
@@ -42,10 +75,9 @@ class Variable(TerraformObject):
         return Literal(f"var.{self.name}")
 
     def get(self, val, fallback: str = None):
-        for key, item in self.default.items():
-            if val == key:
-                return item
-        return fallback
+        from pyterraformer.core.symbols import _label
+
+        return self._indexed().get(_label(val), fallback)
 
     def get_type(self, val) -> "Literal":
         from pyterraformer.core.generics.interpolation import String
@@ -0,0 +1,332 @@
+"""Graph of the references between the objects in a workspace.
+
+Every variable, local value, module, data source, resource and output is
+a node, addressed the way terraform addresses it: var.region, local.name,
+module.network, data.google_project.p, aws_s3_bucket.b, output.arn. An
+edge runs from a node to each node its expressions refer to.
+
+    graph = workspace.graph
+    graph.dependents("var.region", transitive=True)
+    graph.topological_order()
+
+References are extracted from the parsed expressions without evaluating
+them. The graph is kept up to date lazily: each query first re-extracts
+the references of objects that were added or changed since the last one.
+"""
+
+from collections import deque
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, TYPE_CHECKING
+
+from lark import Tree
+
+from pyterraformer.core.generics.interpolation import (
+    ArrayLookup,
+    DictLookup,
+    Node,
+    PropertyLookup,
+    String,
+    _node_slots,
+)
+
+if TYPE_CHECKING:
+    from pyterraformer.core.objects import TerraformObject
+    from pyterraformer.core.workspace import TerraformWorkspace
+
+# reference roots that aren't objects in the workspace
+_CONTEXT_ROOTS = frozenset(("count", "each", "path", "self", "terraform"))
+# reference roots and the number of names after the root that form the address
+_ROOT_NAMES = {"var": 1, "local": 1, "locals": 1, "module": 1, "data": 2}
+# addresses terraform doesn't accept as -target
+_UNTARGETABLE = ("var.", "local.", "output.")
+
+
+class ReferenceGraph(object):
+    def __init__(self, workspace: "TerraformWorkspace"):
+        self.workspace = workspace
+        self._reset()
+
+    def _reset(self):
+        # address -> addresses it refers to
+        self.forward: Dict[str, Set[str]] = {}
+        # address -> addresses that refer to it
+        self.reverse: Dict[str, Set[str]] = {}
+        # address -> the object declaring it
+        self.declared: Dict[str, "TerraformObject"] = {}
+        # id(object) -> (object, version, addresses it declares)
+        self._objects: Dict[int, Tuple["TerraformObject", int, List[str]]] = {}
+
+    def __getstate__(self):
+        # the graph is cheap to rebuild and not worth storing
+        return {"workspace": self.workspace}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset()
+
+    def refresh(self):
+        """Bring the graph up to date with the workspace. Only objects that
+        are new or changed since the last refresh are re-extracted."""
+        seen = set()
+        for _, file in self.workspace.files.items():
+            for object in file.objects:
+                key = id(object)
+                seen.add(key)
+                entry = self._objects.get(key)
+                if entry is None or entry[0] is not object:
+                    if entry is not None:
+                        self._remove(key)
+                    self._add(object)
+                elif entry[1] != object._version:
+                    self._remove(key)
+                    self._add(object)
+        for key in [key for key in self._objects if key not in seen]:
+            self._remove(key)
+
+    def _add(self, object: "TerraformObject"):
+        declared = []
+        for address, value in _declarations(object):
+            declared.append(address)
+            self.declared[address] = object
+            targets = references(value)
+            self.forward[address] = targets
+            for target in targets:
+                self.reverse.setdefault(target, set()).add(address)
+        self._objects[id(object)] = (object, object._version, declared)
+
+    def _remove(self, key: int):
+        object, _, declared = self._objects.pop(key)
+        for address in declared:
+            if self.declared.get(address) is object:
+                del self.declared[address]
+            for target in self.forward.pop(address, ()):
+                sources = self.reverse.get(target)
+                if sources is not None:
+                    sources.discard(address)
+                    if not sources:
+                        del self.reverse[target]
+
+    def __contains__(self, address: str) -> bool:
+        """Whether an object in the workspace declares address"""
+        self.refresh()
+        return address in self.declared
+
+    def dependencies(self, address: str, transitive: bool = False) -> Set[str]:
+        """The addresses address refers to"""
+        self.refresh()
+        if not transitive:
+            return set(self.forward.get(address, ()))
+        return _reachable(self.forward, [address])
+
+    def dependents(self, address: str, transitive: bool = False) -> Set[str]:
+        """The addresses that refer to address"""
+        self.refresh()
+        if not transitive:
+            return set(self.reverse.get(address, ()))
+        return _reachable(self.reverse, [address])
+
+    def impact(self, addresses: Iterable[str]) -> Set[str]:
+        """Everything that directly or indirectly refers to any of addresses,
+        e.g. every resource affected by changing a set of variables"""
+        self.refresh()
+        return _reachable(self.reverse, list(addresses))
+
+    def targets(self, addresses: Iterable[str]) -> List[str]:
+        """-target addresses covering a change to addresses: the resources,
+        data sources and modules among them, and among everything that
+        refers to them, directly or not"""
+        addresses = list(addresses)
+        affected = self.impact(addresses).union(addresses)
+        return sorted(
+            address for address in affected if not address.startswith(_UNTARGETABLE)
+        )
+
+    def topological_order(self) -> List[str]:
+        """Declared addresses ordered so that each comes after everything it
+        refers to. References to undeclared addresses are ignored."""
+        self.refresh()
+        remaining = {
+            address: sum(1 for target in targets if target in self.declared)
+            for address, targets in self.forward.items()
+        }
+        ready = deque(sorted(a for a, count in remaining.items() if count == 0))
+        order = []
+        while ready:
+            address = ready.popleft()
+            order.append(address)
+            for source in sorted(self.reverse.get(address, ())):
+                remaining[source] -= 1
+                if remaining[source] == 0:
+                    ready.append(source)
+        if len(order) != len(remaining):
+            raise ValueError(f"Reference cycles found: {self.cycles()}")
+        return order
+
+    def cycles(self) -> List[List[str]]:
+        """Groups of addresses that refer to each other, directly or not"""
+        self.refresh()
+        return _strongly_connected(self.forward)
+
+
+def declared_addresses(object: "TerraformObject") -> List[str]:
+    """The addresses an object declares; none for provider, terraform and
+    other blocks that aren't referred to by address"""
+    return [address for address, _ in _declarations(object)]
+
+
+def _declarations(object: "TerraformObject") -> Iterable[Tuple[str, Any]]:
+    """The addresses an object declares, with the values they are built from"""
+    from pyterraformer.core.generics import Data, Local, Output, Variable
+    from pyterraformer.core.modules import ModuleObject
+    from pyterraformer.core.resources import ResourceObject
+    from pyterraformer.core.symbols import _label
+
+    if isinstance(object, Local):
+        for name, value in object.render_variables.items():
+            if not name.startswith("comment-"):
+                yield f"local.{name}", value
+        return
+    elif isinstance(object, Variable):
+        address = f"var.{_label(object.name)}"
+    elif isinstance(object, Data):
+        address = f"data.{_label(object.type)}.{_label(object.name)}"
+    elif isinstance(object, ModuleObject):
+        address = f"module.{_label(object.tf_id)}"
+    elif isinstance(object, Output):
+        address = f"output.{_label(object.tf_id)}"
+    elif isinstance(object, ResourceObject):
+        address = f"{_label(object._type)}.{_label(object.tf_id)}"
+    else:
+        return
+    yield address, object.render_variables
+
+
+def references(value: Any) -> Set[str]:
+    """Addresses referred to anywhere within a parsed value"""
+    found: Set[str] = set()
+    _collect(value, found)
+    return found
+
+
+def _collect(value: Any, found: Set[str]):
+    if isinstance(value, Node):
+        # expressions repeat heavily across a workspace and nodes are immutable
+        found.update(_node_references(value))
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            if isinstance(key, Node):
+                _collect(key, found)
+            _collect(item, found)
+    elif isinstance(value, (list, tuple, set)):
+        for item in value:
+            _collect(item, found)
+    elif isinstance(value, Tree):
+        for child in value.children:
+            _collect(child, found)
+
+
+@lru_cache(maxsize=1 << 16)
+def _node_references(node: Node) -> frozenset:
+    found: Set[str] = set()
+    if isinstance(node, PropertyLookup):
+        address = _reference_address(node, found)
+        if address is not None:
+            found.add(address)
+    elif not isinstance(node, String):
+        for name in _node_slots(type(node)):
+            _collect(getattr(node, name, None), found)
+    return frozenset(found)
+
+
+def _reference_address(node: PropertyLookup, found: Set[str]) -> Optional[str]:
+    """The address node refers to; references made within index
+    expressions along the way are added to found"""
+    if not isinstance(node.base, String):
+        _collect(node.base, found)
+        _collect(node.contents, found)
+        return None
+    names = [node.base.item]
+    current: Any = node
+    while isinstance(current, PropertyLookup):
+        # anything after the first attribute, such as splats
+        _collect(current.contents[1:], found)
+        current = current.property
+        if isinstance(current, PropertyLookup):
+            names.append(str(current.base))
+        elif isinstance(current, (DictLookup, ArrayLookup)):
+            names.append(str(current.base))
+            _collect(current.lookup, found)
+        elif isinstance(current, String):
+            names.append(current.item)
+        else:
+            _collect(current, found)
+    root = names[0]
+    if root in _CONTEXT_ROOTS:
+        return None
+    count = _ROOT_NAMES.get(root, 1)
+    if len(names) <= count:
+        return None
+    if root == "locals":
+        root = "local"
+    return ".".join([root, *names[1 : count + 1]])
+
+
+def _reachable(adjacency: Dict[str, Set[str]], start: List[str]) -> Set[str]:
+    seen: Set[str] = set()
+    stack = list(start)
+    while stack:
+        for target in adjacency.get(stack.pop(), ()):
+            if target not in seen:
+                seen.add(target)
+                stack.append(target)
+    return seen
+
+
+def _strongly_connected(adjacency: Dict[str, Set[str]]) -> List[List[str]]:
+    """Tarjan's algorithm, iteratively so deep reference chains can't hit the
+    recursion limit. Only components that form a cycle are returned."""
+    index: Dict[str, int] = {}
+    lowlink: Dict[str, int] = {}
+    on_stack: Set[str] = set()
+    stack: List[str] = []
+    cycles: List[List[str]] = []
+    counter = 0
+    for root in adjacency:
+        if root in index:
+            continue
+        work = [(root, iter(adjacency.get(root, ())))]
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, targets = work[-1]
+            advanced = False
+            for target in targets:
+                if target not in index:
+                    index[target] = lowlink[target] = counter
+                    counter += 1
+                    stack.append(target)
+                    on_stack.add(target)
+                    work.append((target, iter(adjacency.get(target, ()))))
+                    advanced = True
+                    break
+                elif target in on_stack:
+                    lowlink[node] = min(lowlink[node], index[target])
+            if advanced:
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+            if lowlink[node] == index[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                if len(component) > 1 or node in adjacency.get(node, ()):
+                    cycles.append(sorted(component))
+    return cycles
@@ -1,8 +1,174 @@
-from typing import Optional
+"""Module calls, and the modules they call.
+
+A module block with a local source, such as ./modules/network, is loaded
+into a workspace of its own the first time one of its outputs is
+referenced. The call's arguments become the module's input variables, and
+module.network.vpc_id evaluates the module's vpc_id output with them.
+
+Outputs are memoized per module directory and input values, so a module
+called many times with the same inputs is only evaluated once. A cached
+set of outputs is discarded when anything it was evaluated from changes.
+Modules from registries or remote sources aren't loaded; their outputs
+evaluate to UnresolvedLookup.
+"""
+
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, TYPE_CHECKING
 
 from pyterraformer.core.objects import TerraformObject, ObjectMetadata
 
+if TYPE_CHECKING:
+    from pyterraformer.core.evaluation import Dependencies, EvaluationContext
+    from pyterraformer.core.workspace import TerraformWorkspace
+
+# arguments of a module call that aren't input variables
+_META_ARGUMENTS = frozenset(
+    ("source", "version", "count", "for_each", "providers", "depends_on")
+)
+
 
 class ModuleObject(TerraformObject):
     def __init__(self, tf_id, _metadata: Optional[ObjectMetadata] = None, **kwargs):
-        TerraformObject.__init__(self, _type="module", tf_id=tf_id, **kwargs)
+        TerraformObject.__init__(
+            self, _type="module", tf_id=tf_id, _metadata=_metadata, **kwargs
+        )
+
+    @property
+    def local_source(self) -> Optional[Path]:
+        """The directory of a module sourced from the local filesystem, or
+        None for registry and remote sources"""
+        from pyterraformer.core.symbols import _label
+
+        source = self.render_variables.get("source")
+        if source is None or self._workspace is None:
+            return None
+        source = _label(source)
+        if not source.startswith(("./", "../")):
+            return None
+        return (self._workspace._path / source).resolve()
+
+    def module_workspace(self) -> Optional["TerraformWorkspace"]:
+        """The workspace of the called module, loaded on first use"""
+        if self._workspace is None:
+            return None
+        return self._workspace.module_loader.load(self)
+
+
+class ModuleLoader(object):
+    """The modules called from a workspace, and their memoized outputs"""
+
+    def __init__(self, workspace: "TerraformWorkspace"):
+        self.workspace = workspace
+        self._reset()
+
+    def _reset(self):
+        # module directory -> its workspace
+        self.workspaces: Dict[str, "TerraformWorkspace"] = {}
+        # (module directory, terraform workspace, input values) -> (outputs, dependencies)
+        self._outputs: Dict[Tuple, Tuple[Dict[str, Any], "Dependencies"]] = {}
+
+    def __getstate__(self):
+        # loaded modules and their outputs are rebuilt on demand
+        return {"workspace": self.workspace}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset()
+
+    def load(self, call: ModuleObject) -> Optional["TerraformWorkspace"]:
+        """The workspace of the called module, loaded on first use"""
+        from pyterraformer.core.workspace import TerraformWorkspace
+
+        directory = call.local_source
+        if directory is None or not directory.is_dir():
+            return None
+        key = str(directory)
+        try:
+            return self.workspaces[key]
+        except KeyError:
+            pass
+        module = TerraformWorkspace(
+            path=directory,
+            terraform=self.workspace.terraform,
+            serializer=self.workspace.serializer,
+        )
+        for path in sorted(directory.glob("*.tf")):
+            module.get_file_safe(path.name)
+        self.workspaces[key] = module
+        return module
+
+    def outputs(
+        self, call: ModuleObject, context: "EvaluationContext"
+    ) -> Optional[Dict[str, Any]]:
+        """Every output of the module called by call, evaluated with the
+        call's arguments in context. None if the module can't be loaded."""
+        from pyterraformer.core.evaluation import evaluate
+
+        module = self.load(call)
+        if module is None:
+            return None
+        inputs = {
+            str(name): evaluate(value, context)
+            for name, value in call.render_variables.items()
+            if name not in _META_ARGUMENTS and not str(name).startswith("comment-")
+        }
+        key = (module.path, context.terraform("workspace"), _freeze(inputs))
+        entry = self.cached(key)
+        if entry is None:
+            entry = self._evaluate(module, key[1], inputs)
+            if entry[1] is not None:
+                self._outputs[key] = entry
+        # values evaluated from the outputs are stale once the outputs are
+        context._lookups[("module_outputs", key)] = entry
+        return entry[0]
+
+    def cached(self, key: Tuple) -> Optional[Tuple[Dict[str, Any], "Dependencies"]]:
+        """Memoized outputs that are still current, or None"""
+        entry = self._outputs.get(key)
+        if entry is not None and entry[1].changed():
+            del self._outputs[key]
+            return None
+        return entry
+
+    def _evaluate(
+        self,
+        module: "TerraformWorkspace",
+        terraform_workspace: str,
+        inputs: Dict[str, Any],
+    ) -> Tuple[Dict[str, Any], Optional["Dependencies"]]:
+        from pyterraformer.core.evaluation import (
+            Dependencies,
+            EvaluationContext,
+            evaluate,
+        )
+        from pyterraformer.core.generics.interpolation import UnresolvedLookup
+
+        context = EvaluationContext(
+            module, variables=inputs, terraform_workspace=terraform_workspace
+        )
+        outputs = {}
+        for name in context._symbol(("outputs",)):
+            output = context._symbol(("output", name))
+            value = output.render_variables.get("value")
+            if value is None:
+                outputs[name] = UnresolvedLookup(output, "value")
+            else:
+                outputs[name] = evaluate(value, context)
+        dependencies = Dependencies(context) if context.cacheable else None
+        return outputs, dependencies
+
+
+def _freeze(value: Any) -> Any:
+    """A hashable stand in for an evaluated value"""
+    if isinstance(value, dict):
+        return (
+            "map",
+            tuple(sorted((str(key), _freeze(item)) for key, item in value.items())),
+        )
+    elif isinstance(value, (list, tuple)):
+        return ("list", tuple(_freeze(item) for item in value))
+    try:
+        hash(value)
+    except TypeError:
+        return ("unhashable", repr(value))
+    return (type(value).__name__, value)
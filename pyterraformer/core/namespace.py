@@ -4,6 +4,7 @@ from typing import Dict, List, Union, Optional, TYPE_CHECKING
 
 from pyterraformer.enums import InsertPosition
 from pyterraformer.serializer import BaseSerializer
+from pyterraformer.core.source import SourceBuffer
 from pyterraformer.core.utility import value_match
 
 if TYPE_CHECKING:
@@ -22,6 +23,8 @@ class TerraformNamespace(object):
         self.name = name
         self.objects: List = objects or []
         self.locals: Dict = {}
+        # set whenever an object is added, removed or modified in place
+        self.changed: bool = False
 
     def resolve(self):
         """No op for the base file"""
@@ -45,17 +48,30 @@ class TerraformFile(TerraformNamespace):
     def __init__(
         self,
         workspace: "TerraformWorkspace",
-        text: str,
+        text: Optional[str],
         location: Union[str, Path],
         objects: Optional[List["TerraformObject"]] = None,
+        source: Optional[SourceBuffer] = None,
     ):
-        self._text = text
+        # the file text is held once, in a buffer shared with object metadata
+        if source is None and text:
+            source = SourceBuffer(text, location=location)
+        self.source = source
         name = os.path.basename(location)
         super().__init__(name=name, workspace=workspace, objects=objects)
         self.location = location
+        for object in self.objects:
+            object._file = self
+            object._workspace = workspace
         if self not in self.workspace.files:
             self.workspace.add_file(self)
 
+    @property
+    def text(self) -> Optional[str]:
+        if self.source is None:
+            return None
+        return self.source.text
+
     def get_object(self, **kwargs):
         for object in self.objects:
             if all(
@@ -73,6 +89,9 @@ class TerraformFile(TerraformNamespace):
         orig = self.objects
         self.objects = [obj for obj in self.objects if obj != object]
         self.changed = orig != self.objects
+        if self.changed:
+            self.workspace.symbols.remove(object)
+            self.workspace.record_change(object)
 
     def find(self, object_type, invert=False):
         output = []
@@ -104,7 +123,8 @@ class TerraformFile(TerraformNamespace):
                 if isinstance(object, ResourceObject)
                 and object.tf_id
                 and object.tf_id + (object._type or "")
-                == getattr(obj, "tf_id", "") + getattr(obj, "_type", "")
+                == (getattr(obj, "tf_id", None) or "")
+                + (getattr(obj, "_type", None) or "")
             ]
         elif isinstance(object, ModuleObject):
             duplicates = [
@@ -113,7 +133,8 @@ class TerraformFile(TerraformNamespace):
                 if isinstance(object, ModuleObject)
                 and object.tf_id
                 and object.tf_id + (object._type or "")
-                == getattr(obj, "tf_id", "") + getattr(obj, "_type", "")
+                == (getattr(obj, "tf_id", None) or "")
+                + (getattr(obj, "_type", None) or "")
             ]
         return duplicates
 
@@ -124,10 +145,12 @@ class TerraformFile(TerraformNamespace):
         exists_okay: bool = False,
         replace: bool = False,
     ):
-        object._file = self
         duplicates = self._detect_duplicates(object)
         if duplicates:
             if replace:
+                for idx in duplicates:
+                    self.workspace.symbols.remove(self.objects[idx])
+                    self.workspace.record_change(self.objects[idx])
                 self.objects = [
                     obj
                     for idx, obj in enumerate(self.objects)
@@ -156,6 +179,11 @@ class TerraformFile(TerraformNamespace):
             self.objects.insert(position, object)
         else:
             raise ValueError(f"Invalid Position Argument {position}")
+        object._file = self
+        object._workspace = self.workspace
+        self.changed = True
+        self.workspace.symbols.add(object)
+        self.workspace.record_change(object)
 
     def render(self, serializer: BaseSerializer):
         return serializer.render_namespace(self)
@@ -170,6 +198,14 @@ class TerraformFile(TerraformNamespace):
 
             os.makedirs(os.path.dirname(self.location))
             self.save(serializer=serializer)
+            return
+        # the file on disk now matches the objects, but what changed is
+        # still pending until applied
+        self.changed = False
+        for object in self.objects:
+            if object._changed:
+                self.workspace.record_change(object)
+            object._changed = False
 
     def __iter__(self):
         self._idx = 0
@@ -1,23 +1,87 @@
-from dataclasses import dataclass
-from typing import Dict, Optional, TYPE_CHECKING
+from functools import lru_cache
+from sys import intern
+from typing import Any, Dict, Iterable, List, Optional, Tuple, TYPE_CHECKING
 
+from pyterraformer.core.tracking import TrackedDict, track
 from pyterraformer.exceptions import ValidationError
 
-
 if TYPE_CHECKING:
+    from pyterraformer.core.evaluation import EvaluationContext
+    from pyterraformer.core.expansion import ResourceInstance
     from pyterraformer.core.namespace import TerraformNamespace
+    from pyterraformer.core.source import SourceBuffer
+
+
+class ObjectMetadata(object):
+    """Where an object came from in its source file.
+
+    The original text is not copied per object; it is sliced lazily out of
+    the shared source buffer of the file, using the start and end offsets."""
+
+    __slots__ = ("source_file", "source", "row_num", "start_pos", "end_pos", "_text")
+
+    def __init__(
+        self,
+        source_file: Optional[str] = None,
+        orig_text: Optional[str] = None,
+        row_num: Optional[int] = None,
+        start_pos: Optional[int] = None,
+        end_pos: Optional[int] = None,
+        source: Optional["SourceBuffer"] = None,
+    ):
+        self.source_file = source_file
+        self.source = source
+        self.row_num = row_num
+        self.start_pos = start_pos
+        self.end_pos = end_pos
+        # explicitly provided text takes precedence over the shared buffer
+        self._text = orig_text
+
+    @property
+    def orig_text(self) -> Optional[str]:
+        if self._text is not None:
+            return self._text
+        if self.source is None or self.start_pos is None:
+            return None
+        return self.source.slice(self.start_pos, self.end_pos)
+
+    @orig_text.setter
+    def orig_text(self, value: Optional[str]):
+        self._text = value
 
+    def __repr__(self):
+        return "ObjectMetadata({})".format(
+            ", ".join(f"{key}={getattr(self, key)!r}" for key in _METADATA_FIELDS)
+        )
+
+    def __eq__(self, other):
+        if not isinstance(other, ObjectMetadata):
+            return NotImplemented
+        return all(
+            getattr(self, key) == getattr(other, key) for key in _METADATA_FIELDS
+        )
 
-@dataclass
-class ObjectMetadata:
-    source_file: Optional[str] = None
-    orig_text: Optional[str] = None
-    row_num: Optional[int] = None
-    start_pos: Optional[int] = None
-    end_pos: Optional[int] = None
+
+_METADATA_FIELDS = ("source_file", "orig_text", "row_num", "start_pos", "end_pos")
 
 
 class TerraformObject(object):
+    # core state lives in slots; ad-hoc attributes set by subclasses
+    # go to an instance __dict__ that is only created on first use
+    __slots__ = (
+        "render_variables",
+        "_metadata",
+        "tf_id",
+        "_type",
+        "_changed",
+        "_workspace",
+        "_file",
+        "_initialized",
+        "_version",
+        "_resolved_cache",
+        "__dict__",
+    )
+
     def __init__(
         self,
         _type,
@@ -29,9 +93,10 @@ class TerraformObject(object):
         self._metadata = _metadata or ObjectMetadata()
         self.tf_id = tf_id
         arguments = kwargs or {}
-        self.render_variables: Dict[str, str] = {
-            str(key): value for key, value in arguments.items()
-        }
+        # nested containers are tracked, so in place edits mark the object changed
+        self.render_variables: Dict[str, str] = TrackedDict(
+            self, {intern(str(key)): value for key, value in arguments.items()}
+        )
         # for attribute in self.attributes:
         #     if isinstance(attribute, list):
         #         # always cast keys to string
@@ -40,8 +105,12 @@ class TerraformObject(object):
         #         base = self.render_variables.get(attribute.name, Block())
         #         base.append(attribute)
         #         self.render_variables[attribute.name] = base
-        self._type: str = _type
+        # subclasses that declare _type on the class don't need a per instance copy
+        if _type != getattr(type(self), "_type", None):
+            self._type: str = _type
         self._changed: bool = False
+        # bumped on every change, see resolved_attributes
+        self._version: int = 0
         self._workspace = None
         self._file: Optional["TerraformNamespace"] = None
         self._initialized: bool = True
@@ -59,25 +128,57 @@ class TerraformObject(object):
     def tf_attributes(self):
         return self.render_variables.keys()
 
+    def __getstate__(self):
+        # copy state directly so pickling/IPC never routes through the
+        # render_variables aware attribute protocol below
+        slots = {}
+        for name, slot in _OBJECT_SLOTS:
+            try:
+                slots[name] = slot.__get__(self)
+            except AttributeError:
+                pass
+        return dict(self.__dict__), slots
+
+    def __setstate__(self, state):
+        attributes, slots = state
+        self.__dict__.update(attributes)
+        for name, slot in _OBJECT_SLOTS:
+            if name in slots:
+                slot.__set__(self, slots[name])
+
     def __getattr__(self, name):
-        if name == "render_variables":
-            return self.__dict__.get("render_variables")
-        elif self.render_variables and name in self.render_variables:
-            return self.__dict__.get("render_variables").get(name)
-        elif (
-            self.render_variables
-            and "_" in name
-            and name.endswith("resolved")
-            and name.rsplit("_", 1)[0] in self.render_variables
-        ):
-            lookup = name.rsplit("_", 1)[0]
-            return self.resolved_attributes.get(lookup)
-        elif "_" in name and name.rsplit("_", 1)[1] == "lookup":
+        # only called once normal lookup fails; the first read of a terraform
+        # attribute installs a class level accessor for later reads
+        try:
+            value = _render_variables(self)[name]
+        except KeyError:
+            pass
+        except AttributeError:
+            if name == "render_variables":
+                # not yet initialized
+                return None
+            raise AttributeError(name)
+        else:
+            _install_accessor(type(self), name)
+            return value
+        suffix = _attribute_suffix(name)
+        if suffix is None:
+            raise AttributeError(
+                f"'{type(self).__name__}' object has no attribute '{name}'"
+            )
+        base, kind = suffix
+        if kind == "lookup":
             from pyterraformer.core.generics import Literal
 
-            property = name.rsplit("_", 1)[0]
-            return Literal(f"{self._type}.{self.tf_id}.{property}")
-        return super().__getattribute__(name)
+            return Literal(f"{self._type}.{self.tf_id}.{base}")
+        # _resolved
+        try:
+            item = _render_variables(self)[base]
+        except KeyError:
+            raise AttributeError(
+                f"'{type(self).__name__}' object has no attribute '{name}'"
+            )
+        return self.resolve_item(item)
 
     def __setattr__(self, name, value):
         """This gets tricky:
@@ -85,55 +186,212 @@ class TerraformObject(object):
         Unless it's one of the internal attributes we use for managing objects.
         So skip anything with a private method, or in the disallow list...
         Unless it's also in the list of things that we should render."""
-        if name.startswith("_") or (
-            name in ("row_num", "template", "name", "tf_id")
-            and not (self.render_variables and name in self.render_variables)
-        ):
-            super().__setattr__(name, value)
-        elif (self.render_variables and name in self.render_variables) or getattr(
-            self, "_initialized", False
-        ):
-            self._changed = True
-            self.__dict__.get("render_variables")[name] = value
-        else:
-            super().__setattr__(name, value)
+        if name[0] == "_":
+            object.__setattr__(self, name, value)
+            return
+        try:
+            render_variables = _render_variables(self)
+        except AttributeError:
+            # still being constructed
+            object.__setattr__(self, name, value)
+            return
+        if name in render_variables or name not in _INTERNAL_ATTRIBUTES:
+            # only containers need tracking; _mark_changed is inlined
+            if isinstance(value, (dict, list, set)):
+                value = track(value, self)
+            _dict_setitem(render_variables, name, value)
+            _set_changed(self, True)
+            _set_version(self, self._version + 1)
+            file = self._file
+            if file is not None:
+                file.changed = True
+            return
+        try:
+            previous = object.__getattribute__(self, name)
+        except AttributeError:
+            object.__setattr__(self, name, value)
+            return
+        workspace = self._workspace
+        renamed = workspace is not None and name in _NAME_ATTRIBUTES
+        if renamed and previous != value:
+            from pyterraformer.core.graph import declared_addresses
+
+            # the old address has to be targeted too, to destroy it
+            workspace.pending_changes.update(declared_addresses(self))
+        object.__setattr__(self, name, value)
+        # renaming an existing object changes its rendering too
+        if previous != value:
+            self._mark_changed()
+            if renamed:
+                workspace.symbols.rename(self)
 
     def __delattr__(self, name):
-        if self.render_variables and name in self.render_variables:
-            self._changed = True
-            del self.__dict__.get("render_variables")[name]
+        try:
+            render_variables = _render_variables(self)
+        except AttributeError:
+            render_variables = {}
+        if name in render_variables:
+            del render_variables[name]
         else:
-            super().__delattr__(name)
+            object.__delattr__(self, name)
+
+    @property
+    def changed(self) -> bool:
+        return self._changed
+
+    def _mark_changed(self):
+        _set_changed(self, True)
+        self._version += 1
+        file = self._file
+        if file is not None:
+            file.changed = True
+
+    def evaluation_context(self, **kwargs) -> "EvaluationContext":
+        """A context for evaluating this object's attributes.
+        Keyword arguments are passed through to EvaluationContext."""
+        from pyterraformer.core.evaluation import EvaluationContext
+
+        return EvaluationContext(self._workspace, self._file, **kwargs)
+
+    def resolve_item(self, item, context: Optional["EvaluationContext"] = None):
+        from pyterraformer.core.evaluation import evaluate
+
+        return evaluate(item, context or self.evaluation_context())
+
+    def resolve_attributes(
+        self, context: Optional["EvaluationContext"] = None
+    ) -> Dict[str, Any]:
+        """Evaluate every attribute, sharing one context between them"""
+        context = context or self.evaluation_context()
+        return {
+            str(key): self.resolve_item(item, context)
+            for key, item in self.render_variables.items()
+        }
 
     @property
-    def changed(self):
-        return self._original_text and not self._changed
-
-    def resolve_item(self, item):
-        from pyterraformer.core.generics import Variable
-
-        if isinstance(item, list):
-            resolved = [self.resolve_item(sub_item) for sub_item in item]
-        elif isinstance(item, str):
-            resolved = item
-        elif isinstance(item, int):
-            resolved = item
-        elif isinstance(item, dict):
-            resolved = {
-                self.resolve_item(key): self.resolve_item(value)
-                for key, value in item.items()
-            }
+    def resolved_attributes(self) -> Dict[str, Any]:
+        """Every attribute, evaluated with default variable values.
+
+        The result is cached until this object, or a variable, local or
+        object it refers to, changes."""
+        from pyterraformer.core.evaluation import Dependencies
+
+        try:
+            values, version, dependencies = self._resolved_cache
+        except AttributeError:
+            pass
         else:
-            resolved = item.resolve(self._workspace, self._file, None, None)
-        if isinstance(resolved, Variable) and hasattr(resolved, "default"):
-            resolved = getattr(resolved, "default")
+            if version == self._version and not dependencies.changed():
+                return dict(values)
+        context = self.evaluation_context()
+        values = self.resolve_attributes(context)
+        if context.cacheable:
+            self._resolved_cache = (values, self._version, Dependencies(context))
+        return dict(values)
+
+    def resolve_matrix(
+        self,
+        workspaces: Optional[Iterable[Optional[str]]] = None,
+        var_sets: Optional[Iterable[Dict[str, Any]]] = None,
+    ) -> Dict[Tuple[str, int], Dict[str, Any]]:
+        """Evaluate every attribute for each combination of terraform
+        workspace and set of variable values, keyed by (workspace, index of
+        the variable set). Anything that depends on neither, such as
+        resources referenced by name or locals built from literals, is
+        only evaluated once.
+
+            bucket.resolve_matrix(
+                workspaces=["dev", "prod"], var_sets=[{"region": "us"}, {"region": "eu"}]
+            )[("prod", 1)]["name"]
+        """
+        from pyterraformer.core.evaluation import evaluation_matrix
+
+        contexts = evaluation_matrix(self._workspace, self._file, workspaces, var_sets)
+        resolved: Dict[Tuple[str, int], Dict[str, Any]] = {key: {} for key in contexts}
+        for name in self.render_variables:
+            for key, context in contexts.items():
+                resolved[key][str(name)] = context.attribute(self, name)
         return resolved
 
-    @property
-    def resolved_attributes(self):
-        out = {}
-        for key, item in self.render_variables.items():
-            resolved = self.resolve_item(item)
-            out[str(key)] = resolved
+    def instances(
+        self,
+        variables: Optional[Dict[str, Any]] = None,
+        terraform_workspace: Optional[str] = None,
+    ) -> List["ResourceInstance"]:
+        """The instances terraform would create for this object's count or
+        for_each, with their attributes; see pyterraformer.core.expansion"""
+        from pyterraformer.core.expansion import expand
+
+        return expand(self, variables, terraform_workspace)
+
+
+# attributes that are never rendered unless already present in render_variables
+_INTERNAL_ATTRIBUTES = frozenset(("row_num", "template", "name", "tf_id"))
+# attributes objects are referenced by, see SymbolTable
+_NAME_ATTRIBUTES = frozenset(("name", "tf_id"))
+
+_render_variables = TerraformObject.__dict__["render_variables"].__get__
+_set_changed = TerraformObject.__dict__["_changed"].__set__
+_set_version = TerraformObject.__dict__["_version"].__set__
+_dict_setitem = dict.__setitem__
+
+
+class _RenderVariable(object):
+    """Class level accessor for a terraform attribute name.
+
+    Reading an attribute that only exists in render_variables otherwise
+    costs a failed normal lookup before __getattr__ runs. Once a name has
+    been read it gets one of these installed on the class, so later reads
+    go straight to the dict. It only defines __get__, so an instance
+    attribute of the same name, like the label of a Data object, still
+    wins, and instances without the key fall back to __getattr__."""
+
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        try:
+            return _render_variables(obj)[self.name]
+        except (KeyError, AttributeError):
+            raise AttributeError(self.name)
+
+
+# labels and other attributes subclasses keep on the instance
+_INSTANCE_ATTRIBUTES = _INTERNAL_ATTRIBUTES | frozenset(("type",))
+
+
+def _install_accessor(cls: type, name: str):
+    """Install the accessor for name on the concrete class of an object
+    that was read, which for parsed resources is ResourceObject itself"""
+    if (
+        name[0] == "_"
+        or name in _INSTANCE_ATTRIBUTES
+        or cls is TerraformObject
+        or any(name in klass.__dict__ for klass in cls.__mro__)
+    ):
+        return
+    setattr(cls, name, _RenderVariable(name))
+
+
+@lru_cache(maxsize=4096)
+def _attribute_suffix(name: str) -> Optional[Tuple[str, str]]:
+    """Split attribute names like bucket_lookup or name_resolved into
+    the base attribute and the suffix, or None for any other name."""
+    if name.startswith("__"):
+        return None
+    base, separator, suffix = name.rpartition("_")
+    if separator and base and suffix in ("lookup", "resolved"):
+        return base, suffix
+    return None
+
 
-        return out
+_OBJECT_SLOTS = tuple(
+    (name, TerraformObject.__dict__[name])
+    for name in TerraformObject.__slots__
+    # cached results are recomputed rather than stored
+    if name not in ("__dict__", "_resolved_cache")
+)
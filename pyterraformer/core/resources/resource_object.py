@@ -17,9 +17,15 @@ class ResourceObject(TerraformObject):
     _type = "generic_resource_object"
 
     def __init__(
-        self, tf_id: str, _metadata: Optional[ObjectMetadata] = None, **kwargs
+        self,
+        tf_id: str,
+        _metadata: Optional[ObjectMetadata] = None,
+        _type: Optional[str] = None,
+        **kwargs,
     ):
-        TerraformObject.__init__(self, self._type, tf_id, _metadata=_metadata, **kwargs)
+        TerraformObject.__init__(
+            self, _type or self._type, tf_id, _metadata=_metadata, **kwargs
+        )
 
     def render_attribute(self, item):
         return f"${{{self._type}.{self.tf_id}.{item}}}"
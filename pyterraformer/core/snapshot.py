@@ -0,0 +1,120 @@
+"""Binary snapshots of a parsed workspace.
+
+Parsing a large repository is far more expensive than loading the resulting
+object graph, so a workspace can be written out once and reloaded later
+without touching the parser.
+
+A snapshot file is a fixed size header followed by a pickle payload:
+
+    magic (8 bytes) | format version (uint16) | pickle protocol (uint8)
+    | reserved (uint8) | payload length (uint64) | payload
+
+The payload contains the complete parsed graph - files, objects,
+interpolation trees, metadata and child workspaces. Runtime collaborators
+(the Terraform executable wrapper and the serializer) are not stored; they
+are supplied again when the snapshot is loaded.
+"""
+
+import mmap
+import os
+import pickle
+import struct
+from pathlib import Path
+from typing import Optional, Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pyterraformer.core.workspace import TerraformWorkspace
+    from pyterraformer.serializer import BaseSerializer
+    from pyterraformer.terraform import Terraform
+
+SNAPSHOT_MAGIC = b"PYTFSNAP"
+SNAPSHOT_VERSION = 11
+
+_HEADER = struct.Struct("<8sHBBQ")
+_TERRAFORM_ID = "terraform"
+_SERIALIZER_ID = "serializer"
+
+
+class _SnapshotPickler(pickle.Pickler):
+    """Externalizes runtime collaborators so they are not stored in the snapshot"""
+
+    def persistent_id(self, obj):
+        from pyterraformer.serializer import BaseSerializer
+        from pyterraformer.terraform import Terraform
+
+        if isinstance(obj, Terraform):
+            return _TERRAFORM_ID
+        elif isinstance(obj, BaseSerializer):
+            return _SERIALIZER_ID
+        return None
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+    def __init__(self, file, terraform, serializer):
+        super().__init__(file)
+        self.terraform = terraform
+        self.serializer = serializer
+
+    def persistent_load(self, pid):
+        if pid == _TERRAFORM_ID:
+            return self.terraform
+        elif pid == _SERIALIZER_ID:
+            return self.serializer
+        raise pickle.UnpicklingError(f"Unknown persistent id {pid} in snapshot")
+
+
+def _resolve_all(workspace: "TerraformWorkspace"):
+    # a snapshot should contain the whole graph, not lazy file references
+    for _ in workspace.files.items():
+        pass
+    for child in workspace.children:
+        _resolve_all(child)
+
+
+def write_snapshot(workspace: "TerraformWorkspace", path: Union[str, Path]):
+    """Write a workspace, and all child workspaces, to a snapshot file"""
+    import io
+
+    _resolve_all(workspace)
+    protocol = pickle.HIGHEST_PROTOCOL
+    buffer = io.BytesIO()
+    _SnapshotPickler(buffer, protocol=protocol).dump(workspace)
+    payload = buffer.getbuffer()
+    header = _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, protocol, 0, len(payload))
+    # write to a temporary file first so a failed write never leaves a
+    # truncated snapshot in place of a good one
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(header)
+        file.write(payload)
+    os.replace(temp_path, path)
+
+
+def read_snapshot(
+    path: Union[str, Path],
+    terraform: Optional["Terraform"] = None,
+    serializer: Optional["BaseSerializer"] = None,
+) -> "TerraformWorkspace":
+    """Load a workspace from a snapshot file written by write_snapshot"""
+    with open(path, "rb") as file:
+        try:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty files cannot be mapped
+            raise ValueError(f"{path} is not a valid workspace snapshot")
+        with mapped:
+            if len(mapped) < _HEADER.size:
+                raise ValueError(f"{path} is not a valid workspace snapshot")
+            magic, version, _protocol, _, length = _HEADER.unpack_from(mapped, 0)
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError(f"{path} is not a valid workspace snapshot")
+            if version != SNAPSHOT_VERSION:
+                raise ValueError(
+                    f"Unsupported snapshot version {version} in {path}, expected {SNAPSHOT_VERSION}. Re-create the snapshot from source."
+                )
+            if len(mapped) < _HEADER.size + length:
+                raise ValueError(f"Snapshot {path} is truncated")
+            mapped.seek(_HEADER.size)
+            return _SnapshotUnpickler(
+                mapped, terraform=terraform, serializer=serializer
+            ).load()
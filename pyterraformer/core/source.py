@@ -0,0 +1,42 @@
+from pathlib import Path
+from typing import Optional, Union
+
+
+class SourceBuffer(object):
+    """The immutable source text of a single file.
+
+    One buffer is shared by every object parsed out of a file; object metadata
+    only holds offsets into it. The text is read once and held in memory, so
+    it stays valid however the file on disk is rewritten later, whether by
+    terraform fmt, an editor or version control.
+    """
+
+    __slots__ = ("location", "_text")
+
+    def __init__(
+        self, text: Optional[str] = None, location: Optional[Union[str, Path]] = None
+    ):
+        self.location = location
+        self._text = text
+
+    @classmethod
+    def from_file(cls, path: Union[str, Path]) -> "SourceBuffer":
+        with open(path, "rb") as file:
+            return cls(text=file.read().decode("utf-8"), location=path)
+
+    @property
+    def text(self) -> str:
+        return self._text or ""
+
+    def slice(self, start: int, end: int) -> str:
+        return (self._text or "")[start:end]
+
+    def __len__(self):
+        return len(self._text or "")
+
+    def __getstate__(self):
+        return {"location": self.location, "_text": self._text}
+
+    def __setstate__(self, state):
+        self.location = state.get("location")
+        self._text = state.get("_text")
@@ -0,0 +1,210 @@
+"""Index of the named objects in a workspace.
+
+References like aws_s3_bucket.b.arn, var.project or data.google_project.p
+are resolved against the whole workspace. Rather than scanning every file
+for each reference, the workspace keeps a symbol table that is built on the
+first lookup and then kept up to date as objects are added, deleted or
+renamed.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple, Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pyterraformer.core.namespace import TerraformFile
+    from pyterraformer.core.objects import TerraformObject
+    from pyterraformer.core.workspace import TerraformWorkspace
+
+
+class SymbolTable(object):
+    def __init__(self, workspace: "TerraformWorkspace"):
+        self.workspace = workspace
+        # bumped on every change, so callers can tell when cached results are stale
+        self.version = 0
+        self._reset()
+
+    def _reset(self):
+        self._built = False
+        self.resources: Dict[str, Dict[str, "TerraformObject"]] = {}
+        self.data: Dict[str, Dict[str, "TerraformObject"]] = {}
+        self.modules: Dict[str, "TerraformObject"] = {}
+        self.outputs: Dict[str, "TerraformObject"] = {}
+        self.variables: Dict[str, "TerraformObject"] = {}
+        self.locals: List["TerraformObject"] = []
+        self._locations: Dict[
+            int, Tuple[Union[Dict[str, "TerraformObject"], List], Optional[str]]
+        ] = {}
+        self._anchors: Dict[str, Any] = {}
+
+    def __getstate__(self):
+        # the index is cheap to rebuild and not worth storing
+        return {"workspace": self.workspace, "version": self.version}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset()
+
+    @property
+    def built(self) -> bool:
+        return self._built
+
+    def build(self):
+        """Index every object in the workspace, parsing any lazy files"""
+        self._reset()
+        for _, file in self.workspace.files.items():
+            for object in file.objects:
+                self._index(object)
+        self._built = True
+        self.version += 1
+
+    def invalidate(self):
+        """Drop the index; it is rebuilt on the next lookup"""
+        self._reset()
+        self.version += 1
+
+    def _ensure_built(self):
+        if not self._built:
+            self.build()
+
+    def add(self, object: "TerraformObject"):
+        """Index a new object, or re-index one whose name changed"""
+        if not self._built:
+            return
+        self._unindex(object)
+        self._index(object)
+        self.version += 1
+
+    rename = add
+
+    def remove(self, object: "TerraformObject"):
+        if not self._built:
+            return
+        self._unindex(object)
+        self.version += 1
+
+    def add_file(self, file: "TerraformFile"):
+        for object in file.objects:
+            self.add(object)
+
+    def remove_file(self, file: "TerraformFile"):
+        for object in file.objects:
+            self.remove(object)
+
+    def _index(self, object: "TerraformObject"):
+        from pyterraformer.core.generics import Data, Local, Output, Variable
+        from pyterraformer.core.modules import ModuleObject
+        from pyterraformer.core.resources import ResourceObject
+
+        table: Union[Dict[str, "TerraformObject"], List]
+        if isinstance(object, Local):
+            self.locals.append(object)
+            self._locations[id(object)] = (self.locals, None)
+            return
+        elif isinstance(object, Variable):
+            table, key = self.variables, _label(object.name)
+        elif isinstance(object, Data):
+            table = self.data.setdefault(_label(object.type), {})
+            key = _label(object.name)
+        elif isinstance(object, ModuleObject):
+            table, key = self.modules, _label(object.tf_id)
+        elif isinstance(object, Output):
+            table, key = self.outputs, _label(object.tf_id)
+        elif isinstance(object, ResourceObject):
+            table = self.resources.setdefault(_label(object._type), {})
+            key = _label(object.tf_id)
+        else:
+            return
+        table[key] = object
+        self._locations[id(object)] = (table, key)
+
+    def _unindex(self, object: "TerraformObject"):
+        location = self._locations.pop(id(object), None)
+        if location is None:
+            return
+        table, key = location
+        if isinstance(table, list):
+            table[:] = [item for item in table if item is not object]
+        elif table.get(key) is object:
+            del table[key]
+
+    def resource(self, resource_type: str, tf_id: str) -> "TerraformObject":
+        self._ensure_built()
+        return self.resources[resource_type][tf_id]
+
+    def resources_of_type(self, resource_type: str) -> Dict[str, "TerraformObject"]:
+        self._ensure_built()
+        return self.resources.setdefault(resource_type, {})
+
+    def data_of_type(self, data_type: str) -> Dict[str, "TerraformObject"]:
+        self._ensure_built()
+        return self.data.setdefault(data_type, {})
+
+    def module(self, name: str) -> "TerraformObject":
+        self._ensure_built()
+        return self.modules[name]
+
+    def output(self, name: str) -> "TerraformObject":
+        self._ensure_built()
+        return self.outputs[name]
+
+    def output_names(self) -> Tuple[str, ...]:
+        self._ensure_built()
+        return tuple(sorted(self.outputs))
+
+    def variable_names(self) -> Tuple[str, ...]:
+        self._ensure_built()
+        return tuple(sorted({*self.variables, *self.workspace.variables}))
+
+    def variable(self, name: str) -> "TerraformObject":
+        # explicitly registered variables win over ones found in files
+        try:
+            return self.workspace.variables[name]
+        except KeyError:
+            pass
+        self._ensure_built()
+        return self.variables[name]
+
+    def local(self, name: str) -> Any:
+        return self.local_object(name).render_variables[name]
+
+    def local_object(self, name: str) -> "TerraformObject":
+        """The locals block that defines name"""
+        self._ensure_built()
+        for object in self.locals:
+            if name in object.render_variables:
+                return object
+        raise KeyError(name)
+
+    def anchor(self, base: str) -> Any:
+        """The cached lookup object for a reference prefix such as var or data"""
+        try:
+            return self._anchors[base]
+        except KeyError:
+            pass
+        from pyterraformer.core.generics.interpolation import (
+            DataLookupInstantiator,
+            FileLookupInstantiator,
+            LocalLookupInstantiator,
+            TerraformLookupInstantiator,
+            VariableLookupInstantiator,
+            FileObjectSubClassLookupInstantiator,
+        )
+
+        if base == "module":
+            anchor = FileLookupInstantiator(self)
+        elif base == "var":
+            anchor = VariableLookupInstantiator(self)
+        elif base == "terraform":
+            anchor = TerraformLookupInstantiator(self.workspace)
+        elif base == "data":
+            anchor = DataLookupInstantiator(self)
+        elif base in ("local", "locals"):
+            anchor = LocalLookupInstantiator(self)
+        else:
+            anchor = FileObjectSubClassLookupInstantiator(self.resources_of_type(base))
+        self._anchors[base] = anchor
+        return anchor
+
+
+def _label(value: Any) -> str:
+    # parsed labels are quoted string literals
+    return str(value).replace('"', "")
@@ -0,0 +1,194 @@
+"""Values of input variables, as terraform would assign them.
+
+Terraform takes variable values from several places, each overriding the
+ones before it:
+
+    TF_VAR_<name> environment variables
+    terraform.tfvars, then terraform.tfvars.json
+    *.auto.tfvars and *.auto.tfvars.json, in lexical order of file name
+    -var-file and -var options, in the order given
+
+Declared defaults apply to whatever none of these set. VariableValues
+merges the sources once into a single table that evaluation reads from.
+It takes -var-file files and -var values separately, and applies every
+file, in the order given, before any value: as terraform would for a
+command line with all -var options after all -var-file options.
+
+    workspace.load_variables(var_files=["prod.tfvars"])
+    workspace.get_object(tf_id="b").resolved_attributes
+
+Tables are immutable, so switching between them is only an assignment:
+
+    dev, prod = (VariableValues.load(path, var_files=[name]) for name in names)
+    workspace.variable_values = prod
+
+Parsed files are cached by path and modification time, so loading the
+same files for another table doesn't parse them again.
+"""
+
+import json
+import os
+from pathlib import Path, PurePath
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple, Union
+
+ENVIRONMENT_PREFIX = "TF_VAR_"
+
+# path -> ((modification time, size), values)
+_FILES: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+
+
+class VariableValues(object):
+    """Variable values from each source, merged by terraform's precedence.
+
+    Args:
+        layers: (source, values) pairs, lowest precedence first; source
+            describes where the values came from, such as a file path
+    """
+
+    __slots__ = ("layers", "values", "sources")
+
+    def __init__(self, layers: Iterable[Tuple[str, Mapping[str, Any]]] = ()):
+        self.layers: List[Tuple[str, Dict[str, Any]]] = []
+        self.values: Dict[str, Any] = {}
+        # name -> the source its value came from
+        self.sources: Dict[str, str] = {}
+        for source, values in layers:
+            values = dict(values)
+            self.layers.append((source, values))
+            for name in values:
+                self.sources[name] = source
+            self.values.update(values)
+
+    @classmethod
+    def load(
+        cls,
+        path: Union[str, PurePath],
+        var_files: Iterable[Union[str, PurePath]] = (),
+        variables: Optional[Mapping[str, Any]] = None,
+        environ: Optional[Mapping[str, str]] = None,
+        declared: Optional[Iterable[str]] = None,
+    ) -> "VariableValues":
+        """Collect values the way terraform does for a root module.
+
+        Args:
+            path: the root module directory, searched for terraform.tfvars
+                and *.auto.tfvars files
+            var_files: files passed with -var-file, relative to path
+            variables: values passed with -var, which override the
+                var_files; strings are interpreted the way terraform
+                interprets them on the command line
+            environ: environment to read TF_VAR_ values from, defaulting
+                to os.environ
+            declared: the names of the variables the root declares; TF_VAR_
+                values of other names are kept as given, as terraform
+                ignores them
+        """
+        root = Path(path)
+        environ = os.environ if environ is None else environ
+        names = None if declared is None else frozenset(declared)
+        environment = {}
+        for key, value in sorted(environ.items()):
+            if not key.startswith(ENVIRONMENT_PREFIX):
+                continue
+            name = key[len(ENVIRONMENT_PREFIX) :]
+            if names is None or name in names:
+                value = _parse_environment_value(value)
+            environment[name] = value
+        layers: List[Tuple[str, Mapping[str, Any]]] = [("environment", environment)]
+        for name in ("terraform.tfvars", "terraform.tfvars.json"):
+            if (root / name).is_file():
+                layers.append((str(root / name), load_var_file(root / name)))
+        if root.is_dir():
+            automatic = sorted(
+                item.name
+                for item in root.iterdir()
+                if item.name.endswith((".auto.tfvars", ".auto.tfvars.json"))
+                and item.is_file()
+            )
+            for name in automatic:
+                layers.append((str(root / name), load_var_file(root / name)))
+        for var_file in var_files:
+            location = root / var_file
+            if not location.is_file():
+                raise ValueError(f"Variables file {location} does not exist")
+            layers.append((str(location), load_var_file(location)))
+        if variables:
+            layers.append(
+                (
+                    "arguments",
+                    {
+                        name: (
+                            parse_cli_value(value) if isinstance(value, str) else value
+                        )
+                        for name, value in variables.items()
+                    },
+                )
+            )
+        return cls(layers)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.values
+
+    def __getitem__(self, name: str) -> Any:
+        return self.values[name]
+
+    def get(self, name: str, fallback: Any = None) -> Any:
+        return self.values.get(name, fallback)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __repr__(self):
+        return f"VariableValues({[source for source, _ in self.layers]})"
+
+
+def load_var_file(path: Union[str, PurePath]) -> Dict[str, Any]:
+    """The evaluated values in a .tfvars or .tfvars.json file"""
+    location = os.path.abspath(path)
+    stat = os.stat(location)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _FILES.get(location)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    with open(location, "r") as file:
+        text = file.read()
+    if location.endswith(".json"):
+        values = json.loads(text) if text.strip() else {}
+        if not isinstance(values, dict):
+            raise ValueError(f"Variables file {location} must contain an object")
+    else:
+        values = parse_var_text(text)
+    _FILES[location] = (key, values)
+    return values
+
+
+def parse_var_text(text: str) -> Dict[str, Any]:
+    """Evaluate the variable definitions in tfvars syntax"""
+    from pyterraformer.core.evaluation import EvaluationContext, evaluate
+    from pyterraformer.serializer.human_resources.engine import parse_tfvars
+
+    # variables files can only contain literal values
+    context = EvaluationContext()
+    return {
+        name: evaluate(value, context) for name, value in parse_tfvars(text).items()
+    }
+
+
+def parse_cli_value(value: str) -> Any:
+    """Interpret a -var or TF_VAR_ value. Lists, maps and objects are
+    written in terraform syntax; anything else is taken as a string."""
+    if value.strip().startswith(("[", "{")):
+        return parse_var_text(f"value = {value}\n")["value"]
+    return value
+
+
+def _parse_environment_value(value: str) -> Any:
+    """parse_cli_value, keeping the string as given if it doesn't parse.
+    The environment is shared with everything else, so a malformed value
+    shouldn't stop the rest from loading."""
+    from lark.exceptions import LarkError
+
+    try:
+        return parse_cli_value(value)
+    except (LarkError, ValueError, KeyError):
+        return value
@@ -0,0 +1,273 @@
+"""Containers that report in-place mutation to the object that owns them.
+
+Attribute values of a TerraformObject are plain python containers, so
+something like
+
+    bucket.tags["Environment"] = "Prod"
+
+never passes through the object itself. The containers here are drop-in
+subclasses of dict, list, BlockList and BlockSet that flag their owning
+object (and through it, its file) as changed when they are mutated.
+Reads are inherited unchanged from the builtin types.
+"""
+
+from typing import Any, Optional, TYPE_CHECKING
+
+from pyterraformer.core.generics.terraform_block import BlockList, BlockSet
+
+if TYPE_CHECKING:
+    from pyterraformer.core.objects import TerraformObject
+
+
+def _notify(container):
+    owner = container._owner
+    if owner is not None:
+        owner._mark_changed()
+
+
+class TrackedDict(dict):
+    __slots__ = ("_owner",)
+
+    def __init__(self, owner: Optional["TerraformObject"] = None, *args, **kwargs):
+        self._owner = owner
+        super().__init__()
+        for key, value in dict(*args, **kwargs).items():
+            dict.__setitem__(self, key, track(value, owner))
+
+    def __reduce__(self):
+        return _restore, (type(self), dict(self), self._owner)
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, track(value, self._owner))
+        _notify(self)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        _notify(self)
+
+    def clear(self):
+        dict.clear(self)
+        _notify(self)
+
+    def pop(self, *args):
+        value = dict.pop(self, *args)
+        _notify(self)
+        return value
+
+    def popitem(self):
+        item = dict.popitem(self)
+        _notify(self)
+        return item
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return dict.__getitem__(self, key)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            dict.__setitem__(self, key, track(value, self._owner))
+        _notify(self)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+
+class _TrackedSequenceMixin(object):
+    __slots__ = ()
+
+    def __reduce__(self):
+        return _restore, (type(self), list(self), self._owner)
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            value = [track(item, self._owner) for item in value]
+        else:
+            value = track(value, self._owner)
+        super().__setitem__(index, value)
+        _notify(self)
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        _notify(self)
+
+    def append(self, value):
+        super().append(track(value, self._owner))
+        _notify(self)
+
+    def extend(self, values):
+        super().extend([track(value, self._owner) for value in values])
+        _notify(self)
+
+    def insert(self, index, value):
+        super().insert(index, track(value, self._owner))
+        _notify(self)
+
+    def pop(self, *args):
+        value = super().pop(*args)
+        _notify(self)
+        return value
+
+    def remove(self, value):
+        super().remove(value)
+        _notify(self)
+
+    def clear(self):
+        super().clear()
+        _notify(self)
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        _notify(self)
+
+    def reverse(self):
+        super().reverse()
+        _notify(self)
+
+    def __iadd__(self, values):
+        self.extend(values)
+        return self
+
+    def __imul__(self, count):
+        result = super().__imul__(count)
+        _notify(self)
+        return result
+
+
+class TrackedList(_TrackedSequenceMixin, list):
+    __slots__ = ("_owner",)
+
+    def __init__(self, owner: Optional["TerraformObject"] = None, values=()):
+        self._owner = owner
+        list.__init__(self, [track(value, owner) for value in values])
+
+
+class TrackedBlockList(_TrackedSequenceMixin, BlockList):
+    __slots__ = ("_owner",)
+
+    def __init__(self, owner: Optional["TerraformObject"] = None, values=()):
+        self._owner = owner
+        BlockList.__init__(self, [track(value, owner) for value in values])
+
+
+class TrackedBlockSet(BlockSet):
+    __slots__ = ("_owner",)
+
+    def __init__(self, owner: Optional["TerraformObject"] = None, values=()):
+        self._owner = owner
+        BlockSet.__init__(self, values)
+
+    def __reduce__(self):
+        return _restore, (type(self), list(self), self._owner)
+
+    def add(self, value):
+        BlockSet.add(self, value)
+        _notify(self)
+
+    def discard(self, value):
+        BlockSet.discard(self, value)
+        _notify(self)
+
+    def remove(self, value):
+        BlockSet.remove(self, value)
+        _notify(self)
+
+    def pop(self):
+        value = BlockSet.pop(self)
+        _notify(self)
+        return value
+
+    def clear(self):
+        BlockSet.clear(self)
+        _notify(self)
+
+    def update(self, *others):
+        BlockSet.update(self, *others)
+        _notify(self)
+
+    def difference_update(self, *others):
+        BlockSet.difference_update(self, *others)
+        _notify(self)
+
+    def intersection_update(self, *others):
+        BlockSet.intersection_update(self, *others)
+        _notify(self)
+
+    def symmetric_difference_update(self, other):
+        BlockSet.symmetric_difference_update(self, other)
+        _notify(self)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __iand__(self, other):
+        self.intersection_update(other)
+        return self
+
+    def __isub__(self, other):
+        self.difference_update(other)
+        return self
+
+    def __ixor__(self, other):
+        self.symmetric_difference_update(other)
+        return self
+
+
+_TRACKED_TYPES = {
+    dict: TrackedDict,
+    list: TrackedList,
+    BlockList: TrackedBlockList,
+    BlockSet: TrackedBlockSet,
+}
+
+
+def _restore(cls, values, owner):
+    if cls is TrackedDict:
+        restored = TrackedDict(owner)
+        dict.update(restored, values)
+        return restored
+    restored = cls(owner)
+    # restored children are already tracked, so bypass the tracking hooks
+    if cls is TrackedBlockSet:
+        BlockSet.update(restored, values)
+    else:
+        list.extend(restored, values)
+    return restored
+
+
+def track(value: Any, owner: Optional["TerraformObject"]) -> Any:
+    """Return value with any nested containers reporting changes to owner.
+
+    Plain containers are copied into their tracked counterparts, while
+    tracked containers that don't belong to another object are adopted."""
+    tracker = _TRACKERS.get(type(value))
+    if tracker is None:
+        return value
+    return tracker(value, owner)
+
+
+def _adopt(value, owner):
+    current = value._owner
+    if current is owner:
+        return value
+    if current is not None:
+        # never steal a container from another object
+        return type(value)(owner, value)
+    value._owner = owner
+    children = value.values() if isinstance(value, dict) else value
+    for child in children:
+        if type(child) in _ADOPTABLE:
+            _adopt(child, owner)
+    return value
+
+
+_ADOPTABLE = frozenset(_TRACKED_TYPES.values())
+_TRACKERS = {
+    **{
+        plain: (lambda value, owner, tracked=tracked: tracked(owner, value))
+        for plain, tracked in _TRACKED_TYPES.items()
+    },
+    **{tracked: _adopt for tracked in _ADOPTABLE},
+}
@@ -1,19 +1,28 @@
+import os
 import re
 from collections import defaultdict
 from fnmatch import fnmatch
 from os.path import dirname
 from pathlib import Path, PurePath
-from typing import Dict, List, Union, Any
+from typing import Dict, Iterable, List, Set, Union, Any
 from typing import Optional, TYPE_CHECKING
 
 from pyterraformer.constants import logger
 from pyterraformer.core.generics import Literal, BlockList
+from pyterraformer.core.graph import ReferenceGraph, declared_addresses
+from pyterraformer.core.modules import ModuleLoader
+from pyterraformer.core.symbols import SymbolTable
+from pyterraformer.core.tfvars import VariableValues
 from pyterraformer.core.utility import get_root
 from pyterraformer.serializer import BaseSerializer
 from pyterraformer.terraform import Terraform
 
 if TYPE_CHECKING:
+    from pyterraformer.core.expansion import ResourceInstance
     from pyterraformer.core.namespace import TerraformFile
+    from pyterraformer.core.objects import TerraformObject
+    from pyterraformer.terraform.plan import PlanIndex
+    from pyterraformer.terraform.plan_cache import SavedPlan
     from pyterraformer.core.generics.variables import Variable
 
 
@@ -101,17 +110,213 @@ class TerraformWorkspace(object):
         self.path = str(path)
         self._path = Path(self.path)
         self.files: Dict[str, TerraformFile] = LazyFileDict()
+        self.symbols = SymbolTable(self)
+        self.graph = ReferenceGraph(self)
+        self.module_loader = ModuleLoader(self)
         if files:
             for file in files:
-                self.files[file.name] = files
+                self.files[file.name] = file
         self.children: List[TerraformWorkspace] = children or []
         self.name = self._path.stem
         self.variables: Dict[str, "Variable"] = {}
+        # values assigned to input variables, see load_variables
+        self.variable_values: Optional[VariableValues] = None
+        # addresses added, removed or changed since the last apply, and
+        # whether anything without an address, such as a provider, changed
+        self.pending_changes: Set[str] = set()
+        self.untargetable_change = False
         self.data: List = []
         self.serializer = serializer
 
-    def apply(self):
-        return self.terraform.run(["apply", "--auto-approve"], path=self._path)
+    def record_change(self, object: "TerraformObject"):
+        """Note that object was added, removed or changed, for targeted
+        plans and applies"""
+        addresses = declared_addresses(object)
+        if addresses:
+            self.pending_changes.update(addresses)
+        else:
+            self.untargetable_change = True
+
+    def change_targets(self) -> Optional[List[str]]:
+        """-target addresses covering every change since the last apply and
+        everything that refers to what changed. None if a full plan is
+        needed: when nothing changed, or a change can't be targeted."""
+        from pyterraformer.core.namespace import LazyFile
+
+        for _, file in self.files.items(resolve=False):
+            if isinstance(file, LazyFile):
+                # unchanged since it hasn't been loaded
+                continue
+            for object in file.objects:
+                if object._changed:
+                    self.record_change(object)
+        if self.untargetable_change or not self.pending_changes:
+            return None
+        return self.graph.targets(self.pending_changes) or None
+
+    def _target_arguments(self, targeted: bool) -> List[str]:
+        if not targeted:
+            return []
+        targets = self.change_targets()
+        if targets is None:
+            logger.info(f"Changes to {self.path} can't be targeted, running in full.")
+            return []
+        return [f"-target={target}" for target in targets]
+
+    def apply(self, plan: Optional["SavedPlan"] = None, targeted: bool = False):
+        """Run terraform apply, or apply a plan saved with plan(out=...)
+        exactly as planned. A saved plan is rejected with ValueError when
+        its file is gone or anything it depends on has changed since.
+
+        targeted limits the apply to what changed since the last one, see
+        change_targets; a saved plan is already limited to what it targets."""
+        if plan is None:
+            output = self.terraform.run(
+                ["apply", "--auto-approve", *self._target_arguments(targeted)],
+                path=self._path,
+            )
+        else:
+            if plan.workspace != self.terraform.workspace:
+                raise ValueError(
+                    f"Plan {plan.path} is for workspace {plan.workspace}, "
+                    f"not {self.terraform.workspace}"
+                )
+            if not plan.is_current(self):
+                raise ValueError(
+                    f"Plan {plan.path} is stale, {self.path} changed since it was made"
+                )
+            output = self.terraform.run(
+                ["apply", "-input=false", plan.path], path=self._path
+            )
+        # applying changes state, which stored plans can't account for
+        if self.terraform.plan_cache is not None:
+            self.terraform.plan_cache.invalidate(self._path, self.terraform.workspace)
+        if plan is not None and os.path.isfile(plan.path):
+            os.unlink(plan.path)
+        self.pending_changes.clear()
+        self.untargetable_change = False
+        return output
+
+    def plan(
+        self,
+        arguments: Optional[List[str]] = None,
+        cache: bool = True,
+        out: Union[None, bool, str] = None,
+        targeted: bool = False,
+    ) -> Union[str, "SavedPlan"]:
+        """Run terraform plan. If the terraform wrapper has a plan cache, and
+        nothing the plan depends on has changed since the last successful
+        one, the output of that plan is returned instead of planning again.
+
+        With out, the plan is saved - to the path given, or with out=True to
+        a file named after the input fingerprint - and a SavedPlan of it is
+        returned, for apply(plan=...).
+
+        targeted limits the plan to what changed since the last apply, and
+        everything that refers to it, with -target; see change_targets. For
+        large roots that saves refreshing everything else."""
+        from pyterraformer.terraform.plan_cache import (
+            SavedPlan,
+            input_fingerprint,
+            saved_plan_path,
+        )
+
+        arguments = [
+            "plan",
+            "-input=false",
+            *(arguments or []),
+            *self._target_arguments(targeted),
+        ]
+        plan_cache = self.terraform.plan_cache if cache else None
+        if plan_cache is None and not out:
+            return self.terraform.run(arguments, path=self._path)
+        fingerprint = input_fingerprint(self, arguments)
+        workspace = self.terraform.workspace
+        if out is True:
+            plan_file = saved_plan_path(self, fingerprint)
+        elif out:
+            plan_file = os.path.abspath(self._path / out)
+        else:
+            plan_file = None
+        entry = None
+        if plan_cache is not None:
+            entry = plan_cache.get(self._path, workspace, fingerprint)
+            if entry is not None and plan_file is not None:
+                # only a saved plan of the same file will do
+                if entry.get("plan_file") != plan_file or not os.path.isfile(plan_file):
+                    entry = None
+            if entry is not None:
+                plan_cache.skipped += 1
+        if entry is not None:
+            logger.info(f"Inputs of {self.path} unchanged, skipping plan.")
+            output = entry["output"]
+        else:
+            command = (
+                arguments if plan_file is None else [*arguments, f"-out={plan_file}"]
+            )
+            output = self.terraform.run(command, path=self._path)
+            if plan_cache is not None:
+                plan_cache.planned += 1
+                plan_cache.put(
+                    self._path, workspace, fingerprint, output, plan_file=plan_file
+                )
+        if plan_file is None:
+            return output
+        return SavedPlan(
+            path=plan_file,
+            root=os.path.abspath(self.path),
+            workspace=workspace,
+            arguments=arguments,
+            fingerprint=fingerprint,
+            output=output,
+            summary=self.show_plan(plan_file, values=False),
+        )
+
+    def show_plan(self, plan_file: str, **kwargs) -> "PlanIndex":
+        """The resource changes of a plan saved in plan_file, see
+        Terraform.show_plan for filtering them"""
+        return self.terraform.show_plan(plan_file, path=self._path, **kwargs)
+
+    def snapshot(self, path: Union[str, PurePath]):
+        """Write the fully parsed workspace, including child workspaces,
+        to a binary snapshot file that can be reloaded without parsing."""
+        from pyterraformer.core.snapshot import write_snapshot
+
+        write_snapshot(self, path)
+
+    @classmethod
+    def from_snapshot(
+        cls,
+        path: Union[str, PurePath],
+        terraform: Optional[Terraform] = None,
+        serializer: Optional[BaseSerializer] = None,
+    ) -> "TerraformWorkspace":
+        """Load a workspace written by snapshot.
+        The terraform and serializer are not stored in the snapshot,
+        and are attached to the loaded workspace and all children."""
+        from pyterraformer.core.snapshot import read_snapshot
+
+        return read_snapshot(path, terraform=terraform, serializer=serializer)
+
+    def load_variables(
+        self,
+        var_files: Iterable[Union[str, PurePath]] = (),
+        variables: Optional[Dict[str, Any]] = None,
+        environ: Optional[Dict[str, str]] = None,
+    ) -> VariableValues:
+        """Assign input variables from terraform.tfvars, *.auto.tfvars,
+        the given -var-file files and -var values, and TF_VAR_ environment
+        variables, with terraform's precedence; the -var values come after
+        every -var-file. Evaluation uses these in place of declared
+        defaults until variable_values is replaced."""
+        self.variable_values = VariableValues.load(
+            self._path,
+            var_files=var_files,
+            variables=variables,
+            environ=environ,
+            declared=self.symbols.variable_names(),
+        )
+        return self.variable_values
 
     @property
     def terraform_path(self):
@@ -166,7 +371,11 @@ class TerraformWorkspace(object):
         from pyterraformer.core.namespace import TerraformFile
 
         if isinstance(file, TerraformFile):
+            existing = dict.get(self.files, file.name)
+            if isinstance(existing, TerraformFile) and existing is not file:
+                self.symbols.remove_file(existing)
             self.files[file.name] = file
+            self.symbols.add_file(file)
             return file
         elif str(file) in self.files:
             return self.files[str(file)]
@@ -197,10 +406,10 @@ class TerraformWorkspace(object):
 
         if isinstance(values, dict):
             vtype = "map"
-            variable = Variable(None, key, [["type", vtype], ["default", values]])
+            variable = Variable(key, type=vtype, default=values)
         elif isinstance(values, str):
             vtype = "string"
-            variable = Variable(None, key, [["type", vtype], ["default", values]])
+            variable = Variable(key, type=vtype, default=values)
         elif isinstance(values, Variable):
             variable = values
         else:
@@ -225,7 +434,10 @@ class TerraformWorkspace(object):
             raise e
         self.files["variables.tf"].delete_object(variable)
 
-    def save(self, format: bool = True, apply: bool = False):
+    def save(self, format: bool = True, apply: bool = False, force: bool = False):
+        """Write changed files back to disk.
+        Files with no added, removed or modified objects are skipped,
+        unless force is set."""
         from pyterraformer.core.namespace import LazyFile
 
         if not self.serializer:
@@ -236,6 +448,9 @@ class TerraformWorkspace(object):
             if isinstance(file, LazyFile):
                 logger.info("Skipping lazily unparsed file")
                 continue
+            if not (force or file.changed):
+                logger.info(f"Skipping unchanged file {key}")
+                continue
             file.save(self.serializer)
             if str(file.location).endswith(".tf"):
                 format = True
@@ -247,10 +462,10 @@ class TerraformWorkspace(object):
         if apply:
             self.apply()
 
-    def save_all(self, format=True):
-        self.save(format)
+    def save_all(self, format=True, force: bool = False):
+        self.save(format, force=force)
         for ws in self.children:
-            ws.save_all(format)
+            ws.save_all(format, force=force)
 
     def find(self, object_type, invert=False):
         from pyterraformer.core.namespace import LazyFile
@@ -275,6 +490,18 @@ class TerraformWorkspace(object):
             return out_list
         return output
 
+    def instances(
+        self,
+        variables: Optional[Dict[str, Any]] = None,
+        terraform_workspace: Optional[str] = None,
+    ) -> Dict[str, "ResourceInstance"]:
+        """Every resource, data source and module instance the configuration
+        declares, keyed by address such as aws_instance.web[0], without
+        running a plan"""
+        from pyterraformer.core.expansion import expand_workspace
+
+        return expand_workspace(self, variables, terraform_workspace)
+
     def get_object(self, **kwargs):
         for key, file in self.files.items():
             try:
@@ -1,4 +1,6 @@
-from typing import Dict, Tuple, Any
+from functools import lru_cache
+from sys import intern
+from typing import Dict, Tuple, Any, Optional
 
 from lark import Lark, Transformer, v_args
 from lark.tree import Meta
@@ -34,9 +36,12 @@ from pyterraformer.core.generics import (
     GenericFunction,
     Symlink,
     ToSet,
+    UnaryOp,
 )
 from pyterraformer.core.modules import ModuleObject
 from pyterraformer.core.objects import ObjectMetadata, TerraformObject
+from pyterraformer.core.source import SourceBuffer
+from pyterraformer.core.symbols import _label
 from typing import List
 
 # TODO: rewrite to comply with https://github.com/hashicorp/hcl2/blob/master/hcl/hclsyntax/spec.md
@@ -60,6 +65,9 @@ grammar = r"""
     //TODO: in parsing - follow symlinks?
     symlink: "."+ "/" /[a-zA-Z_\-]+/ ".tf"
 
+    // variable definitions (.tfvars) files
+    tfvars: (nested_comment | dict_sub_object)*
+
     resource: "resource" string_lit string_lit  "{" (nested_comment| sub_object | lifecycle | provider | split_subarray ) + "}"
     
     nested_comment: comment
@@ -100,10 +108,10 @@ grammar = r"""
 
     // replace with expr_contents
     // figure out why dot identifiers are ever valid
-    sub_object: (IDENTIFIER |string_lit | IDENTIFIER_WITH_DOT) "=" ( setsubtract | lookup | tuple | string_lit | file | toset | concat | merge | boolean | dict | int_lit | object_access |  conditional | heredoc_eof | IDENTIFIER | generic_function | list_comp) ","? nested_comment?    -> sub_object
+    sub_object: (IDENTIFIER |string_lit | IDENTIFIER_WITH_DOT) "=" ( setsubtract | lookup | tuple | string_lit | file | toset | concat | merge | boolean | dict | int_lit | object_access |  conditional | operation | heredoc_eof | IDENTIFIER | generic_function | list_comp) ","? nested_comment?    -> sub_object
 
     // annoyingly repetitive
-    dict_sub_object: (IDENTIFIER |string_lit | IDENTIFIER_WITH_DOT) ("=" | ":") ( setsubtract | lookup | tuple | string_lit | file | toset | concat | merge | boolean | dict | int_lit | object_access |  conditional | heredoc_eof | IDENTIFIER | generic_function | list_comp) ","? nested_comment?  -> sub_object
+    dict_sub_object: (IDENTIFIER |string_lit | IDENTIFIER_WITH_DOT) ("=" | ":") ( setsubtract | lookup | tuple | string_lit | file | toset | concat | merge | boolean | dict | int_lit | object_access |  conditional | operation | heredoc_eof | IDENTIFIER | generic_function | list_comp) ","? nested_comment?  -> sub_object
 
     dict: "{" (nested_comment | dict_sub_object )* "}"
 
@@ -137,7 +145,8 @@ grammar = r"""
     setsubtract: "setsubtract" "(" (expr_contents | tuple) "," (expr_contents | tuple) ")"
     list_lit: "list" "("  ( (EMPTY_STRING)| expr_contents )+ ")"
     element: "element" "(" (expr_contents)+ "," int_lit ")"
-    generic_function: IDENTIFIER "(" (expr_contents)+ ")"
+    generic_function: IDENTIFIER "(" (argument ("," argument)* ","?)? ")"
+    argument: (expr_contents)+ | dict
 
     ?expr_contents : conditional
                 | interpolation
@@ -204,7 +213,8 @@ grammar = r"""
     // map is valid and refers to map(any) https://www.terraform.io/docs/configuration/types.html#map-
     TYPE : "string" | "number" | "bool" | "map" | "list" | "any"
     // TODO: finish object and tuple
-    types:(("tuple" | "set" | "map" | "object" | "list" ) "(" types ")") | TYPE
+    TYPE_CONSTRUCTOR : "tuple" | "set" | "map" | "object" | "list"
+    types:(TYPE_CONSTRUCTOR "(" types ")") | TYPE
 
     %import common.WS_INLINE -> _WHITESPACE
     %import common.WS
@@ -215,6 +225,9 @@ grammar = r"""
 def args_to_dict(input_list: list) -> Dict[str, Any]:
     output: Dict[str, Any] = {}
     for array in input_list:
+        # empty optional groups in the grammar show up as None
+        if array is None:
+            continue
         key = array[0]
         val = array[1]
         # a comment might show up as a third object on a line
@@ -223,30 +236,40 @@ def args_to_dict(input_list: list) -> Dict[str, Any]:
             nested = array[2]
             output = {**output, **args_to_dict([nested])}
         if key not in output:
-            output[str(key)] = val
+            output[intern(str(key))] = val
         else:
             output[key] += val
     return output
 
 
+@lru_cache(maxsize=1 << 16)
+def _identifier(value: str) -> String:
+    # nodes are immutable, so every occurrence of an identifier
+    # can share a single String
+    return String(intern(value))
+
+
 class ParseToObjects(Transformer):
-    def __init__(self, visit_tokens, text):
+    def __init__(self, visit_tokens, text, source: Optional[SourceBuffer] = None):
         Transformer.__init__(self, visit_tokens)
         self.text = text
+        self.source = source
 
     def meta_to_text(self, meta: Meta):
         return self.text[meta.start_pos : meta.end_pos]
 
     def generate_metadata(self, meta: Meta) -> ObjectMetadata:
+        # objects share the file level source buffer instead of copying text
         return ObjectMetadata(
-            orig_text=self.text[meta.start_pos : meta.end_pos],
+            source=self.source,
             start_pos=meta.start_pos,
             end_pos=meta.end_pos,
             row_num=meta.line,
         )
 
     def IDENTIFIER(self, args):
-        return String(args.value)
+        # identifiers repeat heavily across a repo, so share one copy of each
+        return _identifier(args.value)
 
     def STRING_CHARS(self, args):
         return String(args.value)
@@ -263,37 +286,36 @@ class ParseToObjects(Transformer):
 
         metadata = self.generate_metadata(meta)
         _type, name = args[0:2]
-        _type = str(_type).replace('"', "")
-        object_type = RESOURCES_MAP.get(_type, ResourceObject)
-        object_type._type = _type
+        _type = intern(str(_type).replace('"', ""))
         # out = RESOURCES_MAP[str(type).replace('"', "")](
         #     name, str(type), , args[2:]
         # )
         remaining = args[2:]
         parsed = args_to_dict(remaining)
-        return object_type(tf_id=name, _metadata=metadata, **parsed)
+        object_type = RESOURCES_MAP.get(_type)
+        if object_type:
+            return object_type(tf_id=name, _metadata=metadata, **parsed)
+        return ResourceObject(tf_id=name, _metadata=metadata, _type=_type, **parsed)
 
     @v_args(meta=True)
     def module(self, meta: Meta, args):
         name = args[0]
         remaining = args[1:]
         parsed = args_to_dict(remaining)
-        out = ModuleObject(tf_id=name, _metadata=self.meta_to_text(meta), **parsed)
+        out = ModuleObject(tf_id=name, _metadata=self.generate_metadata(meta), **parsed)
         return out
 
     @v_args(meta=True)
     def variable(self, meta: Meta, args):
         name = args[0]
-        args = args[1:]
-        out = Variable(self.meta_to_text(meta), name, args)
-        out.row_num = meta.start_pos
-        return out
+        parsed = args_to_dict(args[1:])
+        return Variable(name, _metadata=self.generate_metadata(meta), **parsed)
 
     @v_args(meta=True)
     def provider(self, meta: Meta, args):
         name = args[0]
         metadata = self.generate_metadata(meta)
-        remaining = args[0:]
+        remaining = args[1:]
         parsed = args_to_dict(remaining)
         out = Provider(name, _metadata=metadata, **parsed)
         return out
@@ -308,27 +330,20 @@ class ParseToObjects(Transformer):
 
     @v_args(meta=True)
     def terraform(self, meta: Meta, args):
-        from pyterraformer.core.objects import ObjectMetadata
-
-        metadata = ObjectMetadata(
-            orig_text=self.meta_to_text(meta), row_num=meta.start_pos
-        )
-
+        metadata = self.generate_metadata(meta)
         parsed = args_to_dict(args)
         return TerraformConfig(_metadata=metadata, **parsed)
 
     @v_args(meta=True)
     def data(self, meta: Meta, args):
         type, name = args[0:2]
-        out = Data(name, type, self.meta_to_text(meta), args[2:])
-        out.row_num = meta.start_pos
-        return out
+        parsed = args_to_dict(args[2:])
+        return Data(name, type, _metadata=self.generate_metadata(meta), **parsed)
 
     @v_args(meta=True)
     def locals(self, meta: Meta, args):
-        out = Local(self.meta_to_text(meta), args[0])
-        out.row_num = meta.start_pos
-        return out
+        parsed = {intern(str(key)): value for key, value in args[0].items()}
+        return Local(_metadata=self.generate_metadata(meta), **parsed)
 
     @v_args(meta=True)
     def comment(self, meta: Meta, args):
@@ -343,9 +358,7 @@ class ParseToObjects(Transformer):
 
     @v_args(meta=True)
     def multiline_comment(self, meta: Meta, args):
-        metadata = ObjectMetadata(
-            orig_text=self.meta_to_text(meta), row_num=meta.start_pos
-        )
+        metadata = self.generate_metadata(meta)
         base = args[0].value
         if len(args) > 1:
             base += args[1].value
@@ -356,13 +369,14 @@ class ParseToObjects(Transformer):
     def backend(self, meta: Meta, args):
         from pyterraformer.core.generics import Backend
 
-        metadata = ObjectMetadata(
-            orig_text=self.meta_to_text(meta), row_num=meta.start_pos
-        )
-        return "backend", Backend(args[0], _metadata=metadata)
+        metadata = self.generate_metadata(meta)
+        parsed = args_to_dict(args[1:])
+        return "backend", Backend(args[0], _metadata=metadata, **parsed)
 
-    def output(self, args):
-        return Output(args[0], args[1:])
+    @v_args(meta=True)
+    def output(self, meta: Meta, args):
+        parsed = args_to_dict(args[1:])
+        return Output(args[0], _metadata=self.generate_metadata(meta), **parsed)
 
     def tuple(self, args):
         return [*args]
@@ -371,7 +385,10 @@ class ParseToObjects(Transformer):
         return args
 
     def variable_type_declaration(self, args):
-        return ["_type", args[0]]
+        return ["type", args[0]]
+
+    def variable_description(self, args):
+        return ["description", args[0]]
 
     def variable_default_declaration(self, args):
         return ["default", args[0]]
@@ -391,6 +408,13 @@ class ParseToObjects(Transformer):
     def start(self, args):
         return list(args)
 
+    def tfvars(self, args):
+        return {
+            _label(key): value
+            for key, value in args_to_dict(args).items()
+            if not key.startswith("comment-")
+        }
+
     def lookup(self, args):
         base = args[0]
         return PropertyLookup(base, args[1:])
@@ -431,6 +455,38 @@ class ParseToObjects(Transformer):
     def generic_function(self, args):
         return GenericFunction(args)
 
+    def argument(self, args):
+        if len(args) == 1:
+            return args[0]
+        return Expression(args)
+
+    # builtin functions with their own syntax rules are plain function calls
+    def coalesce(self, args):
+        return GenericFunction([_identifier("coalesce"), *args])
+
+    def contains(self, args):
+        return GenericFunction([_identifier("contains"), *args])
+
+    def flatten(self, args):
+        return GenericFunction([_identifier("flatten"), *args])
+
+    def setsubtract(self, args):
+        return GenericFunction([_identifier("setsubtract"), *args])
+
+    def list_lit(self, args):
+        return GenericFunction([_identifier("list"), *args])
+
+    def element(self, args):
+        return GenericFunction(
+            [_identifier("element"), self.argument(args[:-1]), args[-1]]
+        )
+
+    def unary_op(self, args):
+        return UnaryOp(args)
+
+    def null(self, args):
+        return _identifier("null")
+
     def replace(self, args):
         return Replace(args)
 
@@ -441,7 +497,7 @@ class ParseToObjects(Transformer):
         return BinaryTerm(args)
 
     def bool_token(self, args):
-        return str(args[0].value)
+        return BinaryOperator(args)
 
     def split_subarray(self, args: list) -> Tuple[str, BlockList]:
         name = args[0]
@@ -458,10 +514,27 @@ class ParseToObjects(Transformer):
         return Symlink(args)
 
 
-TERRAFORM_PARSER = Lark(grammar, start="start", propagate_positions=True)
+TERRAFORM_PARSER = Lark(grammar, start=["start", "tfvars"], propagate_positions=True)
+
+
+def parse_text(
+    text: str, source: Optional[SourceBuffer] = None, keep_source: bool = True
+) -> List[TerraformObject]:
+    """Parse terraform text into objects.
+    Object metadata refers into the source buffer for the original text;
+    with keep_source disabled no source text is retained at all."""
+    if source is None and keep_source:
+        source = SourceBuffer(text)
+    elif not keep_source:
+        source = None
+    return ParseToObjects(visit_tokens=True, text=text, source=source).transform(
+        TERRAFORM_PARSER.parse(text, start="start")
+    )
 
 
-def parse_text(text: str) -> List[TerraformObject]:
-    return ParseToObjects(visit_tokens=True, text=text).transform(
-        TERRAFORM_PARSER.parse(text)
+def parse_tfvars(text: str) -> Dict[str, Any]:
+    """Parse a variable definitions (.tfvars) file into unevaluated values
+    keyed by variable name"""
+    return ParseToObjects(visit_tokens=True, text=text, source=None).transform(
+        TERRAFORM_PARSER.parse(text, start="tfvars")
     )
@@ -73,9 +73,20 @@ def process_attribute(input: Any):
 
 
 class HumanSerializer(BaseSerializer):
-    def __init__(self, terraform: Optional[Union[str, "Terraform"]] = None):
+    def __init__(
+        self,
+        terraform: Optional[Union[str, "Terraform"]] = None,
+        keep_source: bool = True,
+    ):
+        """
+        Args:
+            terraform: terraform executable, or path to one, used for formatting
+            keep_source: retain the original source text of parsed files.
+                Disable for read-only scans to drop the text once parsed.
+        """
         from pyterraformer.terraform import Terraform
 
+        self.keep_source = keep_source
         self.terraform: Optional[Terraform] = None
         if isinstance(terraform, Terraform):
             self.terraform = terraform
@@ -91,16 +102,20 @@ class HumanSerializer(BaseSerializer):
         return self.terraform is not None
 
     def parse_string(self, string: str):
-        return parse_text(string)
+        return parse_text(string, keep_source=self.keep_source)
 
     def parse_file(self, path: Union[str, Path], workspace: "TerraformWorkspace"):
         from pyterraformer.core.namespace import TerraformFile
+        from pyterraformer.core.source import SourceBuffer
 
-        with open(path, "r") as f:
-            text = f.read()
-            objects = self.parse_string(string=text)
+        source = SourceBuffer.from_file(path)
+        objects = parse_text(source.text, source=source, keep_source=self.keep_source)
         return TerraformFile(
-            location=path, workspace=workspace, objects=objects, text=text
+            location=path,
+            workspace=workspace,
+            objects=objects,
+            text=None,
+            source=source if self.keep_source else None,
         )
 
     def _format_string(self, string: str) -> str:
@@ -1,3 +1,4 @@
+from .async_terraform import AsyncTerraform
 from .terraform import Terraform
 
-__all__ = ["Terraform"]
+__all__ = ["AsyncTerraform", "Terraform"]
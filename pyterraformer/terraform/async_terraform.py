@@ -0,0 +1,163 @@
+"""Terraform commands as asyncio coroutines.
+
+AsyncTerraform wraps a Terraform, and selects the workspace, initializes
+roots and builds the environment with its configuration and sessions, but
+awaits its terraform processes instead of blocking on them:
+
+    terraform = AsyncTerraform(Terraform(workspace="prod"))
+    outputs = await asyncio.gather(
+        *(terraform.run(["plan"], path=root) for root in roots)
+    )
+
+Only run is a coroutine. Everything else, such as streaming, saved plans
+and attaching to a TerraformWorkspace, goes through the wrapped Terraform.
+
+Each process is started in a session of its own. When a run times out or
+the awaiting task is cancelled, the whole process group - terraform and
+any provider plugins it started - is sent SIGTERM and, if it hasn't
+exited after kill_grace seconds, SIGKILL.
+"""
+
+import asyncio
+import os
+import signal
+from asyncio.subprocess import PIPE, Process
+from dataclasses import dataclass, field
+from subprocess import CalledProcessError, TimeoutExpired
+from typing import Dict, List, Optional, Union
+from weakref import WeakKeyDictionary
+
+from pyterraformer.constants import logger
+from pyterraformer.terraform.session import TerraformSession
+from pyterraformer.terraform.terraform import Terraform
+
+
+@dataclass
+class AsyncTerraform:
+    # the configuration and sessions runs are prepared with
+    terraform: Terraform = field(default_factory=Terraform)
+    # seconds each command may take; None for no limit
+    timeout: Optional[float] = None
+    # seconds between asking a timed out process group to stop and killing it
+    kill_grace: float = 5.0
+    # event loop -> root path -> lock serializing preparation of the root,
+    # like the session locks of blocking runs
+    _locks: WeakKeyDictionary = field(
+        default_factory=WeakKeyDictionary, init=False, repr=False, compare=False
+    )
+
+    @property
+    def workspace(self) -> str:
+        return self.terraform.workspace
+
+    def session(self, path: str) -> TerraformSession:
+        return self.terraform.session(path)
+
+    async def run(
+        self,
+        arguments: Union[str, List[str]],
+        path: str,
+        environment: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+    ) -> str:
+        """Run a terraform command in the root module at path, in the
+        configured workspace. timeout overrides the configured timeout for
+        the command itself; preparation steps use the configured one."""
+        session = self.terraform.session(path)
+        locks = self._locks.setdefault(asyncio.get_running_loop(), {})
+        lock = locks.setdefault(session.key, asyncio.Lock())
+        async with lock:
+            try:
+                await self._prepare(session, path, environment)
+            except (CalledProcessError, TimeoutExpired):
+                session.reset()
+                raise
+        logger.info(f"Executing {arguments} in workspace {self.workspace}.")
+        try:
+            return await self._run(arguments, path, environment, timeout=timeout)
+        except (CalledProcessError, TimeoutExpired):
+            # the failure may be down to a stale workspace or init
+            session.reset()
+            raise
+
+    async def _prepare(
+        self,
+        session: TerraformSession,
+        path: str,
+        environment: Optional[Dict[str, str]] = None,
+    ):
+        steps = self.terraform._preparation(session, path)
+        environment = self.terraform._preparation_environment(environment)
+        output = None
+        try:
+            while True:
+                command = steps.send(output)
+                lock = self.terraform._install_lock(command, session)
+                if lock is None:
+                    output = await self._run(command, path, environment)
+                    continue
+                # the lock may be held for a whole install; poll rather than
+                # block, so a cancelled task never ends up holding it
+                while not lock.try_acquire():
+                    await asyncio.sleep(lock.poll)
+                try:
+                    output = await self._run(command, path, environment)
+                finally:
+                    lock.release()
+        except StopIteration:
+            pass
+
+    async def _run(
+        self,
+        arguments: Union[str, List[str]],
+        path: str,
+        environment: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+    ) -> str:
+        command = self.terraform._command(arguments)
+        timeout = self.timeout if timeout is None else timeout
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            cwd=path,
+            env=self.terraform._environment(environment, path),
+            stdout=PIPE,
+            stderr=PIPE,
+            start_new_session=True,
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"{command} timed out after {timeout} seconds in {path}")
+            await self._terminate(process)
+            raise TimeoutExpired(command, timeout)
+        except asyncio.CancelledError:
+            await self._terminate(process)
+            raise
+        output = stdout.decode("utf-8")
+        if process.returncode:
+            error = stderr.decode("utf-8")
+            logger.error(error)
+            raise CalledProcessError(
+                process.returncode, command, output=output, stderr=error
+            )
+        return output
+
+    async def _terminate(self, process: Process):
+        """Stop the process and everything it started"""
+        _signal_group(process, signal.SIGTERM)
+        try:
+            await asyncio.wait_for(process.wait(), self.kill_grace)
+        except asyncio.TimeoutError:
+            _signal_group(process, getattr(signal, "SIGKILL", signal.SIGTERM))
+            await process.wait()
+
+
+def _signal_group(process: Process, signal_number: int):
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, signal_number)
+        else:
+            process.send_signal(signal_number)
+    except ProcessLookupError:
+        # already exited
+        pass
@@ -0,0 +1,295 @@
+"""The resource changes of a saved plan, read from terraform show -json.
+
+The JSON document for a large root holds the configuration, prior state
+and planned values as well as the changes, and can run to hundreds of
+megabytes. PlanIndex reads it as terraform writes it, decoding one
+resource_changes entry at a time and skipping everything else, so only
+the index is ever kept in memory:
+
+    plan = terraform.show_plan("tfplan", path=root, actions=["delete"])
+    for change in plan.filter(type="aws_instance"):
+        print(change.address, change.actions)
+
+Entries that don't match the actions and types given are dropped as they
+are read; values=False drops before and after too.
+"""
+
+import json
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+# characters that can change the nesting of a JSON document
+_SPECIAL = re.compile(r'[{}\[\]"]')
+_STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+# everything up to the next bracket outside a string
+_SKIP = re.compile(r'(?:[^"{}\[\]]+|"[^"\\]*(?:\\.[^"\\]*)*")*', re.DOTALL)
+_COLON = re.compile(r"\s*:")
+_REST = re.compile(r"\s*\Z")
+_SEPARATOR = re.compile(r"[\s,]*")
+_DECODER = json.JSONDecoder()
+
+Actions = Union[str, Iterable[str]]
+
+
+@dataclass(frozen=True)
+class ResourceChange:
+    address: str
+    mode: str
+    type: str
+    name: str
+    module_address: Optional[str]
+    index: Any
+    provider_name: Optional[str]
+    actions: Tuple[str, ...]
+    before: Any = None
+    after: Any = None
+
+    @classmethod
+    def from_json(cls, change: Dict[str, Any], values: bool = True):
+        details = change.get("change") or {}
+        return cls(
+            address=change["address"],
+            mode=change.get("mode", "managed"),
+            type=change.get("type", ""),
+            name=change.get("name", ""),
+            module_address=change.get("module_address"),
+            index=change.get("index"),
+            provider_name=change.get("provider_name"),
+            actions=tuple(details.get("actions") or ()),
+            before=details.get("before") if values else None,
+            after=details.get("after") if values else None,
+        )
+
+    @property
+    def action(self) -> str:
+        """The change as one word: create, read, update, delete, replace
+        or no-op"""
+        if "create" in self.actions and "delete" in self.actions:
+            return "replace"
+        return self.actions[0] if self.actions else "no-op"
+
+
+class PlanIndex(object):
+    """The resource changes of a plan, by address, action and type"""
+
+    def __init__(
+        self,
+        changes: Iterable[ResourceChange] = (),
+        format_version: Optional[str] = None,
+        terraform_version: Optional[str] = None,
+    ):
+        self.format_version = format_version
+        self.terraform_version = terraform_version
+        self.changes: Dict[str, ResourceChange] = {}
+        self._by_action: Dict[str, List[ResourceChange]] = defaultdict(list)
+        self._by_type: Dict[str, List[ResourceChange]] = defaultdict(list)
+        for change in changes:
+            self.add(change)
+
+    @classmethod
+    def parse(
+        cls,
+        chunks: Iterable[str],
+        actions: Optional[Actions] = None,
+        types: Optional[Iterable[str]] = None,
+        values: bool = True,
+    ) -> "PlanIndex":
+        """Index the plan JSON in chunks, keeping only changes with one of
+        actions and of one of types"""
+        wanted_actions = _names(actions)
+        wanted_types = _names(types)
+        scanner = _PlanScanner()
+        index = cls()
+        for change in scanner.resource_changes(chunks):
+            entry = ResourceChange.from_json(change, values=values)
+            if wanted_types is not None and entry.type not in wanted_types:
+                continue
+            if wanted_actions is not None and not _matches(entry, wanted_actions):
+                continue
+            index.add(entry)
+        index.format_version = scanner.top_level.get("format_version")
+        index.terraform_version = scanner.top_level.get("terraform_version")
+        return index
+
+    def add(self, change: ResourceChange):
+        self.changes[change.address] = change
+        self._by_type[change.type].append(change)
+        for action in {change.action, *change.actions}:
+            self._by_action[action].append(change)
+
+    def filter(
+        self, action: Optional[Actions] = None, type: Optional[str] = None
+    ) -> List[ResourceChange]:
+        """Changes with any of the given actions, of the given type"""
+        if action is None:
+            found = list(self.changes.values()) if type is None else self._by_type[type]
+        else:
+            seen = set()
+            found = []
+            for name in _names(action):  # type: ignore
+                for change in self._by_action.get(name, ()):
+                    if change.address not in seen:
+                        seen.add(change.address)
+                        found.append(change)
+        if type is not None:
+            found = [change for change in found if change.type == type]
+        return found
+
+    def addresses(
+        self, action: Optional[Actions] = None, type: Optional[str] = None
+    ) -> List[str]:
+        return [change.address for change in self.filter(action, type)]
+
+    def counts(self) -> Counter:
+        """The number of changes of each action"""
+        return Counter(change.action for change in self.changes.values())
+
+    @property
+    def has_changes(self) -> bool:
+        return any(change.action not in ("no-op", "read") for change in self)
+
+    def __getitem__(self, address: str) -> ResourceChange:
+        return self.changes[address]
+
+    def __contains__(self, address: str) -> bool:
+        return address in self.changes
+
+    def __iter__(self) -> Iterator[ResourceChange]:
+        return iter(self.changes.values())
+
+    def __len__(self) -> int:
+        return len(self.changes)
+
+    def __repr__(self):
+        return f"PlanIndex({dict(self.counts())})"
+
+
+def _names(names: Optional[Actions]) -> Optional[frozenset]:
+    if names is None:
+        return None
+    if isinstance(names, str):
+        return frozenset((names,))
+    return frozenset(names)
+
+
+def _matches(change: ResourceChange, actions: frozenset) -> bool:
+    return change.action in actions or not actions.isdisjoint(change.actions)
+
+
+class _PlanScanner(object):
+    """Finds the resource_changes entries of a plan document fed to it in
+    chunks. Everything else is skipped over by tracking nesting, except
+    the strings at the top level, which are kept in top_level."""
+
+    def __init__(self):
+        self.buffer = ""
+        self.position = 0
+        self.depth = 0
+        # the last key seen at the top level
+        self.key: Optional[str] = None
+        self.top_level: Dict[str, Any] = {}
+        # inside the resource_changes array
+        self.in_changes = False
+        # the size of buffer an incomplete entry needs before decoding again
+        self._needed = 0
+
+    def resource_changes(self, chunks: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        for chunk in chunks:
+            if self.position:
+                self.buffer = self.buffer[self.position :]
+                self.position = 0
+            self.buffer += chunk
+            if len(self.buffer) >= self._needed:
+                yield from self._scan(final=False)
+        yield from self._scan(final=True)
+        if self.depth or self.buffer[self.position :].strip():
+            raise ValueError("Plan JSON ended before the document was complete")
+
+    def _scan(self, final: bool) -> Iterator[Dict[str, Any]]:
+        buffer = self.buffer
+        self._needed = 0
+        while True:
+            if self.in_changes:
+                self.position = _SEPARATOR.match(buffer, self.position).end()
+                if self.position == len(buffer):
+                    return
+                if buffer[self.position] == "]":
+                    self.in_changes = False
+                    self.depth -= 1
+                    self.position += 1
+                    continue
+                try:
+                    change, end = _DECODER.raw_decode(buffer, self.position)
+                except json.JSONDecodeError:
+                    if final:
+                        raise ValueError("Plan JSON has an incomplete resource change")
+                    self._wait(buffer)
+                    return
+                self.position = end
+                yield change
+                continue
+            if self.depth > 1:
+                # nested in something other than resource_changes, skip to
+                # the next bracket in a single match
+                self.position = _SKIP.match(buffer, self.position).end()
+                if self.position == len(buffer) or buffer[self.position] == '"':
+                    # the rest, or a string, is still to come
+                    self._wait(buffer)
+                    return
+                if buffer[self.position] in "{[":
+                    self.depth += 1
+                else:
+                    self.depth -= 1
+                self.position += 1
+                continue
+            match = _SPECIAL.search(buffer, self.position)
+            if match is None:
+                self.position = len(buffer)
+                return
+            at = match.start()
+            character = match.group()
+            if character == '"':
+                string = _STRING.match(buffer, at)
+                if string is None:
+                    self.position = at
+                    self._wait(buffer)
+                    return
+                end = string.end()
+                if self.depth == 1:
+                    colon = _COLON.match(buffer, end)
+                    if colon is None:
+                        if not final and _REST.match(buffer, end):
+                            # can't tell a key from a value yet
+                            self.position = at
+                            self._wait(buffer)
+                            return
+                        if self.key is not None:
+                            self.top_level[self.key] = json.loads(string.group())
+                    else:
+                        self.key = json.loads(string.group())
+                        end = colon.end()
+                self.position = end
+            elif character in "{[":
+                self.depth += 1
+                self.position = at + 1
+                if self.depth == 2 and character == "[":
+                    self.in_changes = self.key == "resource_changes"
+            else:
+                self.depth -= 1
+                self.position = at + 1
+
+    def _wait(self, buffer: str):
+        """Scan again once what is left of buffer has doubled, so a large
+        entry or string that spans many chunks isn't rescanned for each"""
+        self._needed = 2 * (len(buffer) - self.position)
@@ -0,0 +1,328 @@
+"""Skip planning roots whose inputs haven't changed.
+
+A plan is a function of the root's configuration, the variables assigned
+to it, the modules it calls, the providers locked for it and the terraform
+that runs it - and of remote state, which can't be seen from here. The
+input fingerprint of a workspace hashes the parts that can be:
+
+    the .tf and .tf.json files of the root
+    the same files of every module it calls from a local source, recursively
+    the dependency lock file
+    the tfvars files terraform loads automatically, those passed with
+        -var-file, TF_VAR_ variables, and the values assigned with
+        TerraformWorkspace.load_variables
+    the terraform version, the backend configuration, the selected
+        workspace and the plan arguments
+
+TerraformWorkspace.plan stores the output of each successful plan in the
+PlanCache of its terraform wrapper, under the fingerprint. Planning again
+with the same fingerprint returns the stored output without running
+terraform, and counts the plan as skipped:
+
+    terraform = Terraform(plan_cache=PlanCache(".plan-cache"))
+    for workspace in workspaces:
+        workspace.plan()
+    print(terraform.plan_cache.skipped)
+
+Since remote state can change without the fingerprint changing, stored
+plans can be given a max_age, and invalidate and clear drop them on
+demand, for instance after an apply from elsewhere.
+
+plan(out=True) saves the plan itself too, in a file named after the
+fingerprint (and the root, when the cache directory is shared), and
+returns a SavedPlan. Applying it applies exactly what was planned,
+without planning again, after checking the fingerprint of the workspace
+still matches:
+
+    saved = workspace.plan(out=True)
+    if saved.has_changes:
+        workspace.apply(plan=saved)
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Union, TYPE_CHECKING
+
+from pyterraformer.terraform.session import LOCK_FILE, backend_configuration
+
+if TYPE_CHECKING:
+    from pyterraformer.core.workspace import TerraformWorkspace
+    from pyterraformer.terraform.plan import PlanIndex
+
+# module source = "./..." and "../..." arguments
+_LOCAL_SOURCES = re.compile(r"^\s*source\s*=\s*\"(\.\.?/[^\"\n]*)\"", re.MULTILINE)
+_CONFIGURATION = ("*.tf", "*.tf.json")
+_AUTOMATIC_VARIABLES = (
+    "terraform.tfvars",
+    "terraform.tfvars.json",
+    "*.auto.tfvars",
+    "*.auto.tfvars.json",
+)
+# saved plans of a root, when there's no plan cache directory to keep them in
+PLAN_DIRECTORY = ".terraform-plans"
+
+
+@dataclass
+class SavedPlan:
+    """A plan saved with plan(out=...), and what it was planned from"""
+
+    # the plan file
+    path: str
+    # the root module and terraform workspace it was planned for
+    root: str
+    workspace: str
+    # the plan command, without -out, and its input fingerprint
+    arguments: List[str]
+    fingerprint: str
+    output: str = field(repr=False, default="")
+    # the resource changes in the plan, without values
+    summary: Optional["PlanIndex"] = field(repr=False, default=None)
+
+    @property
+    def has_changes(self) -> bool:
+        return self.summary is None or self.summary.has_changes
+
+    def is_current(self, workspace: "TerraformWorkspace") -> bool:
+        """Whether the plan file exists and nothing the plan depends on
+        has changed in workspace since"""
+        return (
+            os.path.isfile(self.path)
+            and os.path.abspath(workspace.path) == self.root
+            and input_fingerprint(workspace, self.arguments) == self.fingerprint
+        )
+
+
+def input_fingerprint(
+    workspace: "TerraformWorkspace", arguments: Iterable[str] = ()
+) -> str:
+    """A hash of everything a plan of the workspace depends on, apart from
+    remote state"""
+    digest = hashlib.sha256()
+
+    def update(label: str, value: Union[str, bytes]):
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        digest.update(f"{label}\0{len(value)}\0".encode("utf-8") + value)
+
+    arguments = list(arguments)
+    terraform = workspace.terraform
+    if terraform is not None:
+        update("terraform", terraform.version())
+        update("backend", backend_configuration(terraform.backend))
+        update("workspace", terraform.workspace)
+    update("arguments", json.dumps(arguments))
+    root = Path(workspace.path).absolute()
+    _hash_module(update, root, root, set())
+    try:
+        update("lock", (root / LOCK_FILE).read_bytes())
+    except FileNotFoundError:
+        update("lock", "")
+    for pattern in _AUTOMATIC_VARIABLES:
+        for file in sorted(root.glob(pattern)):
+            update(f"tfvars {file.name}", file.read_bytes())
+    for name in _var_files(arguments):
+        try:
+            update(f"var-file {name}", (root / name).read_bytes())
+        except OSError:
+            update(f"var-file {name}", "")
+    environment = sorted(
+        (key, value) for key, value in os.environ.items() if key.startswith("TF_VAR_")
+    )
+    update("environment", json.dumps(environment))
+    if workspace.variable_values is not None:
+        values = workspace.variable_values.values
+        update("variables", json.dumps(values, sort_keys=True, default=repr))
+    return digest.hexdigest()
+
+
+def _var_files(arguments: List[str]) -> List[str]:
+    """The files passed with -var-file=<file> or -var-file <file>"""
+    files = []
+    for position, argument in enumerate(arguments):
+        for flag in ("-var-file", "--var-file"):
+            if argument.startswith(f"{flag}="):
+                files.append(argument[len(flag) + 1 :])
+            elif argument == flag and position + 1 < len(arguments):
+                files.append(arguments[position + 1])
+    return files
+
+
+def _hash_module(update, root: Path, directory: Path, seen: Set[Path]):
+    """Hash the configuration files in directory, and those of the local
+    modules they call"""
+    directory = directory.resolve()
+    if directory in seen or not directory.is_dir():
+        return
+    seen.add(directory)
+    label = os.path.relpath(directory, root)
+    files = sorted(
+        file for pattern in _CONFIGURATION for file in directory.glob(pattern)
+    )
+    sources = []
+    for file in files:
+        content = file.read_bytes()
+        update(f"{label}/{file.name}", content)
+        sources.extend(_LOCAL_SOURCES.findall(content.decode("utf-8", "replace")))
+    for source in sorted(set(sources)):
+        _hash_module(update, root, directory / source, seen)
+
+
+def saved_plan_path(workspace: "TerraformWorkspace", fingerprint: str) -> str:
+    """Where the plan of workspace with fingerprint is saved"""
+    terraform = workspace.terraform
+    plan_cache = terraform.plan_cache if terraform is not None else None
+    if (
+        terraform is not None
+        and plan_cache is not None
+        and plan_cache.directory is not None
+    ):
+        # shared by every root, so identical roots mustn't share a name
+        directory = plan_cache.directory / "plans"
+        name = f"{PlanCache.key(workspace.path, terraform.workspace)}-{fingerprint}"
+    else:
+        directory = Path(workspace.path).absolute() / PLAN_DIRECTORY
+        name = fingerprint
+    directory.mkdir(parents=True, exist_ok=True)
+    return str(directory / f"{name}.tfplan")
+
+
+class PlanCache(object):
+    """The output of the last successful plan of each root and workspace,
+    with the input fingerprint it was planned with. Kept in memory, and in
+    directory if one is given, so it can outlive the process."""
+
+    def __init__(
+        self,
+        directory: Optional[Union[str, Path]] = None,
+        max_age: Optional[float] = None,
+    ):
+        self.directory = None if directory is None else Path(directory).absolute()
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        # seconds a stored plan is trusted for; None for no limit
+        self.max_age = max_age
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        # plans that were and weren't answered from the cache
+        self.skipped = 0
+        self.planned = 0
+
+    def __repr__(self):
+        return (
+            f"PlanCache(directory={self.directory!r}, "
+            f"skipped={self.skipped}, planned={self.planned})"
+        )
+
+    @staticmethod
+    def key(path: Union[str, os.PathLike], workspace: str) -> str:
+        location = f"{os.path.abspath(path)}\0{workspace}"
+        return hashlib.sha256(location.encode("utf-8")).hexdigest()
+
+    def entry(self, path: Union[str, os.PathLike], workspace: str) -> Optional[Dict]:
+        """The stored plan of the root at path in workspace, if any"""
+        key = self.key(path, workspace)
+        entry = self.entries.get(key)
+        if entry is None and self.directory is not None:
+            try:
+                entry = json.loads((self.directory / f"{key}.json").read_text())
+            except (FileNotFoundError, ValueError):
+                return None
+            self.entries[key] = entry
+        return entry
+
+    def get(
+        self, path: Union[str, os.PathLike], workspace: str, fingerprint: str
+    ) -> Optional[Dict]:
+        """The stored plan if it was planned with fingerprint, and isn't
+        older than max_age"""
+        entry = self.entry(path, workspace)
+        if entry is None or entry["fingerprint"] != fingerprint:
+            return None
+        if self.max_age is not None and time.time() - entry["created"] > self.max_age:
+            return None
+        return entry
+
+    def put(
+        self,
+        path: Union[str, os.PathLike],
+        workspace: str,
+        fingerprint: str,
+        output: str,
+        **details: Any,
+    ) -> Dict:
+        entry = {
+            "path": os.path.abspath(path),
+            "workspace": workspace,
+            "fingerprint": fingerprint,
+            "created": time.time(),
+            "output": output,
+            **details,
+        }
+        key = self.key(path, workspace)
+        self.entries[key] = entry
+        if self.directory is not None:
+            # written aside and renamed, so readers never see half an entry
+            temporary = self.directory / f".{key}.{uuid.uuid4().hex}"
+            temporary.write_text(json.dumps(entry))
+            os.replace(temporary, self.directory / f"{key}.json")
+        return entry
+
+    def invalidate(
+        self, path: Union[str, os.PathLike], workspace: Optional[str] = None
+    ):
+        """Drop the stored plans of the root at path, in one workspace or
+        in all of them"""
+        location = os.path.abspath(path)
+        keys = {
+            key
+            for key, entry in self.entries.items()
+            if entry["path"] == location
+            and (workspace is None or entry["workspace"] == workspace)
+        }
+        if self.directory is not None:
+            for file in self.directory.glob("*.json"):
+                if workspace is not None:
+                    if file.stem == self.key(path, workspace):
+                        keys.add(file.stem)
+                    continue
+                try:
+                    entry = json.loads(file.read_text())
+                except ValueError:
+                    continue
+                if entry.get("path") == location:
+                    keys.add(file.stem)
+        for key in keys:
+            self._drop(key)
+
+    def clear(self):
+        """Drop every stored plan"""
+        keys = set(self.entries)
+        if self.directory is not None:
+            keys.update(file.stem for file in self.directory.glob("*.json"))
+        for key in keys:
+            self._drop(key)
+
+    def _drop(self, key: str):
+        entry = self.entries.pop(key, None)
+        if self.directory is not None:
+            file = self.directory / f"{key}.json"
+            if entry is None:
+                try:
+                    entry = json.loads(file.read_text())
+                except (FileNotFoundError, ValueError):
+                    pass
+            try:
+                file.unlink()
+            except FileNotFoundError:
+                pass
+        # a saved plan isn't reused once its entry is gone
+        if entry is not None and entry.get("plan_file"):
+            try:
+                os.unlink(entry["plan_file"])
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,209 @@
+"""A provider plugin cache shared by many roots and processes.
+
+TF_PLUGIN_CACHE_DIR saves downloading a provider more than once, but
+terraform doesn't lock the directory, so inits running at the same time
+can corrupt it. A ProviderCache serializes the inits that install
+providers with a lock file, which works across threads and processes.
+
+It also keeps a golden copy of the providers directory of the first root
+initialized with each dependency lock file. Before another root with an
+identical .terraform.lock.hcl is initialized, its providers directory is
+filled with hard links to the golden copy, and init finds every provider
+already installed:
+
+    terraform = Terraform(provider_cache=ProviderCache("~/.cache/pyterraformer"))
+
+Golden copies are written to a temporary directory and renamed into
+place, so they are only ever seen complete.
+"""
+
+import errno
+import hashlib
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Optional, Union
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - windows
+    fcntl = None  # type: ignore
+
+from pyterraformer.constants import logger
+from pyterraformer.terraform.session import LOCK_FILE
+
+PROVIDERS = "providers"
+
+
+class FileLock(object):
+    """An exclusive lock on path, held by one thread or process at a time.
+
+    Uses fcntl.flock where it's available. Elsewhere the lock is a file
+    created with O_EXCL, which a holder that died leaves behind; it is
+    removed once older than stale seconds."""
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        poll: float = 0.05,
+        stale: float = 600.0,
+        use_fcntl: bool = True,
+    ):
+        self.path = str(path)
+        self.poll = poll
+        self.stale = stale
+        self.use_fcntl = use_fcntl and fcntl is not None
+        self._descriptor: Optional[int] = None
+
+    def acquire(self):
+        if self._descriptor is not None:
+            raise ValueError(f"{self.path} is already locked by this FileLock")
+        if self.use_fcntl:
+            descriptor = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(descriptor, fcntl.LOCK_EX)
+            except BaseException:
+                os.close(descriptor)
+                raise
+            self._descriptor = descriptor
+            return
+        while not self.try_acquire():
+            time.sleep(self.poll)
+
+    def try_acquire(self) -> bool:
+        """Take the lock if it is free, without waiting. Callers that
+        can't block poll this instead of acquire."""
+        if self._descriptor is not None:
+            raise ValueError(f"{self.path} is already locked by this FileLock")
+        if self.use_fcntl:
+            descriptor = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(descriptor, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(descriptor)
+                return False
+            except BaseException:
+                os.close(descriptor)
+                raise
+            self._descriptor = descriptor
+            return True
+        try:
+            self._descriptor = os.open(
+                self.path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o644
+            )
+            return True
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        self._remove_stale()
+        return False
+
+    def _remove_stale(self):
+        try:
+            age = time.time() - os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return
+        if age > self.stale:
+            logger.warning(f"removing stale lock {self.path}")
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+    def release(self):
+        if self._descriptor is None:
+            return
+        descriptor, self._descriptor = self._descriptor, None
+        if self.use_fcntl:
+            fcntl.flock(descriptor, fcntl.LOCK_UN)
+            os.close(descriptor)
+        else:
+            os.close(descriptor)
+            os.unlink(self.path)
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class ProviderCache(object):
+    """Provider plugins and golden providers directories under directory"""
+
+    def __init__(self, directory: Union[str, Path]):
+        self.directory = Path(directory).expanduser().absolute()
+        # TF_PLUGIN_CACHE_DIR
+        self.plugins = self.directory / "plugins"
+        # lock file hash -> a providers directory initialized with it
+        self.golden = self.directory / "golden"
+        for directory in (self.plugins, self.golden):
+            directory.mkdir(parents=True, exist_ok=True)
+
+    def __repr__(self):
+        return f"ProviderCache({str(self.directory)!r})"
+
+    def lock(self) -> FileLock:
+        """The lock held while terraform installs providers into the cache"""
+        return FileLock(self.directory / ".lock")
+
+    @staticmethod
+    def lock_hash(root: Union[str, Path]) -> Optional[str]:
+        """A hash of the root's dependency lock file, if it has one"""
+        try:
+            return hashlib.sha256((Path(root) / LOCK_FILE).read_bytes()).hexdigest()
+        except FileNotFoundError:
+            return None
+
+    def populate(
+        self, root: Union[str, Path], data_directory: Union[str, Path]
+    ) -> bool:
+        """Fill the providers directory of data_directory from the golden
+        copy for the root's lock file. False if there is none, or the
+        providers directory already exists."""
+        lock_hash = self.lock_hash(root)
+        if lock_hash is None:
+            return False
+        golden = self.golden / lock_hash
+        target = Path(data_directory) / PROVIDERS
+        if not golden.is_dir() or target.exists():
+            return False
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temporary = target.with_name(f"{PROVIDERS}.{uuid.uuid4().hex}")
+        shutil.copytree(golden, temporary, symlinks=True, copy_function=_link)
+        try:
+            os.rename(temporary, target)
+        except OSError:
+            # populated by a run that got there first
+            shutil.rmtree(temporary, ignore_errors=True)
+        return True
+
+    def store(self, root: Union[str, Path], data_directory: Union[str, Path]) -> bool:
+        """Keep the providers directory of an initialized root as the golden
+        copy for its lock file, unless there already is one"""
+        lock_hash = self.lock_hash(root)
+        source = Path(data_directory) / PROVIDERS
+        if lock_hash is None or not source.is_dir():
+            return False
+        golden = self.golden / lock_hash
+        if golden.exists():
+            return False
+        temporary = self.golden / f".{lock_hash}.{uuid.uuid4().hex}"
+        shutil.copytree(source, temporary, symlinks=True, copy_function=_link)
+        try:
+            os.rename(temporary, golden)
+        except OSError:
+            shutil.rmtree(temporary, ignore_errors=True)
+            return False
+        return True
+
+
+def _link(source: str, destination: str):
+    """Hard link source to destination, or copy it across file systems"""
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
@@ -0,0 +1,158 @@
+"""Run a terraform command across many root modules at once.
+
+    results = run_all(workspaces, ["plan", "-input=false"], concurrency=16)
+    for result in results.failed:
+        print(result.path, result.errors)
+
+Each workspace runs with its own terraform wrapper, in its own process,
+with at most concurrency processes at a time. Runs share nothing but the
+parent environment: per run variables are passed to the process rather
+than set in os.environ. With fail_fast, no new runs are started after the
+first failure; runs already in progress finish, and the rest are marked
+skipped.
+"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from subprocess import CalledProcessError
+from typing import Callable, Dict, List, Optional, Sequence, Union, TYPE_CHECKING
+
+from pyterraformer.constants import logger
+from pyterraformer.terraform.terraform import Terraform, extract_errors
+
+if TYPE_CHECKING:
+    from pyterraformer.core.workspace import TerraformWorkspace
+
+Environment = Union[
+    Dict[str, str], Callable[["TerraformWorkspace"], Optional[Dict[str, str]]]
+]
+
+
+@dataclass
+class RunResult:
+    """The outcome of running a command in one root module"""
+
+    workspace: "TerraformWorkspace"
+    arguments: List[str]
+    output: Optional[str] = None
+    error: Optional[BaseException] = None
+    # seconds since the start of run_all, and seconds taken
+    started: Optional[float] = None
+    duration: Optional[float] = None
+    skipped: bool = False
+
+    @property
+    def path(self) -> str:
+        return self.workspace.path
+
+    @property
+    def succeeded(self) -> bool:
+        return not self.skipped and self.error is None
+
+    @property
+    def errors(self) -> str:
+        """The error messages terraform printed, or the exception raised"""
+        if isinstance(self.error, CalledProcessError):
+            output = self.error.stderr or self.error.stdout or ""
+            return extract_errors(output) or output.strip()
+        return str(self.error) if self.error is not None else ""
+
+
+@dataclass
+class RunResults:
+    """Results of run_all, in the order the workspaces were given"""
+
+    results: List[RunResult] = field(default_factory=list)
+    duration: float = 0.0
+
+    @property
+    def succeeded(self) -> List[RunResult]:
+        return [result for result in self.results if result.succeeded]
+
+    @property
+    def failed(self) -> List[RunResult]:
+        return [result for result in self.results if result.error is not None]
+
+    @property
+    def skipped(self) -> List[RunResult]:
+        return [result for result in self.results if result.skipped]
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def raise_for_errors(self):
+        """Raise the first error, if any run failed"""
+        for result in self.failed:
+            raise result.error  # type: ignore
+
+
+def run_all(
+    workspaces: Sequence["TerraformWorkspace"],
+    arguments: Union[str, List[str]],
+    concurrency: int = 8,
+    fail_fast: bool = False,
+    environment: Optional[Environment] = None,
+    terraform: Optional[Terraform] = None,
+) -> RunResults:
+    """Run a terraform command in every workspace.
+
+    Args:
+        workspaces: root modules to run in
+        arguments: the terraform command, e.g. ["plan", "-input=false"]
+        concurrency: most commands to run at the same time
+        fail_fast: stop starting runs after the first failure
+        environment: extra environment variables for each run, or a
+            function of the workspace returning them
+        terraform: wrapper for workspaces that don't have their own
+    """
+    if concurrency < 1:
+        raise ValueError(f"concurrency must be at least 1, not {concurrency}")
+    if isinstance(arguments, str):
+        arguments = [arguments]
+    results = [RunResult(workspace, list(arguments)) for workspace in workspaces]
+    start = time.perf_counter()
+
+    def execute(result: RunResult):
+        result.started = time.perf_counter() - start
+        try:
+            wrapper = result.workspace.terraform or terraform
+            if wrapper is None:
+                raise ValueError(f"No terraform configured for {result.path}")
+            if callable(environment):
+                variables = environment(result.workspace)
+            else:
+                variables = environment
+            result.output = wrapper.run(
+                result.arguments, path=result.path, environment=variables
+            )
+        except Exception as e:
+            result.error = e
+        finally:
+            result.duration = time.perf_counter() - start - result.started
+
+    pending = iter(results)
+    running: Dict[Future, RunResult] = {}
+    stopped = False
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        # keep concurrency runs going, starting the next as each finishes
+        while True:
+            while not stopped and len(running) < concurrency:
+                result = next(pending, None)
+                if result is None:
+                    break
+                running[executor.submit(execute, result)] = result
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = running.pop(future)
+                if result.error is not None:
+                    logger.error(f"{result.arguments} failed in {result.path}")
+                    stopped = stopped or fail_fast
+    for result in pending:
+        result.skipped = True
+    return RunResults(results, time.perf_counter() - start)
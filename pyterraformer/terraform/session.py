@@ -0,0 +1,166 @@
+"""What is known about terraform's state in each root module.
+
+Before running a command, Terraform.run makes sure the configured
+workspace is selected and the root is initialized. Finding that out costs
+a terraform process per check. The selected workspace is read from the
+environment file in the data directory, where terraform workspace show
+reads it from, and a session per root remembers a fingerprint of the
+inputs to the last successful init:
+
+    the backend configuration
+    the dependency lock file, .terraform.lock.hcl
+    the source and version arguments in the root's .tf files, which
+        cover module sources
+    the terraform blocks of the root's .tf files, which hold the backend
+        and required providers, and its .tf.json files
+    whether the data directory, normally .terraform, still exists
+
+init only runs again when the fingerprint changes. Every check that was
+skipped is counted in TerraformSession.avoided.
+
+A failed command clears the session, so the next run checks again.
+
+With Terraform.isolate_workspaces, every workspace of a root has a data
+directory, and so a session, of its own: runs for different workspaces
+of one root don't share state and can proceed in parallel.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import fields, is_dataclass
+from pathlib import Path
+from typing import Any, List, Optional, Union
+
+LOCK_FILE = ".terraform.lock.hcl"
+DATA_DIRECTORY = ".terraform"
+# holds a data directory per workspace, when workspaces are isolated
+ISOLATED_DATA_DIRECTORY = ".terraform-workspaces"
+
+# the file terraform keeps the selected workspace in, in the data directory
+ENVIRONMENT_FILE = "environment"
+
+# source = "..." and version = "..." arguments
+_SOURCES = re.compile(r"^\s*(source|version)\s*=\s*(\"[^\"\n]*\")", re.MULTILINE)
+_TERRAFORM_BLOCK = re.compile(r"^\s*terraform\s*\{", re.MULTILINE)
+
+
+class TerraformSession(object):
+    """State of one root module, as last seen by this process"""
+
+    def __init__(
+        self, path: Union[str, Path], data_directory: Optional[Union[str, Path]] = None
+    ):
+        self.path = str(path)
+        # TF_DATA_DIR of runs in this session; None for the root's .terraform
+        self.data_directory = None if data_directory is None else str(data_directory)
+        # the workspace known to be selected, if any
+        self.workspace: Optional[str] = None
+        # fingerprint of the inputs to the last successful init
+        self.init_fingerprint: Optional[str] = None
+        # hash of the lock file the providers directory is known to match
+        self.providers_lock_hash: Optional[str] = None
+        # terraform calls made, and calls skipped, by subcommand
+        self.executed: Counter = Counter()
+        self.avoided: Counter = Counter()
+        # held while a run checks and updates the session
+        self.lock = threading.RLock()
+
+    @property
+    def key(self) -> str:
+        """Identifies the session among those of a Terraform wrapper"""
+        return self.data_directory or self.path
+
+    def reset(self):
+        """Forget what is known, so the next run checks everything again"""
+        self.workspace = None
+        self.init_fingerprint = None
+        self.providers_lock_hash = None
+
+    def __repr__(self):
+        return (
+            f"TerraformSession(path={self.path!r}, "
+            f"data_directory={self.data_directory!r}, workspace={self.workspace!r}, "
+            f"executed={dict(self.executed)}, avoided={dict(self.avoided)})"
+        )
+
+
+def init_fingerprint(
+    path: Union[str, Path],
+    backend: Any,
+    data_directory: Optional[Union[str, Path]] = None,
+) -> str:
+    """A hash of everything that makes terraform init necessary again"""
+    root = Path(path)
+    data = root / (data_directory or DATA_DIRECTORY)
+    digest = hashlib.sha256()
+    digest.update(backend_configuration(backend).encode("utf-8"))
+    try:
+        digest.update(b"lock\0" + (root / LOCK_FILE).read_bytes())
+    except FileNotFoundError:
+        digest.update(b"no lock\0")
+    for file in sorted(root.glob("*.tf")):
+        digest.update(b"\0" + file.name.encode("utf-8") + b"\0")
+        text = file.read_text(encoding="utf-8", errors="replace")
+        for argument, value in _SOURCES.findall(text):
+            digest.update(f"{argument}={value}\n".encode("utf-8"))
+        for block in _terraform_blocks(text):
+            digest.update(b"terraform\0" + block.encode("utf-8"))
+    for file in sorted(root.glob("*.tf.json")):
+        digest.update(b"\0" + file.name.encode("utf-8") + b"\0" + file.read_bytes())
+    digest.update(b"data" if os.path.isdir(data) else b"no data")
+    return digest.hexdigest()
+
+
+def backend_configuration(backend: Any) -> str:
+    """The settings of backend, and the environment it gives terraform, as
+    a string that changes whenever either does"""
+    if is_dataclass(backend):
+        configuration: Any = [
+            (item.name, getattr(backend, item.name)) for item in fields(backend)
+        ]
+    else:
+        configuration = backend
+    environment = sorted(backend.generate_environment().items())
+    return repr((type(backend).__name__, configuration, environment))
+
+
+def _terraform_blocks(text: str) -> List[str]:
+    """The text of each top level terraform { ... } block"""
+    blocks = []
+    for match in _TERRAFORM_BLOCK.finditer(text):
+        depth = 0
+        quoted = False
+        position = match.end() - 1
+        while position < len(text):
+            character = text[position]
+            if quoted:
+                if character == "\\":
+                    position += 1
+                elif character == '"':
+                    quoted = False
+            elif character == '"':
+                quoted = True
+            elif character == "{":
+                depth += 1
+            elif character == "}":
+                depth -= 1
+                if depth == 0:
+                    break
+            position += 1
+        blocks.append(text[match.start() : position + 1])
+    return blocks
+
+
+def selected_workspace(
+    path: Union[str, Path], data_directory: Optional[Union[str, Path]] = None
+) -> str:
+    """The workspace terraform workspace show would print for the root at
+    path, read from the data directory without running terraform"""
+    environment = Path(path) / (data_directory or DATA_DIRECTORY) / ENVIRONMENT_FILE
+    try:
+        return environment.read_text().strip() or "default"
+    except FileNotFoundError:
+        return "default"
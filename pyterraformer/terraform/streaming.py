@@ -0,0 +1,189 @@
+"""Terraform output, read while the command runs.
+
+Terraform.run captures everything a command prints and returns it once the
+command exits. Terraform.stream instead hands over each line as it is
+written, and keeps only the last lines of each stream for error reports:
+
+    with terraform.stream(["apply", "-auto-approve"], path=root) as run:
+        for line in run:
+            print(line.stream, line.text, end="")
+
+Lines can be consumed by iterating, as above, or delivered to a callback
+or a queue.Queue as they arrive. Iterating reads from a bounded queue, so
+a consumer that falls behind slows terraform down instead of growing
+memory. Leaving the with block waits for the command, and raises
+CalledProcessError carrying the kept tail if it failed.
+"""
+
+from collections import deque
+from dataclasses import dataclass
+from queue import Queue
+from subprocess import CalledProcessError, PIPE, Popen
+from threading import Lock, Thread
+from typing import Callable, Deque, Dict, IO, Iterator, List, Optional, TYPE_CHECKING
+
+from pyterraformer.constants import logger
+
+if TYPE_CHECKING:
+    from pyterraformer.terraform.session import TerraformSession
+
+# lines kept from each stream for error reports
+DEFAULT_TAIL = 200
+# lines read ahead of a consumer that is iterating
+DEFAULT_BUFFER = 1000
+# longer lines are split, so one line can't take unbounded memory
+MAX_LINE = 1 << 16
+
+_DONE = object()
+
+
+@dataclass(frozen=True)
+class OutputLine:
+    # "stdout" or "stderr"
+    stream: str
+    # the line, including its line ending
+    text: str
+
+
+class TerraformStream(object):
+    """A running terraform command and the output it has written so far.
+
+    Args:
+        command: the command line to run
+        path: directory to run in
+        environment: the complete environment of the process
+        callback: called from a reader thread with each OutputLine
+        queue: a queue to put each OutputLine on, followed by None once
+            both streams are closed
+        tail: lines to keep from each stream
+        buffer: lines to read ahead when iterating
+        session: session to reset if the command fails
+    """
+
+    def __init__(
+        self,
+        command: List[str],
+        path: str,
+        environment: Dict[str, str],
+        callback: Optional[Callable[[OutputLine], None]] = None,
+        queue: Optional[Queue] = None,
+        tail: int = DEFAULT_TAIL,
+        buffer: int = DEFAULT_BUFFER,
+        session: Optional["TerraformSession"] = None,
+    ):
+        self.command = command
+        self.callback = callback
+        self.session = session
+        self.stdout_tail: Deque[str] = deque(maxlen=tail)
+        self.stderr_tail: Deque[str] = deque(maxlen=tail)
+        self._queue: Optional[Queue] = queue
+        self._external = queue is not None
+        if callback is None and queue is None:
+            self._queue = Queue(maxsize=buffer)
+        # readers still running, and the lock guarding the count
+        self._open = 2
+        self._open_lock = Lock()
+        self._iterated = False
+        self.returncode: Optional[int] = None
+        self.process = Popen(
+            command,
+            cwd=path,
+            env=environment,
+            stdout=PIPE,
+            stderr=PIPE,
+            encoding="utf-8",
+            errors="replace",
+        )
+        self._readers = [
+            Thread(
+                target=self._read,
+                args=(self.process.stdout, "stdout", self.stdout_tail),
+                daemon=True,
+            ),
+            Thread(
+                target=self._read,
+                args=(self.process.stderr, "stderr", self.stderr_tail),
+                daemon=True,
+            ),
+        ]
+        for reader in self._readers:
+            reader.start()
+
+    def _read(self, pipe: IO[str], name: str, tail: Deque[str]):
+        try:
+            for text in iter(lambda: pipe.readline(MAX_LINE), ""):
+                tail.append(text)
+                line = OutputLine(name, text)
+                if self.callback is not None:
+                    self.callback(line)
+                if self._queue is not None:
+                    self._queue.put(line)
+        finally:
+            pipe.close()
+            with self._open_lock:
+                self._open -= 1
+                last = not self._open
+            if last and self._queue is not None:
+                self._queue.put(None if self._external else _DONE)
+
+    def __iter__(self) -> Iterator[OutputLine]:
+        """Lines from both streams, in the order they were read"""
+        if self._external or self._queue is None:
+            raise ValueError("Output is delivered elsewhere and can't be iterated")
+        if self._iterated:
+            return
+        while True:
+            line = self._queue.get()
+            if line is _DONE:
+                self._iterated = True
+                return
+            yield line
+
+    @property
+    def output(self) -> str:
+        """The kept tail of stdout"""
+        return "".join(self.stdout_tail)
+
+    @property
+    def errors(self) -> str:
+        """Errors terraform reported in the kept tail of its output"""
+        from pyterraformer.terraform.terraform import extract_errors
+
+        return extract_errors([*self.stderr_tail, *self.stdout_tail])
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        """Wait for the command to finish, raising CalledProcessError with
+        the kept tails if it failed"""
+        self._drain()
+        self.returncode = self.process.wait(timeout)
+        for reader in self._readers:
+            reader.join()
+        if self.returncode:
+            stderr = "".join(self.stderr_tail)
+            logger.error(stderr)
+            if self.session is not None:
+                self.session.reset()
+            raise CalledProcessError(
+                self.returncode, self.command, output=self.output, stderr=stderr
+            )
+        return self.returncode
+
+    def kill(self):
+        self.process.kill()
+        self._drain()
+        self.process.wait()
+
+    def _drain(self):
+        if not self._external and self._queue is not None:
+            # discard lines nobody iterated over, so the readers can finish
+            for _ in self:
+                pass
+
+    def __enter__(self) -> "TerraformStream":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.kill()
+            return
+        self.wait()
@@ -1,12 +1,39 @@
+import json
 import os
 import re
-from dataclasses import dataclass, field
+import shutil
+import threading
+from collections import Counter
+from dataclasses import dataclass, field, fields, replace
+from pathlib import PurePath
 from subprocess import CalledProcessError, run as sub_run
-from typing import Optional, List, Union
+from queue import Queue
+from typing import Callable, Dict, Generator, Iterable, Optional, List, Tuple, Union
 
 from pyterraformer.constants import logger
 from pyterraformer.settings import get_default_terraform_location
 from pyterraformer.terraform.backends import BaseBackend, LocalBackend
+from pyterraformer.terraform.plan import Actions, PlanIndex
+from pyterraformer.terraform.plan_cache import PlanCache
+from pyterraformer.terraform.provider_cache import FileLock, ProviderCache
+from pyterraformer.terraform.session import (
+    DATA_DIRECTORY,
+    ISOLATED_DATA_DIRECTORY,
+    TerraformSession,
+    init_fingerprint,
+    selected_workspace,
+)
+from pyterraformer.terraform.streaming import (
+    DEFAULT_BUFFER,
+    DEFAULT_TAIL,
+    OutputLine,
+    TerraformStream,
+)
+
+# guards creating sessions, which runs in parallel may do for the same root
+_SESSIONS_LOCK = threading.Lock()
+# (executable, mtime, size) -> terraform version
+_VERSIONS: Dict[Tuple, str] = {}
 
 
 @dataclass
@@ -17,44 +44,338 @@ class Terraform:
     plugin_cache_directory: Optional[str] = None
     backend: BaseBackend = field(default_factory=lambda: LocalBackend(path=os.getcwd()))
     workspace: str = "default"
+    # give every workspace of a root its own TF_DATA_DIR, and pick the
+    # workspace with TF_WORKSPACE instead of terraform workspace select, so
+    # runs for different workspaces of one root can proceed in parallel
+    isolate_workspaces: bool = False
+    # shared, locked plugin cache that also fills the providers of new roots,
+    # see pyterraformer.terraform.provider_cache; overrides plugin_cache_directory
+    provider_cache: Optional[ProviderCache] = None
+    # outputs of plans by input fingerprint, see pyterraformer.terraform.plan_cache
+    plan_cache: Optional[PlanCache] = None
+
+    # per root module state, see pyterraformer.terraform.session
+    sessions: Dict[str, TerraformSession] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+
+    def session(self, path: Union[str, PurePath]) -> TerraformSession:
+        """The session tracking the root module at path, in the configured
+        workspace if workspaces are isolated"""
+        root = os.path.abspath(path)
+        data_directory = self.data_directory(root)
+        key = data_directory or root
+        with _SESSIONS_LOCK:
+            session = self.sessions.get(key)
+            if session is None:
+                session = self.sessions[key] = TerraformSession(root, data_directory)
+        return session
+
+    def data_directory(self, path: Union[str, PurePath]) -> Optional[str]:
+        """The TF_DATA_DIR of runs in the root at path, or None to leave
+        terraform to use the root's .terraform"""
+        if not self.isolate_workspaces:
+            return None
+        return os.path.join(
+            os.path.abspath(path), ISOLATED_DATA_DIRECTORY, self.workspace
+        )
+
+    def for_workspace(self, workspace: str) -> "Terraform":
+        """A copy of this wrapper for another workspace, sharing its sessions"""
+        copy = replace(self, workspace=workspace)
+        for item in fields(self):
+            if not item.init:
+                setattr(copy, item.name, getattr(self, item.name))
+        return copy
+
+    @property
+    def avoided_calls(self) -> Counter:
+        """Terraform calls skipped across every root, by subcommand"""
+        total: Counter = Counter()
+        for session in list(self.sessions.values()):
+            total.update(session.avoided)
+        return total
+
+    def version(self) -> str:
+        """The version of the terraform executable, looked up again only
+        when the executable changes"""
+        executable = self._command([])[0]
+        located = shutil.which(executable) or executable
+        try:
+            stat = os.stat(located)
+            key: Tuple = (located, stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            key = (located, None, None)
+        version = _VERSIONS.get(key)
+        if version is None:
+            output = self._run(["version", "-json"], path=os.getcwd())
+            try:
+                version = str(json.loads(output)["terraform_version"])
+            except (ValueError, KeyError, TypeError):
+                # versions before 0.13 only print text
+                version = output.strip().split("\n")[0]
+            _VERSIONS[key] = version
+        return version
+
+    def run(
+        self,
+        arguments: Union[str, List[str]],
+        path: str,
+        environment: Optional[Dict[str, str]] = None,
+    ):
+        """Run a terraform command in the root module at path, in the
+        configured workspace. environment adds to, or with empty values
+        removes from, the environment of this run only."""
+        session = self.session(path)
+        with session.lock:
+            try:
+                self._prepare(session, path, environment)
+            except CalledProcessError:
+                session.reset()
+                raise
+        logger.info(f"Executing {arguments} in workspace {self.workspace}.")
+        try:
+            return self._run(arguments=arguments, path=path, environment=environment)
+        except CalledProcessError:
+            # the failure may be down to a stale workspace or init
+            session.reset()
+            raise
+
+    def stream(
+        self,
+        arguments: Union[str, List[str]],
+        path: str,
+        environment: Optional[Dict[str, str]] = None,
+        callback: Optional[Callable[[OutputLine], None]] = None,
+        queue: Optional[Queue] = None,
+        tail: int = DEFAULT_TAIL,
+        buffer: int = DEFAULT_BUFFER,
+    ) -> TerraformStream:
+        """Start a terraform command like run, handing over its output line
+        by line as it is written, see pyterraformer.terraform.streaming.
+        Only the last tail lines of each stream are kept."""
+        session = self.session(path)
+        with session.lock:
+            try:
+                self._prepare(session, path, environment)
+            except CalledProcessError:
+                session.reset()
+                raise
+        logger.info(f"Streaming {arguments} in workspace {self.workspace}.")
+        return TerraformStream(
+            self._command(arguments),
+            path=path,
+            environment=self._environment(environment, path),
+            callback=callback,
+            queue=queue,
+            tail=tail,
+            buffer=buffer,
+            session=session,
+        )
 
-    def run(self, arguments: Union[str, List[str]], path: str):
-        workspace = self._run(["workspace", "show"], path=path).strip()
-        logger.info(f"Executing {arguments} in workspace {workspace}.")
-        if workspace != self.workspace:
-            logger.info(f"swapping to configured workspace {workspace}")
-            workspaces = [
-                v.replace("*", "").strip()
-                for v in self._run(["workspace", "list"], path=path).split("\n")
-            ]
+    def show_plan(
+        self,
+        plan_file: str,
+        path: str,
+        environment: Optional[Dict[str, str]] = None,
+        actions: Optional[Actions] = None,
+        types: Optional[Iterable[str]] = None,
+        values: bool = True,
+    ) -> PlanIndex:
+        """Index the resource changes of a saved plan, parsing terraform
+        show -json as it is written, see pyterraformer.terraform.plan"""
+        with self.stream(["show", "-json", plan_file], path, environment) as run:
+            return PlanIndex.parse(
+                (line.text for line in run if line.stream == "stdout"),
+                actions=actions,
+                types=types,
+                values=values,
+            )
+
+    def _prepare(
+        self,
+        session: TerraformSession,
+        path: str,
+        environment: Optional[Dict[str, str]] = None,
+    ):
+        """Select the configured workspace and initialize the root, unless
+        the session shows both are already done"""
+        steps = self._preparation(session, path)
+        environment = self._preparation_environment(environment)
+        output = None
+        try:
+            while True:
+                command = steps.send(output)
+                lock = self._install_lock(command, session)
+                if lock is None:
+                    output = self._run(command, path, environment)
+                else:
+                    with lock:
+                        output = self._run(command, path, environment)
+        except StopIteration:
+            pass
+
+    def _preparation_environment(
+        self, environment: Optional[Dict[str, str]] = None
+    ) -> Optional[Dict[str, str]]:
+        """The environment of preparation steps. With isolated workspaces
+        they run without TF_WORKSPACE, since terraform refuses to init in,
+        or list from, a workspace that doesn't exist yet."""
+        if not self.isolate_workspaces:
+            return environment
+        return {**(environment or {}), "TF_WORKSPACE": ""}
+
+    def _preparation(
+        self, session: TerraformSession, path: str
+    ) -> Generator[List[str], str, None]:
+        """The commands needed before running one in the root at path.
+        Yields each command and is sent its output, so the same steps can
+        be driven by blocking and by asyncio runs."""
+        if self.isolate_workspaces:
+            yield from self._isolated_preparation(session, path)
+            return
+        # with a backend configured, terraform refuses workspace commands
+        # until the root is initialized
+        yield from self._initialization(session, path)
+        # read where terraform workspace show reads it, so a selection made
+        # by another process is seen too
+        if selected_workspace(path, session.data_directory) == self.workspace:
+            session.avoided["workspace show"] += 1
+        else:
+            logger.info(f"swapping to configured workspace {self.workspace}")
+            session.executed["workspace list"] += 1
+            listed = yield ["workspace", "list"]
+            workspaces = [v.replace("*", "").strip() for v in listed.split("\n")]
             if self.workspace in workspaces:
                 logger.info("workspace found, swapping to")
-                self._run(["workspace", "select", self.workspace], path=path)
+                session.executed["workspace select"] += 1
+                yield ["workspace", "select", self.workspace]
             else:
                 logger.info("workspace not found, creating")
-                self._run(["workspace", "new", self.workspace], path=path)
-        self._run(["init"], path=path)
-        return self._run(arguments=arguments, path=path)
+                session.executed["workspace new"] += 1
+                yield ["workspace", "new", self.workspace]
+        session.workspace = self.workspace
+
+    def _initialization(
+        self, session: TerraformSession, path: str
+    ) -> Generator[List[str], str, None]:
+        """terraform init, unless nothing changed since the last one"""
+        fingerprint = init_fingerprint(path, self.backend, session.data_directory)
+        if session.init_fingerprint == fingerprint:
+            session.avoided["init"] += 1
+            return
+        data_directory = self._session_data_directory(session)
+        if self.provider_cache is not None:
+            if self.provider_cache.populate(path, data_directory):
+                session.avoided["provider install"] += 1
+                session.providers_lock_hash = self.provider_cache.lock_hash(path)
+        session.executed["init"] += 1
+        yield ["init"]
+        if self.provider_cache is not None:
+            self.provider_cache.store(path, data_directory)
+            # init installed whatever the lock file it left behind needs
+            session.providers_lock_hash = self.provider_cache.lock_hash(path)
+        # init can write the lock file and data directory, so fingerprint after
+        session.init_fingerprint = init_fingerprint(
+            path, self.backend, session.data_directory
+        )
+
+    @staticmethod
+    def _session_data_directory(session: TerraformSession) -> str:
+        return session.data_directory or os.path.join(session.path, DATA_DIRECTORY)
 
-    def _run(self, arguments: Union[str, List[str]], path: str):
+    def _install_lock(
+        self, command: List[str], session: TerraformSession
+    ) -> Optional[FileLock]:
+        """The lock to hold while running command, if it is an init that
+        may install providers into the shared cache. Only an init whose
+        providers are known to match the current lock file goes without."""
+        if self.provider_cache is None or command[:1] != ["init"]:
+            return None
+        lock_hash = self.provider_cache.lock_hash(session.path)
+        if lock_hash is not None and lock_hash == session.providers_lock_hash:
+            return None
+        return self.provider_cache.lock()
+
+    def _isolated_preparation(
+        self, session: TerraformSession, path: str
+    ) -> Generator[List[str], str, None]:
+        """The commands needed before running one in an isolated workspace.
+        TF_WORKSPACE selects the workspace, which only has to exist. The new
+        data directory is initialized first, as workspace commands need an
+        initialized backend."""
+        plugin_cache = self._plugin_cache(path)
+        if plugin_cache is not None:
+            os.makedirs(plugin_cache, exist_ok=True)
+        yield from self._initialization(session, path)
+        if session.workspace == self.workspace or self.workspace == "default":
+            session.avoided["workspace list"] += 1
+        else:
+            session.executed["workspace list"] += 1
+            listed = yield ["workspace", "list"]
+            workspaces = [v.replace("*", "").strip() for v in listed.split("\n")]
+            if self.workspace not in workspaces:
+                logger.info(f"workspace {self.workspace} not found, creating")
+                session.executed["workspace new"] += 1
+                yield ["workspace", "new", self.workspace]
+        session.workspace = self.workspace
+
+    def _plugin_cache(self, path: Optional[Union[str, PurePath]]) -> Optional[str]:
+        """The provider plugin cache: the configured one, or with isolated
+        workspaces one shared by every workspace of the root at path"""
+        if self.provider_cache is not None:
+            return str(self.provider_cache.plugins)
+        if self.plugin_cache_directory:
+            return self.plugin_cache_directory
+        if self.isolate_workspaces and path is not None:
+            return os.path.join(
+                os.path.abspath(path), ISOLATED_DATA_DIRECTORY, "plugin-cache"
+            )
+        return None
+
+    def _command(self, arguments: Union[str, List[str]]) -> List[str]:
         if not self.terraform_exec_path:
             raise ValueError("No terraform executable set, cannot run TF commands.")
-        runtime_env = os.environ.copy()
         if isinstance(arguments, str):
             arguments = [arguments]
+        return [self.terraform_exec_path, *arguments]
+
+    def _environment(
+        self,
+        environment: Optional[Dict[str, str]] = None,
+        path: Optional[Union[str, PurePath]] = None,
+    ) -> Dict:
+        """The environment terraform runs in, in the root at path: this
+        process's, with the backend's settings, the plugin cache, the
+        isolated workspace and environment on top"""
         # os.cwd will fail on Null values, which can happen
         runtime_env = {
             key: value
             for key, value in {
-                **runtime_env,
+                **os.environ,
                 **self.backend.generate_environment(),
+                **(environment or {}),
             }.items()
             if value
         }
-        if self.plugin_cache_directory:
-            runtime_env["TF_PLUGIN_CACHE_DIR"] = self.plugin_cache_directory
+        if self.isolate_workspaces and path is not None:
+            runtime_env["TF_DATA_DIR"] = self.data_directory(path)
+            # unless environment removes it, see _preparation_environment
+            if "TF_WORKSPACE" not in (environment or {}):
+                runtime_env["TF_WORKSPACE"] = self.workspace
+        plugin_cache = self._plugin_cache(path)
+        if plugin_cache is not None:
+            runtime_env["TF_PLUGIN_CACHE_DIR"] = plugin_cache
+        return runtime_env
 
-        cmd_array: List[str] = [self.terraform_exec_path, *arguments]
+    def _run(
+        self,
+        arguments: Union[str, List[str]],
+        path: str,
+        environment: Optional[Dict[str, str]] = None,
+    ):
+        cmd_array = self._command(arguments)
+        runtime_env = self._environment(environment, path)
 
         def run_cmd():
             return sub_run(
@@ -73,7 +394,10 @@ class Terraform:
             raise e
 
 
-def extract_errors(input: str):
+def extract_errors(input: Union[str, Iterable[str]]):
+    if not isinstance(input, str):
+        # lines, such as the tail kept by a stream
+        input = "".join(input)
     found = re.findall(
         r"(Error:.*)(?:Error:|$)", input, re.IGNORECASE | re.MULTILINE | re.DOTALL
     )
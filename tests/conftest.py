@@ -1,7 +1,24 @@
 from pytest import fixture
 from pyterraformer import HumanSerializer
+from pyterraformer.core import TerraformWorkspace
 
 
 @fixture(scope="session")
 def human_serializer():
     yield HumanSerializer()
+
+
+@fixture
+def build_workspace(tmp_path, human_serializer):
+    """Write main.tf, and any other files by relative path, to tmp_path and
+    return a workspace with main.tf loaded"""
+
+    def build(main, files=None):
+        for name, text in {"main.tf": main, **(files or {})}.items():
+            (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+            (tmp_path / name).write_text(text)
+        workspace = TerraformWorkspace(path=tmp_path, serializer=human_serializer)
+        workspace.get_file_safe("main.tf")
+        return workspace
+
+    return build
@@ -0,0 +1,210 @@
+import pytest
+
+from pyterraformer.core import TerraformWorkspace
+from pyterraformer.core.evaluation import EvaluationContext, evaluate
+from pyterraformer.core.generics.interpolation import UnresolvedLookup
+
+CONFIG = """variable "prefix" {
+  default = "acme"
+}
+
+variable "enabled" {
+  default = true
+}
+
+locals {
+  name = "${var.prefix}-bucket"
+}
+
+resource "aws_s3_bucket" "b" {
+  bucket = local.name
+  count  = "${var.enabled ? 1 : 0}"
+}
+
+resource "aws_s3_bucket_policy" "p" {
+  bucket = aws_s3_bucket.b.bucket
+  arn    = aws_s3_bucket.b.arn
+  env    = "${terraform.workspace}-${var.prefix}"
+  index  = count.index
+}
+"""
+
+
+def test_evaluate_with_defaults(build_workspace):
+    workspace = build_workspace(CONFIG)
+    bucket = workspace.get_object(tf_id="b")
+    policy = workspace.get_object(tf_id="p")
+    assert bucket.resolved_attributes == {"bucket": "acme-bucket", "count": 1}
+    resolved = policy.resolved_attributes
+    assert resolved["bucket"] == "acme-bucket"
+    assert resolved["env"] == "default-acme"
+    # only known after apply
+    assert isinstance(resolved["arn"], UnresolvedLookup)
+    assert isinstance(resolved["index"], UnresolvedLookup)
+
+
+def test_reevaluate_with_new_context(build_workspace):
+    workspace = build_workspace(CONFIG)
+    bucket = workspace.get_object(tf_id="b")
+    policy = workspace.get_object(tf_id="p")
+    value = policy.render_variables["env"]
+    assert evaluate(value, EvaluationContext(workspace)) == "default-acme"
+    compiled = value._compiled
+
+    for prefix, enabled in (("one", True), ("two", False)):
+        context = EvaluationContext(
+            workspace,
+            variables={"prefix": prefix, "enabled": enabled},
+            terraform_workspace="prod",
+            count_index=3,
+        )
+        assert policy.resolve_attributes(context)["env"] == f"prod-{prefix}"
+        assert policy.resolve_attributes(context)["index"] == 3
+        assert bucket.resolve_attributes(context) == {
+            "bucket": f"{prefix}-bucket",
+            "count": 1 if enabled else 0,
+        }
+    # expressions are compiled once and reused
+    assert value._compiled is compiled
+
+
+def test_functions_and_operators(tmp_path, human_serializer):
+    from pyterraformer.core.generics.interpolation import UnknownValue
+
+    (tmp_path / "main.tf").write_text("""variable "env" {
+  default = "prod"
+}
+
+variable "subnets" {
+  default = ["a", "b", "c"]
+}
+
+locals {
+  name    = "${var.env}-${lower("APP")}"
+  labels  = merge({team = "data"}, {env = var.env})
+  size    = var.env == "prod" ? 3 : 1
+  math    = 2 + 3 * 4 - 10 / 4
+  neg     = -local.size
+  check   = local.size >= 2 && !(var.env == "dev")
+  joined  = join(",", concat(var.subnets, ["d"]))
+  padded  = format("%s-%03d", var.env, 7)
+  subnet  = cidrsubnet("10.0.0.0/16", 8, 2)
+  wrapped = element(var.subnets, 4)
+  fallback = try(local.labels["missing"], "default")
+  unique  = toset(["b", "a", "b"])
+  empty   = null
+  now     = timestamp()
+  invalid = local.name * 2
+}
+""")
+    workspace = TerraformWorkspace(path=tmp_path, serializer=human_serializer)
+    local = workspace.get_file_safe("main.tf").objects[-1]
+    resolved = local.resolved_attributes
+    assert resolved["name"] == "prod-app"
+    assert resolved["labels"] == {"team": "data", "env": "prod"}
+    assert resolved["math"] == 11.5
+    assert resolved["neg"] == -3
+    assert resolved["check"] is True
+    assert resolved["joined"] == "a,b,c,d"
+    assert resolved["padded"] == "prod-007"
+    assert resolved["subnet"] == "10.0.2.0/24"
+    assert resolved["wrapped"] == "b"
+    assert resolved["fallback"] == "default"
+    assert resolved["unique"] == ["a", "b"]
+    assert resolved["empty"] is None
+    # unsupported and failing calls produce explicit markers
+    assert resolved["now"] == UnknownValue("timestamp", "unsupported function")
+    assert isinstance(resolved["invalid"], UnknownValue)
+    assert resolved["invalid"].error
+
+    # function calls render back unchanged
+    assert repr(local.render_variables["padded"]) == 'format("%s-%03d",var.env,7)'
+
+
+def test_function_library():
+    from pyterraformer.core.functions import FUNCTIONS
+
+    assert FUNCTIONS["formatlist"]("%s=%v", ["a", "b"], 1) == ["a=1", "b=1"]
+    assert FUNCTIONS["replace"]("a-1-b", "/(\\d)/", "<$1>") == "a-<1>-b"
+    assert FUNCTIONS["cidrsubnets"]("10.1.0.0/16", 4, 4, 8) == [
+        "10.1.0.0/20",
+        "10.1.16.0/20",
+        "10.1.32.0/24",
+    ]
+    assert FUNCTIONS["lookup"]({"a": 1}, "a") == 1
+    assert FUNCTIONS["flatten"]([["a"], [["b"]], "c"]) == ["a", "b", "c"]
+    assert FUNCTIONS["jsonencode"]({"b": [1, True], "a": None}) == (
+        '{"a":null,"b":[1,true]}'
+    )
+    assert FUNCTIONS["substr"]("hello world", -5, -1) == "world"
+    assert FUNCTIONS["element"](["a", "b"], 3) == "b"
+    with pytest.raises(IndexError):
+        FUNCTIONS["element"](["a", "b"], -1)
+
+
+def test_resolve_matrix(tmp_path, human_serializer):
+    (tmp_path / "main.tf").write_text("""variable "region" {
+  default = "us"
+}
+
+locals {
+  tags = merge({team = "data"}, {owner = "platform"})
+}
+
+resource "aws_s3_bucket" "b" {
+  bucket = "${terraform.workspace}-${var.region}"
+  tags   = local.tags
+  size   = terraform.workspace == "prod" ? 3 : 1
+}
+""")
+    workspace = TerraformWorkspace(path=tmp_path, serializer=human_serializer)
+    workspace.get_file_safe("main.tf")
+    bucket = workspace.get_object(tf_id="b")
+    matrix = bucket.resolve_matrix(
+        workspaces=["dev", "prod"], var_sets=[{}, {"region": "eu"}]
+    )
+    assert sorted(matrix) == [("dev", 0), ("dev", 1), ("prod", 0), ("prod", 1)]
+    assert matrix[("dev", 0)]["bucket"] == "dev-us"
+    assert matrix[("prod", 1)]["bucket"] == "prod-eu"
+    assert matrix[("prod", 0)]["size"] == 3 and matrix[("dev", 1)]["size"] == 1
+    # values that don't depend on the workspace or variables are computed once
+    tags = [resolved["tags"] for resolved in matrix.values()]
+    assert tags[0] == {"team": "data", "owner": "platform"}
+    assert all(value is tags[0] for value in tags)
+
+    assert bucket.resolve_matrix()[("default", 0)]["bucket"] == "default-us"
+
+
+def test_resolved_attributes_are_cached_until_dependencies_change(build_workspace):
+    from pyterraformer.core.resources import ResourceObject
+
+    workspace = build_workspace(CONFIG)
+    file = workspace.get_file_safe("main.tf")
+    bucket = workspace.get_object(tf_id="b")
+    policy = workspace.get_object(tf_id="p")
+    variable = workspace.get_object(_type="variable", name="prefix")
+
+    assert policy.resolved_attributes["bucket"] == "acme-bucket"
+    cached = policy._resolved_cache
+    assert policy.resolved_attributes["bucket"] == "acme-bucket"
+    assert policy._resolved_cache is cached
+
+    # unrelated changes keep the cache
+    file.add_object(ResourceObject(tf_id="other", _type="aws_sqs_queue", name="queue"))
+    policy.resolved_attributes
+    assert policy._resolved_cache is cached
+
+    # changes anywhere along a reference chain invalidate it
+    variable.default = "corp"
+    assert policy.resolved_attributes["bucket"] == "corp-bucket"
+    assert policy.resolved_attributes["env"] == "default-corp"
+    bucket.bucket = "fixed"
+    assert policy.resolved_attributes["bucket"] == "fixed"
+    policy.arn = "arn:aws:s3:::fixed"
+    assert policy.resolved_attributes["arn"] == "arn:aws:s3:::fixed"
+
+    # as do references that now point to a new object
+    workspace.get_object(tf_id="b")._file.delete_object(bucket)
+    assert isinstance(policy.resolved_attributes["bucket"], UnresolvedLookup)
+    file.add_object(ResourceObject(tf_id="b", _type="aws_s3_bucket", bucket="new"))
+    assert policy.resolved_attributes["bucket"] == "new"
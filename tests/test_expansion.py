@@ -0,0 +1,92 @@
+import pytest
+
+from pyterraformer.core.generics.interpolation import UnresolvedLookup
+
+CONFIG = """variable "names" {
+  default = ["a", "b"]
+}
+
+variable "zones" {
+  default = {
+    east = "us-east-1"
+    west = "us-west-2"
+  }
+}
+
+resource "aws_s3_bucket" "b" {
+  count  = length(var.names)
+  bucket = "${var.names[count.index]}-bucket"
+}
+
+resource "aws_instance" "i" {
+  for_each = var.zones
+  zone     = each.value
+  name     = "host-${each.key}"
+  subnet   = aws_subnet.s.id
+}
+
+resource "aws_iam_user" "u" {
+  for_each = toset(var.names)
+  name     = each.key
+}
+
+resource "aws_eip" "e" {
+  count    = length(aws_instance.i.id)
+  instance = "eip"
+}
+
+resource "aws_vpc" "v" {
+  cidr_block = "10.0.0.0/16"
+}
+"""
+
+
+def test_expand_instances(build_workspace):
+    workspace = build_workspace(CONFIG)
+    instances = workspace.instances()
+    assert list(instances) == [
+        "aws_s3_bucket.b[0]",
+        "aws_s3_bucket.b[1]",
+        'aws_instance.i["east"]',
+        'aws_instance.i["west"]',
+        'aws_iam_user.u["a"]',
+        'aws_iam_user.u["b"]',
+        "aws_eip.e[*]",
+        "aws_vpc.v",
+    ]
+    assert instances["aws_s3_bucket.b[1]"].attributes == {"bucket": "b-bucket"}
+    east = instances['aws_instance.i["east"]']
+    assert east.key == "east"
+    assert east.attributes["zone"] == "us-east-1"
+    assert east.attributes["name"] == "host-east"
+    assert east.unknown == ["subnet"]
+    assert instances['aws_iam_user.u["b"]'].attributes == {"name": "b"}
+    # the number of instances is only known after apply
+    placeholder = instances["aws_eip.e[*]"]
+    assert not placeholder.known
+    assert isinstance(placeholder.key, UnresolvedLookup)
+    assert placeholder.attributes == {"instance": "eip"}
+    assert instances["aws_vpc.v"].key is None
+
+    bucket = workspace.get_object(tf_id="b")
+    assert [
+        instance.address for instance in bucket.instances(variables={"names": ["x"]})
+    ] == ["aws_s3_bucket.b[0]"]
+    assert bucket.instances(variables={"names": []}) == []
+
+
+def test_expand_invalid(build_workspace):
+    workspace = build_workspace(
+        """resource "aws_s3_bucket" "b" {
+  count = "many"
+}
+
+resource "aws_s3_bucket" "c" {
+  for_each = "name"
+}
+""",
+    )
+    with pytest.raises(ValueError):
+        workspace.get_object(tf_id="b").instances()
+    with pytest.raises(ValueError):
+        workspace.get_object(tf_id="c").instances()
@@ -0,0 +1,117 @@
+import pytest
+
+from pyterraformer.core.resources import ResourceObject
+
+MAIN = """variable "region" {
+  default = "us-east-1"
+}
+
+variable "unused" {
+  default = "x"
+}
+
+locals {
+  prefix = "${var.region}-app"
+  tags   = merge({team = "data"}, {region = var.region})
+}
+
+data "aws_caller_identity" "current" {
+}
+
+resource "aws_s3_bucket" "b" {
+  bucket = "${local.prefix}-${data.aws_caller_identity.current.account_id}"
+  tags   = local.tags
+}
+
+resource "aws_s3_bucket_policy" "p" {
+  bucket = aws_s3_bucket.b.id
+  policy = lookup(var.policies, aws_s3_bucket.b.bucket, "")
+  count  = "${terraform.workspace == "prod" ? 1 : 0}"
+}
+
+module "network" {
+  source = "./network"
+  bucket = aws_s3_bucket_policy.p.id
+}
+
+output "network" {
+  value = module.network.vpc_id
+}
+"""
+
+
+def test_reference_graph(build_workspace):
+    workspace = build_workspace(MAIN)
+    graph = workspace.graph
+    assert graph.dependencies("aws_s3_bucket.b") == {
+        "local.prefix",
+        "local.tags",
+        "data.aws_caller_identity.current",
+    }
+    assert graph.dependencies("aws_s3_bucket_policy.p") == {
+        "aws_s3_bucket.b",
+        "var.policies",
+    }
+    assert graph.dependents("var.region") == {"local.prefix", "local.tags"}
+    assert graph.dependents("var.unused") == set()
+    assert graph.impact(["var.region"]) == {
+        "local.prefix",
+        "local.tags",
+        "aws_s3_bucket.b",
+        "aws_s3_bucket_policy.p",
+        "module.network",
+        "output.network",
+    }
+    assert graph.dependencies("output.network", transitive=True) >= {
+        "module.network",
+        "aws_s3_bucket.b",
+        "var.region",
+    }
+
+    order = graph.topological_order()
+    assert set(order) == set(graph.declared)
+    for address in order:
+        for target in graph.dependencies(address):
+            if target in graph.declared:
+                assert order.index(target) < order.index(address)
+    assert graph.cycles() == []
+
+
+def test_reference_graph_follows_changes(build_workspace):
+    workspace = build_workspace(MAIN)
+    graph = workspace.graph
+    file = workspace.get_file_safe("main.tf")
+    assert "aws_s3_bucket.b" in graph.dependents("local.tags")
+
+    bucket = workspace.get_object(tf_id="b")
+    bucket.tags = {"region": "${var.unused}"}
+    del bucket.bucket
+    assert graph.dependencies("aws_s3_bucket.b") == set()
+    bucket.tags = workspace.serializer.parse_string("locals {\n  tags = var.unused\n}")[
+        0
+    ].render_variables["tags"]
+    assert graph.dependencies("aws_s3_bucket.b") == {"var.unused"}
+    assert graph.dependents("local.tags") == set()
+
+    # new objects, including ones that close a cycle
+    file.add_object(
+        ResourceObject(
+            tf_id="loop",
+            _type="aws_sqs_queue",
+            name=bucket.tags,
+        )
+    )
+    assert "aws_sqs_queue.loop" in graph.impact(["var.unused"])
+    policy = workspace.get_object(tf_id="p")
+    file.delete_object(policy)
+    assert "aws_s3_bucket_policy.p" not in graph
+    assert "module.network" not in graph.dependents("aws_s3_bucket.b", transitive=True)
+
+    loop = workspace.serializer.parse_string("""locals {
+  a = local.b
+  b = local.a
+}""")[0]
+    file.add_object(loop)
+    assert graph.cycles() == [["local.a", "local.b"]]
+    with pytest.raises(ValueError):
+        graph.topological_order()
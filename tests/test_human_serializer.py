@@ -190,3 +190,15 @@ MULTILINE
     assert rendered.find("# maintain position") < rendered.find(
         "# this is a helpful comment"
     )
+
+
+def test_variable_type_round_trip(human_serializer):
+    for type in ("string", "map(list(string))", "set(number)"):
+        variable = human_serializer.parse_string(
+            f'variable "x" {{\n  type = {type}\n}}'
+        )[0]
+        rendered = human_serializer.render_object(variable)
+        assert f"type = {type}" in standard_string(rendered)
+        body = rendered[rendered.index("{") :]
+        reparsed = human_serializer.parse_string(f'variable "x" {body}')[0]
+        assert repr(reparsed.type) == type
@@ -0,0 +1,77 @@
+from pyterraformer.core.generics.interpolation import UnresolvedLookup
+
+MODULE = """variable "cidr" {
+  default = "10.0.0.0/16"
+}
+
+variable "name" {}
+
+locals {
+  label = "${var.name}-vpc"
+}
+
+output "label" {
+  value = local.label
+}
+
+output "cidr" {
+  value = var.cidr
+}
+"""
+
+CONFIG = """module "a" {
+  source = "./modules/network"
+  name   = "alpha"
+}
+
+module "b" {
+  source = "./modules/network"
+  name   = "alpha"
+  cidr   = "10.1.0.0/16"
+}
+
+module "c" {
+  source = "./modules/network"
+  name   = "alpha"
+}
+
+module "remote" {
+  source = "terraform-aws-modules/vpc/aws"
+}
+
+resource "aws_vpc" "v" {
+  name    = module.a.label
+  cidr    = module.b.cidr
+  default = module.c.cidr
+  missing = module.a.missing
+  remote  = module.remote.vpc_id
+}
+"""
+
+
+def test_module_outputs(tmp_path, build_workspace):
+    workspace = build_workspace(CONFIG, {"modules/network/main.tf": MODULE})
+    vpc = workspace.get_object(tf_id="v")
+    resolved = vpc.resolved_attributes
+    assert resolved["name"] == "alpha-vpc"
+    assert resolved["cidr"] == "10.1.0.0/16"
+    assert resolved["default"] == "10.0.0.0/16"
+    assert isinstance(resolved["missing"], UnresolvedLookup)
+    assert isinstance(resolved["remote"], UnresolvedLookup)
+    # one module workspace, evaluated once per distinct set of inputs
+    loader = workspace.module_loader
+    assert list(loader.workspaces) == [str(tmp_path / "modules" / "network")]
+    assert len(loader._outputs) == 2
+
+
+def test_module_outputs_follow_changes(build_workspace):
+    workspace = build_workspace(CONFIG, {"modules/network/main.tf": MODULE})
+    vpc = workspace.get_object(tf_id="v")
+    assert vpc.resolved_attributes["name"] == "alpha-vpc"
+
+    workspace.get_object(tf_id="a").name = "beta"
+    assert vpc.resolved_attributes["name"] == "beta-vpc"
+
+    module = workspace.get_object(tf_id="a").module_workspace()
+    module.get_object(tf_id="label").value = "renamed"
+    assert vpc.resolved_attributes["name"] == "renamed"
@@ -0,0 +1,266 @@
+from pyterraformer.core.generics import Literal, String, StringLit
+from pyterraformer.core.objects import ObjectMetadata
+
+
+def test_compact_nodes_have_no_instance_dict():
+    for node in (
+        String("a"),
+        StringLit([String("a")]),
+        Literal("a"),
+        ObjectMetadata(row_num=1),
+    ):
+        assert not hasattr(node, "__dict__")
+
+
+def test_generic_resource_types_are_per_instance(human_serializer):
+    parsed = human_serializer.parse_string("""resource "aws_s3_bucket" "b" {
+  bucket = "my-tf-test-bucket"
+}
+
+resource "aws_iam_role" "r" {
+  name = "my-role"
+}""")
+    assert [obj._type for obj in parsed] == ["aws_s3_bucket", "aws_iam_role"]
+    assert parsed[1].tf_attributes == {"name": None}.keys()
+
+
+def test_metadata_shares_file_source(tmp_path):
+    from pyterraformer import HumanSerializer
+    from pyterraformer.core import TerraformWorkspace
+
+    text = """resource "aws_s3_bucket" "b" {
+  bucket = "my-tf-test-bucket"
+}
+
+resource "aws_iam_role" "r" {
+  name = "my-role"
+}
+"""
+    (tmp_path / "main.tf").write_text(text)
+    workspace = TerraformWorkspace(path=tmp_path, serializer=HumanSerializer())
+    file = workspace.get_file_safe("main.tf")
+    bucket, role = file.objects
+    assert bucket._metadata.source is role._metadata.source is file.source
+    assert (
+        role._metadata.orig_text
+        == text[text.index('resource "aws_iam_role"') :].strip()
+    )
+    assert file.text == text
+
+    scan = TerraformWorkspace(
+        path=tmp_path, serializer=HumanSerializer(keep_source=False)
+    )
+    file = scan.get_file_safe("main.tf")
+    assert file.source is None
+    assert file.objects[0]._metadata.orig_text is None
+    assert file.objects[0].bucket == "my-tf-test-bucket"
+
+
+def test_source_buffer_outlives_file_changes(tmp_path):
+    from pyterraformer.core.source import SourceBuffer
+
+    path = tmp_path / "main.tf"
+    path.write_text('resource "a" "b" {}\n')
+    buffer = SourceBuffer.from_file(path)
+    # e.g. terraform fmt or an editor truncating the file
+    path.write_text("")
+    assert buffer.slice(9, 12) == '"a"'
+    assert buffer.text == 'resource "a" "b" {}\n'
+
+
+def test_attribute_protocol():
+    from pyterraformer.core.resources import ResourceObject
+
+    class GoogleStorageBucket(ResourceObject):
+        _type = "google_storage_bucket"
+
+    bucket = GoogleStorageBucket(tf_id="bucket", name="my-bucket", location="US")
+    other = GoogleStorageBucket(tf_id="other")
+
+    # repeated reads go through the installed class accessor
+    assert bucket.location == "US"
+    assert bucket.location == "US"
+    assert not hasattr(other, "location")
+    assert other.location_lookup.value == "google_storage_bucket.other.location"
+
+    bucket.location = "EU"
+    bucket.storage_class = "STANDARD"
+    assert bucket.render_variables["location"] == "EU"
+    assert bucket.render_variables["storage_class"] == "STANDARD"
+    assert bucket._changed
+    assert bucket.location_resolved == "EU"
+
+    # internal names are only rendered when already terraform attributes
+    bucket.tf_id = "renamed"
+    bucket.name = "new-name"
+    assert "tf_id" not in bucket.render_variables
+    assert bucket.render_variables["name"] == "new-name"
+    other.template = "custom"
+    assert "template" not in other.render_variables
+    assert other.template == "custom"
+
+    del bucket.storage_class
+    assert not hasattr(bucket, "storage_class")
+
+
+def test_data_label_is_not_shadowed(human_serializer):
+    data = human_serializer.parse_string("""data "google_project" "project" {
+  name = "not-the-label"
+}""")[0]
+    assert data.name == "project"
+    assert data.render_variables["name"] == "not-the-label"
+
+
+def test_labels_win_over_accessors_of_other_objects(human_serializer):
+    from pyterraformer.core import TerraformObject
+
+    # a name read on a plain object mustn't shadow the labels of subclasses
+    assert TerraformObject("x", name="plain").name == "plain"
+    data, variable = human_serializer.parse_string("""data "google_project" "project" {
+  name = "not-the-label"
+}
+
+variable "region" {
+  type = string
+}""")
+    assert data.name == "project"
+    assert data.type == "google_project"
+    assert variable.name == "region"
+    assert "name" not in TerraformObject.__dict__
+
+
+def test_parsed_resources_get_accessors(human_serializer):
+    from pyterraformer.core.objects import _RenderVariable
+    from pyterraformer.core.resources import ResourceObject
+
+    bucket, data = human_serializer.parse_string("""resource "aws_s3_bucket" "b" {
+  versioning = "on"
+}
+
+data "google_project" "project" {
+  versioning = "data"
+}""")
+    assert type(bucket) is ResourceObject
+    assert bucket.versioning == "on"
+    assert isinstance(ResourceObject.__dict__["versioning"], _RenderVariable)
+    assert bucket.versioning == "on"
+    assert data.versioning == "data"
+    bucket.versioning = {"enabled": True}
+    assert bucket.versioning["enabled"] is True and bucket.changed
+    del bucket.versioning
+    assert not hasattr(bucket, "versioning")
+
+
+def test_nested_mutation_marks_object_and_file_changed(tmp_path):
+    from pyterraformer import HumanSerializer
+    from pyterraformer.core import TerraformWorkspace
+
+    (tmp_path / "main.tf").write_text("""resource "aws_s3_bucket" "b" {
+  bucket = "my-tf-test-bucket"
+  tags = {
+    Name = "My bucket"
+  }
+}
+""")
+    (tmp_path / "other.tf").write_text("""resource "aws_iam_role" "r" {
+  name = "my-role"
+}
+""")
+    workspace = TerraformWorkspace(path=tmp_path, serializer=HumanSerializer())
+    main = workspace.get_file_safe("main.tf")
+    other = workspace.get_file_safe("other.tf")
+    bucket = main.objects[0]
+    assert bucket._file is main and bucket._workspace is workspace
+    assert not bucket.changed and not main.changed
+
+    bucket.tags["Environment"] = "Prod"
+    assert bucket.changed and main.changed
+    assert not other.changed
+
+    # only the changed file is written back
+    other_text = (tmp_path / "other.tf").read_text()
+    (tmp_path / "other.tf").write_text(other_text + "\n# untouched\n")
+    workspace.save()
+    assert "Environment" in (tmp_path / "main.tf").read_text()
+    assert (tmp_path / "other.tf").read_text().endswith("# untouched\n")
+    assert not bucket.changed and not main.changed
+
+
+def test_tracked_containers():
+    import copy
+    import pickle
+
+    from pyterraformer.core.generics import BlockList
+    from pyterraformer.core.resources import ResourceObject
+
+    obj = ResourceObject(
+        tf_id="r",
+        _type="google_storage_bucket",
+        cors=BlockList([{"origin": ["a"]}]),
+        labels={"a": "b"},
+    )
+    assert not obj.changed
+    obj.cors[0]["origin"].append("b")
+    assert obj.changed
+
+    obj._changed = False
+    new = {"x": [1]}
+    obj.labels = new
+    obj._changed = False
+    obj.labels["x"].append(2)
+    assert obj.changed
+    # the assigned value is stored as a tracked copy
+    assert new == {"x": [1]}
+
+    other = ResourceObject(tf_id="o", _type="google_storage_bucket")
+    other.labels = obj.labels
+    obj._changed = False
+    other.labels["y"] = 1
+    assert other.changed and not obj.changed
+
+    for loaded in (pickle.loads(pickle.dumps(obj)), copy.deepcopy(obj)):
+        assert loaded.cors == obj.cors
+        assert isinstance(loaded.cors, BlockList)
+        assert not loaded.changed
+        loaded.cors[0]["origin"].pop()
+        assert loaded.changed and not obj.changed
+
+    obj._changed = False
+    obj.tf_id = "renamed"
+    assert obj.changed
+
+
+def test_expression_nodes_are_immutable_and_hashable(human_serializer):
+    import copy
+    import pickle
+
+    import pytest
+
+    from pyterraformer.core.generics import Interpolation
+
+    first, second = human_serializer.parse_string("""resource "aws_s3_bucket" "a" {
+  bucket = "${var.prefix}-bucket"
+}
+
+resource "aws_s3_bucket" "b" {
+  bucket = "${var.prefix}-bucket"
+}""")
+    value = first.bucket
+    assert isinstance(value, StringLit)
+    assert value == second.bucket and hash(value) == hash(second.bucket)
+    assert value == "${var.prefix}-bucket"
+    assert len({value, second.bucket}) == 1
+    # identifiers are shared between nodes
+    assert (
+        value.contents[0].contents[0].base is second.bucket.contents[0].contents[0].base
+    )
+
+    with pytest.raises(AttributeError):
+        value.contents = ()
+    assert copy.deepcopy(value) is value
+    assert copy.copy(value) is value
+
+    loaded = pickle.loads(pickle.dumps(value))
+    assert loaded == value and repr(loaded) == repr(value)
+    assert isinstance(loaded.contents[0], Interpolation)
+    assert isinstance(loaded.contents, tuple)
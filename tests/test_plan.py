@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+from pyterraformer.terraform.plan import PlanIndex
+
+PLAN = {
+    "format_version": "1.1",
+    "terraform_version": "1.3.7",
+    "variables": {"region": {"value": "us-east-1"}},
+    "planned_values": {"root_module": {"resources": [{"address": "x", "v": "[{"}]}},
+    "errored": False,
+    "resource_changes": [
+        {
+            "address": "aws_instance.web[0]",
+            "mode": "managed",
+            "type": "aws_instance",
+            "name": "web",
+            "index": 0,
+            "change": {
+                "actions": ["update"],
+                "before": {"tags": {"name": 'a "quoted" ]'}},
+                "after": {"tags": {"name": "b"}},
+            },
+        },
+        {
+            "address": "module.db.aws_db_instance.main",
+            "module_address": "module.db",
+            "mode": "managed",
+            "type": "aws_db_instance",
+            "name": "main",
+            "change": {"actions": ["delete", "create"], "before": {}, "after": {}},
+        },
+        {
+            "address": "aws_s3_bucket.logs",
+            "mode": "managed",
+            "type": "aws_s3_bucket",
+            "name": "logs",
+            "change": {"actions": ["no-op"], "before": {}, "after": {}},
+        },
+    ],
+    "prior_state": {"values": {"resources": ["}", {"a": [1, 2, {"b": None}]}]}},
+}
+
+
+def chunks(text, size):
+    return (text[i : i + size] for i in range(0, len(text), size))
+
+
+@pytest.mark.parametrize("size", [1, 7, 64, 1 << 20])
+def test_parse_plan(size):
+    text = json.dumps(PLAN, indent=1 if size == 7 else None)
+    plan = PlanIndex.parse(chunks(text, size))
+    assert plan.terraform_version == "1.3.7"
+    assert [change.address for change in plan] == [
+        change["address"] for change in PLAN["resource_changes"]
+    ]
+    assert plan["aws_instance.web[0]"].before == {"tags": {"name": 'a "quoted" ]'}}
+    assert plan.counts() == {"update": 1, "replace": 1, "no-op": 1}
+    assert plan.addresses(action="delete") == ["module.db.aws_db_instance.main"]
+    assert plan.addresses(action=["replace", "update"], type="aws_instance") == [
+        "aws_instance.web[0]"
+    ]
+    assert plan.has_changes
+
+
+def test_parse_plan_filters():
+    text = json.dumps(PLAN)
+    plan = PlanIndex.parse(chunks(text, 16), actions="replace", values=False)
+    assert plan.addresses() == ["module.db.aws_db_instance.main"]
+    assert plan["module.db.aws_db_instance.main"].after is None
+    plan = PlanIndex.parse([text], types=["aws_s3_bucket"])
+    assert not plan.has_changes
+
+    with pytest.raises(ValueError):
+        PlanIndex.parse(chunks(text[:-40], 16))
+
+
+def test_parse_plan_long_strings_are_scanned_once(monkeypatch):
+    from pyterraformer.terraform import plan
+
+    document = dict(PLAN, configuration={"user_data": "x" * 2**22})
+    text = json.dumps(document)
+    scanned = []
+    scan = plan._PlanScanner._scan
+
+    def counting_scan(self, final):
+        scanned.append(len(self.buffer) - self.position)
+        return scan(self, final)
+
+    monkeypatch.setattr(plan._PlanScanner, "_scan", counting_scan)
+    chunks = [text[i : i + 65536] for i in range(0, len(text), 65536)]
+    index = PlanIndex.parse(chunks)
+    assert len(index) == 3
+    # rescanning the pending string on every chunk would be quadratic
+    assert sum(scanned) < 4 * len(text)
@@ -0,0 +1,63 @@
+import pickle
+from pathlib import Path
+
+import pytest
+
+from pyterraformer import HumanSerializer
+from pyterraformer.core import TerraformWorkspace
+from pyterraformer.core.snapshot import SNAPSHOT_MAGIC
+
+CASES = Path(__file__).parent / "test_parsing" / "cases"
+
+
+def test_snapshot_round_trip(tmp_path):
+    serializer = HumanSerializer()
+    workspace = TerraformWorkspace(path=CASES, serializer=serializer)
+    for file in CASES.iterdir():
+        workspace.get_file_safe(file.name)
+    workspace.add_child_workspace(str(CASES / "child"))
+
+    snapshot = tmp_path / "workspace.snapshot"
+    workspace.snapshot(snapshot)
+    assert snapshot.read_bytes().startswith(SNAPSHOT_MAGIC)
+
+    loaded = TerraformWorkspace.from_snapshot(snapshot, serializer=serializer)
+    assert loaded.serializer is serializer
+    assert loaded.terraform is None
+    assert loaded.children[0].serializer is serializer
+    assert serializer.render_workspace(loaded, format=False) == (
+        serializer.render_workspace(workspace, format=False)
+    )
+    cluster = loaded.get_object(tf_id="primary")
+    assert (
+        cluster._metadata.row_num
+        == workspace.get_object(tf_id="primary")._metadata.row_num
+    )
+
+
+def test_snapshot_rejects_invalid_files(tmp_path):
+    bad = tmp_path / "bad.snapshot"
+    bad.write_bytes(b"not a snapshot at all, just some bytes")
+    with pytest.raises(ValueError):
+        TerraformWorkspace.from_snapshot(bad)
+
+    empty = tmp_path / "empty.snapshot"
+    empty.write_bytes(b"")
+    with pytest.raises(ValueError):
+        TerraformWorkspace.from_snapshot(empty)
+
+
+def test_object_pickling(human_serializer):
+    bucket = human_serializer.parse_string("""resource "aws_s3_bucket" "b" {
+  bucket = "my-tf-test-bucket"
+  tags = {
+    Name = "My bucket"
+  }
+}""")[0]
+    loaded = pickle.loads(pickle.dumps(bucket))
+    assert loaded._type == "aws_s3_bucket"
+    assert loaded.bucket == bucket.bucket
+    assert loaded.tags == bucket.tags
+    assert human_serializer.render_object(loaded) == human_serializer.render_object(
+        bucket
+    )
@@ -0,0 +1,52 @@
+from pyterraformer.core.resources import ResourceObject
+
+MAIN = """variable "project" {
+  default = "my-project"
+}
+
+resource "aws_s3_bucket" "b" {
+  bucket = "my-tf-test-bucket"
+}
+
+resource "aws_s3_bucket_policy" "p" {
+  bucket  = aws_s3_bucket.b.bucket
+  project = var.project
+}
+"""
+
+
+def test_references_resolve_through_symbol_table(build_workspace):
+    workspace = build_workspace(MAIN)
+    policy = workspace.get_object(tf_id="p")
+    assert not workspace.symbols.built
+    assert policy.resolved_attributes == {
+        "bucket": "my-tf-test-bucket",
+        "project": "my-project",
+    }
+    version = workspace.symbols.version
+    # later lookups reuse the index
+    assert policy.bucket_resolved == "my-tf-test-bucket"
+    assert workspace.symbols.version == version
+    assert workspace.symbols.resource("aws_s3_bucket", "b") is workspace.get_object(
+        tf_id="b"
+    )
+
+
+def test_symbol_table_tracks_changes(build_workspace):
+    workspace = build_workspace(MAIN)
+    symbols = workspace.symbols
+    symbols.build()
+    bucket = workspace.get_object(tf_id="b")
+
+    bucket.tf_id = "renamed"
+    assert "b" not in symbols.resources["aws_s3_bucket"]
+    assert symbols.resource("aws_s3_bucket", "renamed") is bucket
+
+    workspace.files["main.tf"].delete_object(bucket)
+    assert "renamed" not in symbols.resources["aws_s3_bucket"]
+
+    other = workspace.add_file("other.tf")
+    new = ResourceObject(tf_id="c", _type="aws_s3_bucket", bucket="other")
+    other.add_object(new)
+    assert symbols.resource("aws_s3_bucket", "c") is new
+    assert symbols.variable("project").name == "project"
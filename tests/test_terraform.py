@@ -0,0 +1,575 @@
+import asyncio
+import json
+import os
+import stat
+import time
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+from subprocess import CalledProcessError, TimeoutExpired
+
+import pytest
+
+from pyterraformer import HumanSerializer, Terraform, TerraformWorkspace
+from pyterraformer.terraform import AsyncTerraform
+from pyterraformer.terraform.backends import LocalBackend
+from pyterraformer.terraform.plan_cache import PlanCache, input_fingerprint
+from pyterraformer.terraform.provider_cache import FileLock, ProviderCache
+from pyterraformer.terraform.terraform import extract_errors
+from pyterraformer.terraform.runner import run_all
+
+# records each call, and keeps the selected workspace in the data directory
+# like terraform
+FAKE_TERRAFORM = """#!/bin/sh
+echo "$*" >> calls.log
+data="${TF_DATA_DIR:-.terraform}"
+# like a configured backend, which needs init before anything else
+case "$1" in
+  init|version) ;;
+  *) if [ ! -d "$data" ]; then
+       echo "Error: Backend initialization required" >&2; exit 1
+     fi ;;
+esac
+case "$1 $2" in
+  "workspace show") cat "$data/environment" 2>/dev/null || echo default ;;
+  "workspace list") echo "* default"; cat .workspaces 2>/dev/null || true ;;
+  "workspace select") echo "$3" > "$data/environment" ;;
+  "workspace new") echo "$3" >> .workspaces; echo "$3" > "$data/environment" ;;
+  "init ")
+    if [ -n "$TF_WORKSPACE" ] && [ "$TF_WORKSPACE" != default ] \\
+        && ! grep -qx "$TF_WORKSPACE" .workspaces 2>/dev/null; then
+      echo "Error: Currently selected workspace does not exist" >&2; exit 1
+    fi
+    mkdir -p "$data"
+    if [ ! -d "$data/providers" ]; then
+      echo installed >> installs.log
+      mkdir -p "$data/providers/hashicorp/null"
+      echo binary > "$data/providers/hashicorp/null/terraform-provider-null"
+    fi ;;
+  "fail ") echo "Error: failed" >&2; exit 1 ;;
+  "slow ") sleep 0.5 ;;
+  "show -json") cat "$3" ;;
+  "version -json") echo '{"terraform_version": "1.5.7"}' ;;
+  "hang ") sleep 30 & echo $! > hang.pid; wait ;;
+  "noisy "*)
+    i=0
+    while [ $i -lt 500 ]; do echo "line $i"; echo "warning $i" >&2; i=$((i+1)); done
+    if [ "$2" = "fail" ]; then echo "Error: noisy failure" >&2; exit 1; fi ;;
+  *)
+    if [ -n "$FAIL" ]; then echo "Error: $FAIL" >&2; exit 1; fi
+    for argument in "$@"; do
+      case "$argument" in -out=*)
+        echo '{"resource_changes": [{"address": "null_resource.a",
+          "type": "null_resource", "change": {"actions": ["create"]}}]}' \
+          > "${argument#-out=}" ;;
+      esac
+    done
+    echo "ran $*${RUN_ID:+ $RUN_ID}${TF_WORKSPACE:+ in $TF_WORKSPACE}" ;;
+esac
+"""
+
+
+@pytest.fixture
+def terraform(tmp_path):
+    executable = tmp_path / "terraform"
+    executable.write_text(FAKE_TERRAFORM)
+    executable.chmod(executable.stat().st_mode | stat.S_IEXEC)
+    return Terraform(
+        terraform_exec_path=str(executable),
+        backend=LocalBackend(path=str(tmp_path)),
+        workspace="dev",
+    )
+
+
+def calls(root):
+    return (root / "calls.log").read_text().splitlines()
+
+
+def test_run_skips_redundant_checks(tmp_path, terraform):
+    root = tmp_path / "root"
+    root.mkdir()
+    (root / "main.tf").write_text('module "m" {\n  source = "./m"\n}\n')
+
+    assert terraform.run(["fmt"], path=str(root)) == "ran fmt\n"
+    assert calls(root) == [
+        "init",
+        "workspace list",
+        "workspace new dev",
+        "fmt",
+    ]
+    terraform.run(["output"], path=str(root))
+    assert calls(root)[4:] == ["output"]
+    session = terraform.session(root)
+    assert session.avoided == {"workspace show": 1, "init": 1}
+    assert terraform.avoided_calls == {"workspace show": 1, "init": 1}
+
+    # a new module source needs init again
+    (root / "main.tf").write_text('module "m" {\n  source = "./other"\n}\n')
+    terraform.run(["plan"], path=str(root))
+    assert calls(root)[5:] == ["init", "plan"]
+
+    # as does a new backend or provider requirement
+    (root / "versions.tf").write_text(
+        'terraform {\n  required_providers = { null = "~> 3.0" }\n}\n'
+    )
+    terraform.run(["plan"], path=str(root))
+    assert calls(root)[7:] == ["init", "plan"]
+    (root / "versions.tf").write_text(
+        'terraform {\n  backend "s3" {}\n  required_providers = { null = "~> 3.0" }\n}\n'
+    )
+    terraform.run(["plan"], path=str(root))
+    assert calls(root)[9:] == ["init", "plan"]
+
+    # as does a different workspace
+    terraform.workspace = "prod"
+    terraform.run(["plan"], path=str(root))
+    assert calls(root)[11:] == [
+        "workspace list",
+        "workspace new prod",
+        "plan",
+    ]
+
+    # a workspace selected by another process is noticed
+    (root / ".terraform" / "environment").write_text("dev\n")
+    terraform.run(["plan"], path=str(root))
+    assert calls(root)[14:] == ["workspace list", "workspace select prod", "plan"]
+
+
+def test_failed_run_resets_session(tmp_path, terraform):
+    root = tmp_path / "root"
+    root.mkdir()
+    terraform.run(["plan"], path=str(root))
+    with pytest.raises(CalledProcessError):
+        terraform.run(["fail"], path=str(root))
+    terraform.run(["plan"], path=str(root))
+    assert calls(root)[-2:] == ["init", "plan"]
+
+
+def test_stream(tmp_path, terraform):
+    root = tmp_path / "root"
+    root.mkdir()
+
+    with terraform.stream(["noisy"], path=str(root), tail=10, buffer=5) as run:
+        lines = list(run)
+    assert len(lines) == 1000
+    assert [line.text for line in lines if line.stream == "stdout"] == [
+        f"line {i}\n" for i in range(500)
+    ]
+    assert list(run.stdout_tail) == [f"line {i}\n" for i in range(490, 500)]
+    assert run.returncode == 0
+
+    received = []
+    with pytest.raises(CalledProcessError) as error:
+        with terraform.stream(
+            ["noisy", "fail"], path=str(root), callback=received.append, tail=3
+        ):
+            pass
+    assert len(received) == 1001
+    assert error.value.stderr == "warning 498\nwarning 499\nError: noisy failure\n"
+    assert extract_errors(error.value.stderr) == "Error: noisy failure"
+    assert terraform.session(root).workspace is None
+
+    # a consumer that never iterates doesn't block the command
+    queue: Queue = Queue()
+    run = terraform.stream(["noisy"], path=str(root), queue=queue)
+    assert run.wait() == 0
+    assert run.errors == ""
+    assert queue.qsize() == 1001
+    with pytest.raises(ValueError):
+        list(run)
+
+
+def test_isolated_workspaces(tmp_path, terraform):
+    root = tmp_path / "root"
+    root.mkdir()
+    terraform.isolate_workspaces = True
+    copies = [terraform.for_workspace(name) for name in ("dev", "staging", "prod")]
+
+    def plan(wrapper):
+        wrapper.run(["slow"], path=str(root))
+        return wrapper.run(["plan"], path=str(root))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        outputs = list(executor.map(plan, copies))
+    assert time.perf_counter() - start < 3 * 0.5
+    assert outputs == [f"ran plan in {name}\n" for name in ("dev", "staging", "prod")]
+    # nothing was selected in place, and each workspace has its own data
+    assert not [call for call in calls(root) if "select" in call]
+    assert sorted(os.listdir(root / ".terraform-workspaces")) == [
+        "dev",
+        "plugin-cache",
+        "prod",
+        "staging",
+    ]
+    assert len(terraform.sessions) == 3
+
+    # the fake refuses workspace commands in an uninitialized data
+    # directory, so each was initialized before its workspace was created
+    assert {"workspace new dev", "workspace new staging"} <= set(calls(root))
+    # the copies share sessions, so nothing needs preparing again
+    count = len(calls(root))
+    terraform.for_workspace("prod").run(["plan"], path=str(root))
+    assert calls(root)[count:] == ["plan"]
+
+
+def test_provider_cache(tmp_path, terraform):
+    terraform.provider_cache = ProviderCache(tmp_path / "cache")
+    roots = build_roots(tmp_path, terraform, ["a", "b", "c", "d"])
+    for root in roots:
+        (root._path / ".terraform.lock.hcl").write_text('provider "null" {}\n')
+    (tmp_path / "d" / ".terraform.lock.hcl").write_text('provider "random" {}\n')
+
+    # a is initialized first, and its providers become the golden copy
+    run_all(roots[:1], ["plan"])
+    results = run_all(roots, ["plan"], concurrency=4)
+    assert not results.failed
+    # the providers of b and c were linked from a's, only d installed any
+    assert [(root._path / "installs.log").exists() for root in roots] == [
+        True,
+        False,
+        False,
+        True,
+    ]
+    binary = "providers/hashicorp/null/terraform-provider-null"
+    assert os.stat(tmp_path / "b" / ".terraform" / binary).st_nlink == 4
+    assert terraform.avoided_calls["provider install"] == 2
+    assert len(os.listdir(terraform.provider_cache.golden)) == 2
+    assert terraform._environment(path=roots[0].path)["TF_PLUGIN_CACHE_DIR"] == str(
+        terraform.provider_cache.plugins
+    )
+
+    # an init skips the lock only while its providers match the lock file
+    session = terraform.session(roots[1].path)
+    assert terraform._install_lock(["init"], session) is None
+    (tmp_path / "b" / ".terraform.lock.hcl").write_text('provider "random" {}\n')
+    assert isinstance(terraform._install_lock(["init"], session), FileLock)
+
+
+@pytest.mark.parametrize("use_fcntl", [True, False])
+def test_file_lock(tmp_path, use_fcntl):
+    held = []
+
+    def hold(name):
+        with FileLock(tmp_path / "lock", poll=0.01, use_fcntl=use_fcntl):
+            held.append(name)
+            time.sleep(0.1)
+            held.append(name)
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        list(executor.map(hold, "abc"))
+    # each holder finished before the next started
+    assert held[::2] == held[1::2]
+
+    lock = FileLock(tmp_path / "stale", stale=0, use_fcntl=use_fcntl)
+    (tmp_path / "stale").write_text("")
+    with lock:
+        pass
+
+
+def test_show_plan(tmp_path, terraform):
+    root = tmp_path / "root"
+    root.mkdir()
+    changes = [
+        {
+            "address": f"null_resource.r[{i}]",
+            "type": "null_resource",
+            "change": {"actions": ["create" if i % 2 else "delete"]},
+        }
+        for i in range(2000)
+    ]
+    (root / "tfplan").write_text(json.dumps({"resource_changes": changes}))
+
+    plan = terraform.show_plan("tfplan", path=str(root), actions="create")
+    assert len(plan) == 1000
+    assert plan.addresses()[:2] == ["null_resource.r[1]", "null_resource.r[3]"]
+
+
+def test_plan_cache(tmp_path, terraform, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    terraform.plan_cache = PlanCache(tmp_path / "plans")
+    root = tmp_path / "root"
+    (root / "modules" / "app").mkdir(parents=True)
+    (root / "main.tf").write_text('module "app" {\n  source = "./modules/app"\n}\n')
+    (root / "modules" / "app" / "main.tf").write_text('variable "name" {}\n')
+    workspace = TerraformWorkspace(path=root, terraform=terraform)
+    fingerprint = input_fingerprint(workspace)
+
+    assert workspace.plan() == "ran plan -input=false\n"
+    assert workspace.plan() == "ran plan -input=false\n"
+    assert calls(root).count("plan -input=false") == 1
+    assert (terraform.plan_cache.planned, terraform.plan_cache.skipped) == (1, 1)
+
+    # a change to a module, or to variables, means planning again
+    (root / "modules" / "app" / "main.tf").write_text('variable "other" {}\n')
+    assert input_fingerprint(workspace) != fingerprint
+    workspace.plan()
+    (root / "terraform.tfvars").write_text('name = "x"\n')
+    workspace.plan()
+    assert calls(root).count("plan -input=false") == 3
+
+    # stored plans outlive the process, until invalidated
+    terraform.plan_cache = PlanCache(tmp_path / "plans")
+    workspace.plan()
+    assert terraform.plan_cache.skipped == 1
+    terraform.plan_cache.invalidate(root)
+    assert not list((tmp_path / "plans").glob("*.json"))
+    workspace.plan()
+    assert calls(root).count("plan -input=false") == 4
+
+    # the contents of -var-file files count, as does the backend
+    for name, arguments in (
+        ("y", ["-var-file=prod.tfvars"]),
+        ("z", ["-var-file", "prod.tfvars"]),
+    ):
+        fingerprint = input_fingerprint(workspace, arguments)
+        (root / "prod.tfvars").write_text(f'name = "{name}"\n')
+        assert input_fingerprint(workspace, arguments) != fingerprint
+    fingerprint = input_fingerprint(workspace)
+    terraform.backend = LocalBackend(path=str(tmp_path / "elsewhere"))
+    assert input_fingerprint(workspace) != fingerprint
+
+
+def test_saved_plan(tmp_path, terraform, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    terraform.plan_cache = PlanCache(tmp_path / "plans")
+    root = tmp_path / "root"
+    root.mkdir()
+    (root / "main.tf").write_text('resource "null_resource" "a" {}\n')
+    workspace = TerraformWorkspace(path=root, terraform=terraform)
+
+    saved = workspace.plan(out=True)
+    key = PlanCache.key(root, "dev")
+    assert saved.path == str(
+        tmp_path / "plans" / "plans" / f"{key}-{saved.fingerprint}.tfplan"
+    )
+    # an identical root in another directory saves its plan elsewhere
+    twin = tmp_path / "twin"
+    twin.mkdir()
+    (twin / "main.tf").write_text('resource "null_resource" "a" {}\n')
+    twin_saved = TerraformWorkspace(path=twin, terraform=terraform).plan(out=True)
+    assert twin_saved.fingerprint == saved.fingerprint
+    assert twin_saved.path != saved.path
+    assert saved.summary.addresses(action="create") == ["null_resource.a"]
+    assert saved.has_changes
+    # planning again reuses the saved plan
+    assert workspace.plan(out=True).path == saved.path
+    assert terraform.plan_cache.skipped == 1
+
+    workspace.apply(plan=saved)
+    assert calls(root)[-1] == f"apply -input=false {saved.path}"
+    assert not os.path.exists(saved.path)
+    with pytest.raises(ValueError):
+        workspace.apply(plan=saved)
+
+    # a plan is stale once its inputs change
+    saved = workspace.plan(out="tfplan")
+    assert saved.path == str(root / "tfplan")
+    (root / "main.tf").write_text('resource "null_resource" "b" {}\n')
+    with pytest.raises(ValueError):
+        workspace.apply(plan=saved)
+
+    # or applied in another workspace
+    saved = workspace.plan(out=True)
+    terraform.workspace = "prod"
+    with pytest.raises(ValueError):
+        workspace.apply(plan=saved)
+
+
+TARGETED = """variable "prefix" {}
+
+resource "aws_s3_bucket" "a" {
+  bucket = "${var.prefix}-a"
+}
+
+resource "aws_s3_bucket_policy" "b" {
+  bucket = aws_s3_bucket.a.id
+}
+
+resource "aws_s3_bucket" "c" {
+  bucket = "c"
+}
+
+output "policy" {
+  value = aws_s3_bucket_policy.b.id
+}
+"""
+
+
+def test_targeted_plan(tmp_path, terraform):
+    root = tmp_path / "root"
+    root.mkdir()
+    (root / "main.tf").write_text(TARGETED)
+    workspace = TerraformWorkspace(
+        path=root, terraform=terraform, serializer=HumanSerializer()
+    )
+    file = workspace.get_file_safe("main.tf")
+    # nothing changed, so nothing to target
+    assert workspace.change_targets() is None
+    workspace.plan(targeted=True)
+    assert calls(root)[-1] == "plan -input=false"
+
+    bucket = [obj for obj in file.objects if getattr(obj, "tf_id", None) == "a"][0]
+    bucket.bucket = "renamed"
+    workspace.save(format=False)
+    # the policy refers to the bucket, and is planned with it
+    targets = ["aws_s3_bucket.a", "aws_s3_bucket_policy.b"]
+    assert workspace.change_targets() == targets
+    workspace.plan(targeted=True)
+    assert calls(root)[-1] == "plan -input=false " + " ".join(
+        f"-target={target}" for target in targets
+    )
+    workspace.apply(targeted=True)
+    assert calls(root)[-1] == "apply --auto-approve " + " ".join(
+        f"-target={target}" for target in targets
+    )
+    # applied changes are no longer pending
+    assert workspace.change_targets() is None
+
+    # a rename targets the old address as well, so it is destroyed
+    policy = [obj for obj in file.objects if getattr(obj, "tf_id", None) == "b"][0]
+    policy.tf_id = "q"
+    workspace.save(format=False)
+    assert workspace.change_targets() == [
+        "aws_s3_bucket_policy.b",
+        "aws_s3_bucket_policy.q",
+    ]
+    workspace.apply(targeted=True)
+    assert calls(root)[-1] == (
+        "apply --auto-approve "
+        "-target=aws_s3_bucket_policy.b -target=aws_s3_bucket_policy.q"
+    )
+
+    file.delete_object(bucket)
+    assert workspace.change_targets() == ["aws_s3_bucket.a", "aws_s3_bucket_policy.q"]
+    # adding a terraform block, which has no address, needs a full plan
+    workspace.get_terraform_config()
+    assert workspace.change_targets() is None
+
+
+def build_roots(tmp_path, terraform, names):
+    roots = []
+    for name in names:
+        (tmp_path / name).mkdir()
+        roots.append(TerraformWorkspace(path=tmp_path / name, terraform=terraform))
+    return roots
+
+
+def test_run_all(tmp_path, terraform):
+    roots = build_roots(tmp_path, terraform, ["a", "b", "c", "d"])
+    results = run_all(
+        roots,
+        ["plan"],
+        concurrency=4,
+        environment=lambda workspace: {"RUN_ID": workspace.name},
+    )
+    assert [result.output for result in results] == [
+        f"ran plan {name}\n" for name in "abcd"
+    ]
+    assert len(results.succeeded) == 4
+    assert all(result.duration is not None for result in results)
+
+    # the runs overlap
+    results = run_all(roots, ["slow"], concurrency=4)
+    assert not results.failed
+    assert results.duration < 4 * 0.5
+
+
+def test_run_all_errors(tmp_path, terraform):
+    roots = build_roots(tmp_path, terraform, ["a", "b", "c", "d"])
+
+    def environment(workspace):
+        return {"FAIL": "broken"} if workspace.name == "b" else None
+
+    results = run_all(roots, "plan", concurrency=1, environment=environment)
+    assert [result.path for result in results.failed] == [roots[1].path]
+    assert results.failed[0].errors == "Error: broken"
+    assert len(results.succeeded) == 3
+
+    results = run_all(
+        roots, "plan", concurrency=1, environment=environment, fail_fast=True
+    )
+    assert [result.succeeded for result in results] == [True, False, False, False]
+    assert [result.skipped for result in results] == [False, False, True, True]
+    with pytest.raises(CalledProcessError):
+        results.raise_for_errors()
+
+
+def test_async_terraform(tmp_path, terraform):
+    roots = build_roots(tmp_path, terraform, ["a", "b", "c", "d"])
+    terraform = AsyncTerraform(terraform)
+
+    async def run_roots(command, **kwargs):
+        return await asyncio.gather(
+            *(terraform.run([command], path=root.path, **kwargs) for root in roots),
+            return_exceptions=True,
+        )
+
+    outputs = asyncio.run(run_roots("plan", environment={"RUN_ID": "x"}))
+    assert outputs == ["ran plan x\n"] * 4
+    assert calls(tmp_path / "a") == [
+        "init",
+        "workspace list",
+        "workspace new dev",
+        "plan",
+    ]
+
+    start = time.perf_counter()
+    assert asyncio.run(run_roots("slow")) == [""] * 4
+    assert time.perf_counter() - start < 4 * 0.5
+
+    errors = asyncio.run(run_roots("plan", environment={"FAIL": "broken"}))
+    assert all(isinstance(error, CalledProcessError) for error in errors)
+    assert errors[0].stderr == "Error: broken\n"
+
+
+def test_async_terraform_timeout(tmp_path, terraform):
+    root = build_roots(tmp_path, terraform, ["a"])[0]
+    terraform = AsyncTerraform(terraform, kill_grace=1)
+    with pytest.raises(TimeoutExpired):
+        asyncio.run(terraform.run(["hang"], path=root.path, timeout=0.5))
+    # the terraform process and everything it started were stopped
+    assert_stopped(tmp_path / "a" / "hang.pid")
+
+    async def cancel():
+        task = asyncio.ensure_future(terraform.run(["hang"], path=root.path))
+        await asyncio.sleep(0.5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    (tmp_path / "a" / "hang.pid").unlink()
+    asyncio.run(cancel())
+    assert_stopped(tmp_path / "a" / "hang.pid")
+
+
+def test_async_terraform_cancelled_waiting_for_provider_lock(tmp_path, terraform):
+    terraform.provider_cache = ProviderCache(tmp_path / "cache")
+    root = build_roots(tmp_path, terraform, ["a"])[0]
+    terraform = AsyncTerraform(terraform)
+    held = terraform.terraform.provider_cache.lock()
+
+    async def cancel():
+        task = asyncio.ensure_future(terraform.run(["plan"], path=root.path))
+        await asyncio.sleep(0.3)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    with held:
+        asyncio.run(cancel())
+    assert not (tmp_path / "a" / "installs.log").exists()
+    # the cancelled run never took the lock
+    lock = terraform.terraform.provider_cache.lock()
+    assert lock.try_acquire()
+    lock.release()
+
+
+def assert_stopped(pid_file):
+    pid = int(pid_file.read_text())
+    for _ in range(50):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return
+        time.sleep(0.05)
+    pytest.fail("child process still running")
@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from pyterraformer.core.tfvars import VariableValues
+
+CONFIG = """variable "region" {
+  default = "us-east-1"
+}
+
+variable "env" {
+  default = "dev"
+}
+
+variable "zones" {
+  default = {
+    east = "a"
+  }
+}
+
+resource "aws_s3_bucket" "b" {
+  bucket = "${var.env}-${var.region}"
+  zone   = var.zones["east"]
+}
+"""
+
+
+def test_variable_precedence(tmp_path):
+    (tmp_path / "terraform.tfvars").write_text(
+        '# shared\nregion = "eu-west-1"\nenv = "stage"\n'
+    )
+    (tmp_path / "b.auto.tfvars").write_text('env = "qa"\n')
+    (tmp_path / "a.auto.tfvars.json").write_text(json.dumps({"env": "test"}))
+    (tmp_path / "prod.tfvars").write_text('zones = {\n  east = "b"\n}\n')
+    environ = {"TF_VAR_region": "ap-south-1", "TF_VAR_env": "env", "HOME": "/"}
+
+    values = VariableValues.load(tmp_path, environ=environ)
+    assert values["region"] == "eu-west-1"
+    # auto files apply in lexical order, after terraform.tfvars
+    assert values["env"] == "qa"
+    assert values.sources["env"] == str(tmp_path / "b.auto.tfvars")
+    assert "HOME" not in values
+
+    values = VariableValues.load(
+        tmp_path,
+        var_files=["prod.tfvars"],
+        variables={"env": "prod", "extra": '["x", "y"]'},
+        environ=environ,
+    )
+    assert values["env"] == "prod"
+    assert values["zones"] == {"east": "b"}
+    assert values["extra"] == ["x", "y"]
+
+    with pytest.raises(ValueError):
+        VariableValues.load(tmp_path, var_files=["missing.tfvars"], environ={})
+
+
+def test_environment_values_parse_for_declared_variables(build_workspace):
+    workspace = build_workspace(CONFIG)
+    environ = {
+        "TF_VAR_zones": '{ east = "c" }',
+        "TF_VAR_env": "[malformed",
+        "TF_VAR_other": '["x"]',
+    }
+    values = workspace.load_variables(environ=environ)
+    assert values["zones"] == {"east": "c"}
+    # a value that doesn't parse is kept as given
+    assert values["env"] == "[malformed"
+    # undeclared variables are never parsed
+    assert values["other"] == '["x"]'
+
+
+def test_variable_values_in_evaluation(tmp_path, build_workspace):
+    workspace = build_workspace(CONFIG)
+    bucket = workspace.get_object(tf_id="b")
+    zones = workspace.get_object(name="zones")
+    assert bucket.resolved_attributes == {"bucket": "dev-us-east-1", "zone": "a"}
+    assert zones.get("east") == "a"
+
+    (tmp_path / "prod.tfvars").write_text('env = "prod"\nzones = {\n  east = "b"\n}\n')
+    workspace.load_variables(var_files=["prod.tfvars"], environ={})
+    assert bucket.resolved_attributes == {"bucket": "prod-us-east-1", "zone": "b"}
+    assert zones["east"] == "b"
+    assert zones.get("west") is None
+
+    # switching back only swaps the table
+    workspace.variable_values = None
+    assert bucket.resolved_attributes == {"bucket": "dev-us-east-1", "zone": "a"}
+    assert zones["east"] == "a"